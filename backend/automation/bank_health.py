@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Bank Health for Bank Transfer Automation
+Per-bank circuit breaker fed by transfer outcomes, plus a plain-HTTP prober
+that checks each loginUrl's reachability and time to first byte
+
+Breaker states, kept per bank id in a JSON file shared by every worker process
+(and read by the Node service for /api/banks):
+    closed    - transfers run normally; FAILURE_THRESHOLD failures in a row open it
+    open      - transfers fail fast without launching a browser for OPEN_SECONDS
+    half_open - one trial transfer is let through; success closes the breaker,
+                failure opens it again
+
+Usage:
+    python bank_health.py [--once] [--interval 60]
+"""
+
+import json
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+HEALTH_FILE = os.environ.get(
+    'BANK_HEALTH_FILE',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'bank_health.json')
+)
+
+FAILURE_THRESHOLD = int(os.environ.get('BANK_BREAKER_FAILURES', '3'))
+OPEN_SECONDS = float(os.environ.get('BANK_BREAKER_OPEN_SECONDS', '120'))
+
+# A half-open trial that never reported back is given up after this long
+TRIAL_TIMEOUT = 300
+
+PROBE_INTERVAL = 60
+PROBE_TIMEOUT = 10
+PROBE_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+def probe(url, timeout=PROBE_TIMEOUT):
+    """GET a URL and report {'reachable', 'status', 'ttfbMs', 'error', 'checkedAt'}
+
+    Any HTTP answer below 500 counts as reachable (login pages often redirect
+    or refuse bots); connection errors, timeouts and 5xx do not.
+    """
+    # Imported here: only the prober needs them, and the worker imports this
+    # module on every transfer
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(url, headers={'User-Agent': PROBE_USER_AGENT})
+    start = time.perf_counter()
+    status = None
+    error = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read(1)
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception as e:
+        error = str(e)
+    return {
+        'reachable': status is not None and status < 500,
+        'status': status,
+        'ttfbMs': int((time.perf_counter() - start) * 1000) if status is not None else None,
+        'error': error,
+        'checkedAt': time.time(),
+    }
+
+
+def _trial_owner():
+    """Identifies the worker thread holding a half-open trial"""
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+class BankHealth:
+    def __init__(self, path=HEALTH_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._prober_thread = None
+        self._prober_stop = threading.Event()
+
+    def allow(self, bank_id):
+        """True if a transfer for this bank may start now
+
+        While open this is False until OPEN_SECONDS have passed; the first
+        caller after that becomes the half-open trial.
+        """
+        breaker = self._read().get(bank_id, {}).get('breaker')
+        if not breaker or breaker['state'] == 'closed':
+            return True
+
+        decision = []
+
+        def admit(state):
+            breaker = self._breaker(state, bank_id)
+            now = time.time()
+            if breaker['state'] == 'open' and now < breaker['openUntil']:
+                decision.append(False)
+                return False
+            if breaker['state'] == 'half_open' and now - (breaker['trialStartedAt'] or 0) < TRIAL_TIMEOUT:
+                decision.append(False)
+                return False
+            if breaker['state'] != 'closed':
+                breaker['state'] = 'half_open'
+                breaker['trialStartedAt'] = now
+                breaker['trialOwner'] = _trial_owner()
+                logger.info("🔌 %s breaker half-open, letting one trial through", bank_id)
+            decision.append(True)
+            return True
+
+        self._update(admit)
+        return decision[0]
+
+    def release_trial(self, bank_id):
+        """Hand back a half-open trial this thread got but never ran (no login attempted)
+
+        The breaker goes back to open with its wait already over, so the next
+        transfer becomes the trial instead of the bank staying refused for
+        TRIAL_TIMEOUT.
+        """
+        def release(state):
+            breaker = state.get(bank_id, {}).get('breaker')
+            if not breaker or breaker['state'] != 'half_open' or breaker.get('trialOwner') != _trial_owner():
+                return False
+            breaker.update(state='open', trialStartedAt=None, trialOwner=None)
+            logger.info("🔌 %s breaker trial released unused", bank_id)
+            return True
+
+        self._update(release)
+
+    def record_success(self, bank_id):
+        """The portal worked: close the breaker"""
+        def close(state):
+            breaker = self._breaker(state, bank_id)
+            if breaker['state'] == 'closed' and not breaker['failures']:
+                return False
+            if breaker['state'] != 'closed':
+                logger.info("🔌 %s breaker closed", bank_id)
+            breaker.update(state='closed', failures=0, openUntil=None, trialStartedAt=None, trialOwner=None)
+            return True
+
+        self._update(close)
+
+    def record_failure(self, bank_id, error=None):
+        """The portal failed: count it, opening the breaker at the threshold"""
+        def fail(state):
+            breaker = self._breaker(state, bank_id)
+            breaker['failures'] += 1
+            breaker['lastError'] = str(error)[:200] if error else None
+            if breaker['state'] == 'half_open' or breaker['failures'] >= FAILURE_THRESHOLD:
+                if breaker['state'] != 'open':
+                    logger.warning("🔌 %s breaker open for %ss: %s", bank_id, OPEN_SECONDS, error)
+                breaker.update(state='open', openedAt=time.time(), openUntil=time.time() + OPEN_SECONDS,
+                               trialStartedAt=None, trialOwner=None)
+            return True
+
+        self._update(fail)
+
+    def record_probe(self, bank_id, result):
+        """Store a probe result; unreachable portals also count as failures
+
+        A reachable probe ends the run of failures (the breaker counts them
+        in a row) but does not close an open breaker; only a transfer does.
+        """
+        def store(state):
+            state.setdefault(bank_id, {})['probe'] = result
+            if result['reachable']:
+                self._breaker(state, bank_id)['failures'] = 0
+            return True
+
+        self._update(store)
+        if not result['reachable']:
+            self.record_failure(bank_id, result['error'] or f"HTTP {result['status']}")
+
+    def snapshot(self):
+        """Current {bank_id: {'breaker', 'probe'}} state"""
+        return self._read()
+
+    def probe_all(self, plans=None):
+        """Probe the login URL of every registered bank once"""
+        if plans is None:
+            from bank_registry import bank_registry
+            plans = bank_registry.plans()
+        for plan in plans:
+            result = probe(plan.login_url)
+            logger.info("🩺 %s: %s in %s ms", plan.bank_id, result['status'] or result['error'], result['ttfbMs'])
+            self.record_probe(plan.bank_id, result)
+
+    def start_prober(self, interval=PROBE_INTERVAL):
+        """Probe every bank in the background every interval seconds"""
+        if self._prober_thread and self._prober_thread.is_alive():
+            return
+        self._prober_stop.clear()
+        self._prober_thread = threading.Thread(
+            target=self._run_prober,
+            args=(interval,),
+            name='bank-prober',
+            daemon=True
+        )
+        self._prober_thread.start()
+
+    def stop_prober(self):
+        self._prober_stop.set()
+
+    def _run_prober(self, interval):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error("❌ Bank probe failed: %s", e)
+            if self._prober_stop.wait(interval):
+                return
+
+    def _breaker(self, state, bank_id):
+        entry = state.setdefault(bank_id, {})
+        return entry.setdefault('breaker', {
+            'state': 'closed',
+            'failures': 0,
+            'openedAt': None,
+            'openUntil': None,
+            'trialStartedAt': None,
+            'lastError': None,
+        })
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, change):
+        """Read-modify-write the state file under a thread and file lock"""
+        with self._lock, self._file_lock():
+            state = self._read()
+            if not change(state):
+                return
+            temp_file = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_file, 'w') as f:
+                    json.dump(state, f, indent=2)
+                os.replace(temp_file, self.path)
+            except OSError as e:
+                logger.warning("Could not write bank health: %s", e)
+
+    @contextmanager
+    def _file_lock(self):
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Global bank health instance
+bank_health = BankHealth()
+
+
+def main():
+    import argparse
+    from structured_logging import configure_logging
+
+    parser = argparse.ArgumentParser(description='Probe bank portals and report breaker state')
+    parser.add_argument('--once', action='store_true', help='probe once, print the state and exit')
+    parser.add_argument('--interval', type=float, default=PROBE_INTERVAL)
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.once:
+        bank_health.probe_all()
+        print(json.dumps(bank_health.snapshot(), indent=2))
+        return
+
+    bank_health.start_prober(args.interval)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        bank_health.stop_prober()
+
+
+if __name__ == '__main__':
+    main()
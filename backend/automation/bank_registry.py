@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Bank Registry for Bank Transfer Automation
+Loads bank definitions and step plans once per worker, validates them and
+compiles each bank into an ordered plan the automation engine runs generically
+
+Plan steps (bank_plans.json) reference selector keys from the bank definition:
+    action    - type | click | get | wait | copy_labels
+    selector  - key into bank['selectors']
+    wait      - presence | clickable (omit to look the element up immediately)
+    timeout   - seconds for the wait (defaults to the automation timeout)
+    value     - key of the job value to type, with an optional default
+    when      - only run the step if this job value is truthy
+    optional  - skip the step if its element is missing or it fails
+    guard     - stop the phase quietly if the element does not appear
+    pause     - seconds to sleep after the step (per field for copy_labels)
+"""
+
+import json
+import os
+import logging
+import threading
+from collections import namedtuple
+
+from launch_profiles import LAUNCH_PROFILES
+
+logger = logging.getLogger(__name__)
+
+BANKS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'banks.json')
+PLANS_FILE = os.path.join(os.path.dirname(__file__), 'bank_plans.json')
+
+PHASES = ('login', 'navigate', 'fill_form', 'confirm', 'pre_otp', 'final_confirm', 'additional_verification')
+ACTIONS = ('type', 'click', 'get', 'wait', 'copy_labels')
+WAITS = (None, 'presence', 'clickable')
+
+# Selectors every bank needs regardless of its plan
+REQUIRED_SELECTORS = ('successMessage',)
+
+# Fallback OTP field selectors tried after the bank's own otpInputField
+GENERIC_OTP_FIELD_SELECTORS = (
+    'input[type="text"][placeholder*="código"]',
+    'input[type="text"][placeholder*="OTP"]',
+    'input[type="text"][placeholder*="SMS"]',
+    'input[type="password"][placeholder*="código"]',
+    'input[name*="otp"]',
+    'input[id*="otp"]',
+    'input[id*="sms"]',
+    'input[id*="token"]',
+    'input[class*="otp"]',
+    'input[class*="sms"]',
+    'input[class*="token"]',
+    # Common Portuguese/Spanish OTP field patterns
+    'input[placeholder*="verificação"]',
+    'input[placeholder*="verificacion"]',
+    'input[placeholder*="autenticação"]',
+    'input[placeholder*="autenticacion"]',
+    'input[name*="codigo"]',
+    'input[name*="verification"]',
+    'input[id*="verification"]',
+)
+
+# Fallback OTP submit buttons tried after the bank's own otpValidationButton
+GENERIC_OTP_BUTTON_SELECTORS = (
+    'button[type="submit"]',
+    'input[type="submit"]',
+    'button[value*="Validar"]',
+    'button[value*="Confirmar"]',
+    'button[value*="Verificar"]',
+    'input[value*="Validar"]',
+    'input[value*="Confirmar"]',
+    'input[value*="Verificar"]',
+    '.btn-confirm',
+    '.btn-validate',
+    '.btn-submit',
+    '#btnValidate',
+    '#btnConfirm',
+    '#btnSubmit',
+)
+
+# Page text that indicates an OTP step when no field matched
+OTP_TEXT_PATTERNS = (
+    "código de verificação",
+    "código SMS",
+    "token",
+    "OTP",
+    "verificação",
+    "autenticação",
+    "código enviado",
+    "verification code",
+    "SMS code",
+)
+
+PlanStep = namedtuple(
+    'PlanStep',
+    'action selector_key selector wait timeout value default when optional guard pause',
+)
+
+BankPlan = namedtuple(
+    'BankPlan',
+    'bank_id name login_url bank_code selectors phases otp_field_selectors otp_button_selectors launch_profile',
+)
+
+
+class BankConfigError(ValueError):
+    """Raised when a bank definition or its plan is invalid"""
+
+
+class BankRegistry:
+    def __init__(self, banks_path=BANKS_FILE, plans_path=PLANS_FILE):
+        self.banks_path = banks_path
+        self.plans_path = plans_path
+        self._plan_specs = None
+        self._plans = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load, validate and compile every known bank; runs once per worker"""
+        with self._lock:
+            if self._plan_specs is not None:
+                return
+            with open(self.plans_path, 'r') as f:
+                self._plan_specs = json.load(f)
+            banks = []
+            if os.path.exists(self.banks_path):
+                with open(self.banks_path, 'r') as f:
+                    banks = json.load(f)
+
+        for bank_config in banks:
+            bank_id = bank_config.get('id')
+            try:
+                self._plans[bank_id] = self.compile(bank_config)
+            except BankConfigError as e:
+                self._errors[bank_id] = str(e)
+                logger.error("❌ Invalid bank definition %s: %s", bank_id, e)
+
+        logger.info("🏦 Bank registry loaded: %s", sorted(self._plans))
+
+    def plan_for(self, bank_config):
+        """Return the compiled plan for a bank config, compiling unknown banks once"""
+        self.load()
+        bank_id = bank_config.get('id')
+        plan = self._plans.get(bank_id)
+        if plan:
+            return plan
+        if bank_id in self._errors:
+            raise BankConfigError(self._errors[bank_id])
+
+        plan = self.compile(bank_config)
+        self._plans[bank_id] = plan
+        return plan
+
+    def plans(self):
+        """Return the compiled plans of all valid registered banks"""
+        self.load()
+        return [self._plans[bank_id] for bank_id in sorted(self._plans)]
+
+    def bank_codes(self):
+        """Return {IBAN bank code: bank id} for banks that declare a bankCode"""
+        return {plan.bank_code: plan.bank_id for plan in self.plans() if plan.bank_code}
+
+    def bank_ids(self):
+        """Return the ids of all valid registered banks"""
+        self.load()
+        return sorted(self._plans)
+
+    def compile(self, bank_config):
+        """Validate a bank definition and compile it into a BankPlan"""
+        self.load()
+        bank_id = bank_config.get('id')
+        if not bank_id:
+            raise BankConfigError("Bank definition has no id")
+
+        login_url = bank_config.get('loginUrl', '')
+        if not login_url.startswith(('http://', 'https://')):
+            raise BankConfigError(f"{bank_id}: loginUrl must be an http(s) URL")
+
+        bank_code = bank_config.get('bankCode')
+        if bank_code is not None and not (isinstance(bank_code, str) and len(bank_code) == 4 and bank_code.isdigit()):
+            raise BankConfigError(f"{bank_id}: bankCode must be 4 digits")
+
+        launch_profile = bank_config.get('launchProfile')
+        if launch_profile is not None and launch_profile not in LAUNCH_PROFILES:
+            raise BankConfigError(f"{bank_id}: unknown launchProfile {launch_profile}")
+
+        selectors = bank_config.get('selectors')
+        if not isinstance(selectors, dict):
+            raise BankConfigError(f"{bank_id}: selectors must be an object")
+        for key, value in selectors.items():
+            if not isinstance(value, str) or not value.strip():
+                raise BankConfigError(f"{bank_id}: selector {key} is empty")
+        for key in REQUIRED_SELECTORS:
+            if key not in selectors:
+                raise BankConfigError(f"{bank_id}: missing selector {key}")
+
+        spec = dict(self._plan_specs.get('default', {}))
+        spec.update(self._plan_specs.get(bank_id, {}))
+
+        phases = {}
+        for phase, raw_steps in spec.items():
+            if phase not in PHASES:
+                raise BankConfigError(f"{bank_id}: unknown plan phase {phase}")
+            steps = []
+            for raw_step in raw_steps:
+                step = self._compile_step(bank_id, phase, raw_step, selectors)
+                if step:
+                    steps.append(step)
+            phases[phase] = tuple(steps)
+
+        otp_fields = tuple(s for s in (selectors.get('otpInputField'),) if s)
+        otp_buttons = tuple(s for s in (selectors.get('otpValidationButton'),) if s)
+
+        return BankPlan(
+            bank_id=bank_id,
+            name=bank_config.get('name', bank_id),
+            login_url=login_url,
+            bank_code=bank_code,
+            selectors=dict(selectors),
+            phases=phases,
+            otp_field_selectors=otp_fields + GENERIC_OTP_FIELD_SELECTORS,
+            otp_button_selectors=otp_buttons + GENERIC_OTP_BUTTON_SELECTORS,
+            launch_profile=launch_profile,
+        )
+
+    def _compile_step(self, bank_id, phase, raw_step, selectors):
+        action = raw_step.get('action')
+        if action not in ACTIONS:
+            raise BankConfigError(f"{bank_id}.{phase}: unknown action {action}")
+
+        wait = raw_step.get('wait')
+        if wait not in WAITS:
+            raise BankConfigError(f"{bank_id}.{phase}: unknown wait {wait}")
+
+        if action == 'type' and not raw_step.get('value'):
+            raise BankConfigError(f"{bank_id}.{phase}: type step needs a value")
+
+        optional = bool(raw_step.get('optional', False))
+        guard = bool(raw_step.get('guard', False))
+        selector_key = raw_step.get('selector')
+        selector = selectors.get(selector_key)
+        if not selector:
+            # Steps for selectors this bank does not define are dropped when
+            # they are optional, and make the definition invalid otherwise
+            if optional or guard:
+                return None
+            raise BankConfigError(f"{bank_id}.{phase}: missing selector {selector_key}")
+
+        if action == 'get' and not selector.startswith(('http://', 'https://')):
+            raise BankConfigError(f"{bank_id}.{phase}: {selector_key} must be a URL for a get step")
+
+        return PlanStep(
+            action=action,
+            selector_key=selector_key,
+            selector=selector,
+            wait=wait,
+            timeout=raw_step.get('timeout'),
+            value=raw_step.get('value'),
+            default=raw_step.get('default'),
+            when=raw_step.get('when'),
+            optional=optional,
+            guard=guard,
+            pause=raw_step.get('pause', 0),
+        )
+
+
+# Global bank registry instance
+bank_registry = BankRegistry()
@@ -11,40 +11,128 @@ import tempfile
 import time
 import logging
 from datetime import datetime
-from unittest import result 
-import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import uuid
-import sys
 import threading
 import queue
 import random
+import shutil
 
 from session_manager import session_manager
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from driver_cache import driver_cache
+from bank_registry import bank_registry, OTP_TEXT_PATTERNS
+from dom_waits import wait_for_any
+from deadline import Deadline, DeadlineExceeded, TRANSFER_DEADLINE_SECONDS
+from bank_health import bank_health
+from deep_links import deep_links, DEEP_LINK_TIMEOUT
+from resource_governor import resource_governor
+from warm_pool import warm_pool
+from launch_profiles import chrome_arguments
+from command_recorder import start_recording, SNAPSHOT_EVENTS
+from fee_quotes import fee_quotes
+from idempotency import idempotency, idempotency_key
+from transfer_validation import validate_transfer, validate_payouts
+from structured_logging import configure_logging, redact
+import node_control
+from job_runner import JobRunner, DEFAULT_WORKERS, read_jobs, read_single_job
 
 logger = logging.getLogger(__name__)
 
 # Global session storage for OTP waiting
 active_sessions = {}
 
+# SharedDriverService used by run_job when --shared-driver is on
+shared_service = None
+
+# --profile: run every transfer job under job_profiler, not just those asking for it
+profile_jobs = False
+
+# Upper bound for a single page load; also capped by the transfer's deadline
+PAGE_LOAD_TIMEOUT = 60
+
+# Checkpoints recorded by perform_transfer, in order. A failed step is resumed
+# in place from the last checkpoint up to STEP_RETRIES times, but only while
+# nothing has been submitted to the bank yet (up to form_filled).
+CHECKPOINTS = ('logged_in', 'on_transfer_page', 'form_filled', 'confirming', 'confirmed', 'otp_pending')
+RESUMABLE_CHECKPOINTS = ('logged_in', 'on_transfer_page', 'form_filled')
+
+# Recorded just before a stage whose click may submit the transfer (bic's and
+# bai's confirmButton do): a failure after it may follow a submit that went
+# through, so it is never resumed and the transfer counts as reaching the bank
+SUBMITTING_CHECKPOINTS = {'confirm': 'confirming'}
+
+# A session still waiting for its OTP; the Node service records it as submit_otp
+REPLAYABLE_STATUSES = ('waiting_otp', 'submit_otp')
+
+# Answer for a transfer that may or may not have gone through
+UNKNOWN_OUTCOME_MESSAGE = 'Estado da transferência desconhecido; verifique o extrato antes de repetir'
+
+# Plain waits once the OTP has gone to the bank: they do not draw on the
+# transfer's budget, and together stay within the Node service's kill grace
+OTP_SETTLE_SECONDS = 3
+VERIFY_TIMEOUT = 20
+
+STEP_RETRIES = int(os.environ.get('TRANSFER_STEP_RETRIES', '2'))
+
+# How long a parked transfer waits for its OTP - same as the frontend
+# countdown - before its browser is closed
+OTP_TIMEOUT = float(os.environ.get('AUTOMATION_OTP_TIMEOUT', '300'))
+
+# Selenium is imported on first use (see load_selenium) so argv parsing and
+# error paths do not pay for it on every cold start
+webdriver = By = Options = None
+TimeoutException = NoSuchElementException = None
+
+def load_selenium():
+    """Import Selenium into this module's globals on first use"""
+    global webdriver, By, Options, TimeoutException, NoSuchElementException
+    if webdriver is not None:
+        return
+    from selenium import webdriver as selenium_webdriver
+    from selenium.webdriver.common.by import By as selenium_by
+    from selenium.webdriver.chrome.options import Options as selenium_options
+    from selenium.common import exceptions as selenium_exceptions
+
+    By = selenium_by
+    Options = selenium_options
+    TimeoutException = selenium_exceptions.TimeoutException
+    NoSuchElementException = selenium_exceptions.NoSuchElementException
+    webdriver = selenium_webdriver
+
 class BankTransferAutomation:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, driver_service=None, dom_backend=None, on_event=None, deadline_at=None):
+        load_selenium()
         self.driver = None
         self.headless = headless
+        # Optional SharedDriverService; None launches a chromedriver per driver
+        self.driver_service = driver_service
+        # 'webdriver' (default) or 'cdp' for plan steps, see cdp_backend
+        self.dom_backend = dom_backend or os.environ.get('AUTOMATION_DOM_BACKEND', 'webdriver')
+        self.cdp = None
+        # Chrome profile directory of this browser, removed on cleanup
+        self.user_data_dir = None
+        # Login URL a warm_pool browser was handed over on, if any
+        self.warm_url = None
+        # CommandRecorder while AUTOMATION_RECORD_DIR is set
+        self.recorder = None
+        self.checkpoints = []
+        # Progress callback, called with one event dict per step (see emit_event)
+        self.on_event = on_event
+        self.started_at = time.monotonic()
+        # Total budget of the current transfer (unlimited outside perform_transfer);
+        # deadline_at is the caller's own deadline as a Unix timestamp
+        self.deadline_at = deadline_at
+        self.deadline = Deadline()
         self.timeout = 160
         self.session_id = None
+        # Key of the run_job transfer in the idempotency store, if any
+        self.idempotency_key = None
+        # Set once the OTP click (or Enter) went to the bank
+        self.otp_submitted = False
         self.otp_queue = queue.Queue()
+        self.otp_results = queue.Queue()
         
-    def setup_driver(self):
-        """Initialize Chrome WebDriver with appropriate options"""
+    def setup_driver(self, launch_profile=None):
+        """Initialize Chrome WebDriver with the flags of a launch profile (see launch_profiles)"""
         chrome_options = Options()
 
         # Random IP rotation using proxy (if available)
@@ -63,19 +151,13 @@ class BankTransferAutomation:
         if proxy_list:
             selected_proxy = random.choice(proxy_list)
             chrome_options.add_argument(f'--proxy-server=http://{selected_proxy}')
-            logger.info(f"🌐 Using proxy: {selected_proxy}")
-        
-        if self.headless:
-            chrome_options.add_argument('--headless')
+            logger.info("🌐 Using proxy: %s", selected_proxy)
         
         user_data_dir = tempfile.mkdtemp(prefix="chrome_userdata_")
+        self.user_data_dir = user_data_dir
         chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument("--headless=new")  # Use headless mode if possible
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+        for argument in chrome_arguments(launch_profile, self.headless):
+            chrome_options.add_argument(argument)
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
 
@@ -88,20 +170,36 @@ class BankTransferAutomation:
         ]
         selected_user_agent = random.choice(user_agents)
         chrome_options.add_argument(f'--user-agent={selected_user_agent}')
-        logger.info(f"🎭 Using User-Agent: {selected_user_agent[:50]}...")
+        logger.info("🎭 Using User-Agent: %s...", selected_user_agent[:50])
         
-        # Enable remote debugging for session persistence
-        chrome_options.add_argument('--remote-debugging-port=9222')
+        # Enable remote debugging for session persistence; a free port per
+        # browser so concurrent sessions do not collide
+        self.debugger_port = find_free_port()
+        chrome_options.add_argument(f'--remote-debugging-port={self.debugger_port}')
         
         try:
-            self.driver = webdriver.Chrome(options=chrome_options)
+            if self.driver_service:
+                self.driver = self.driver_service.create_driver(chrome_options)
+                self.browser_pid = self.driver_service.browser_pid_for(user_data_dir)
+            else:
+                # Pinned binaries: no Selenium Manager discovery on this path
+                driver_cache.apply(chrome_options)
+                self.driver = webdriver.Chrome(service=driver_cache.service(), options=chrome_options)
+                # Get browser process ID
+                self.browser_pid = self.driver.service.process.pid
+            resource_governor.register(self, self.browser_pid)
+            self.recorder = start_recording(self.driver, self.session_id or self.generate_session_id())
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
-            # Get browser process ID
-            self.browser_pid = self.driver.service.process.pid
+            if self.dom_backend == 'cdp':
+                from cdp_backend import CdpBackend
+                self.cdp = CdpBackend(self.driver)
+
             logger.info("Chrome WebDriver initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize WebDriver: {e}")
+            logger.error("Failed to initialize WebDriver: %s", e)
+            # Re-resolve the binaries next time in case they were replaced
+            driver_cache.invalidate()
             raise
     
     def reconnect_to_existing_session(self, session_data):
@@ -116,10 +214,10 @@ class BankTransferAutomation:
             
             # Check if browser process is still alive
             if not session_manager.is_browser_alive(browser_pid):
-                logger.warning(f"Browser process {browser_pid} is no longer alive")
+                logger.warning("Browser process %s is no longer alive", browser_pid)
                 return False
             
-            logger.info(f"🔄 Attempting to reconnect to browser PID: {browser_pid}")
+            logger.info("🔄 Attempting to reconnect to browser PID: %s", browser_pid)
             
             # Try to find Chrome debugger port for this PID
             debugger_port = self.find_chrome_debugger_port(browser_pid)
@@ -131,30 +229,33 @@ class BankTransferAutomation:
             chrome_options = Options()
             chrome_options.add_experimental_option("debuggerAddress", f"127.0.0.1:{debugger_port}")
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = webdriver.Chrome(service=driver_cache.service(), options=chrome_options)
             self.browser_pid = browser_pid
             self.reconnected = True
             
             # Verify we're on the right page
             if current_url and current_url in self.driver.current_url:
-                logger.info(f"✅ Successfully reconnected to existing browser session")
-                logger.info(f"🌐 Current URL: {self.driver.current_url}")
+                logger.info("✅ Successfully reconnected to existing browser session")
+                logger.info("🌐 Current URL: %s", self.driver.current_url)
                 return True
             else:
-                logger.warning(f"URL mismatch. Expected: {current_url}, Got: {self.driver.current_url}")
+                logger.warning("URL mismatch. Expected: %s, Got: %s", current_url, self.driver.current_url)
                 # Try to navigate to the expected URL
                 if current_url:
                     self.driver.get(current_url)
                     time.sleep(2)
-                    logger.info(f"🔄 Navigated to expected URL: {current_url}")
+                    logger.info("🔄 Navigated to expected URL: %s", current_url)
                 return True
                 
         except Exception as e:
-            logger.error(f"❌ Failed to reconnect to existing session: {e}")
+            logger.error("❌ Failed to reconnect to existing session: %s", e)
             return False
     
     def find_chrome_debugger_port(self, browser_pid):
         """Find Chrome debugger port for given PID"""
+        import psutil
+        import requests
+
         try:
             # Common Chrome debugger ports
             common_ports = [9222, 9223, 9224, 9225, 9226]
@@ -163,7 +264,7 @@ class BankTransferAutomation:
                 try:
                     response = requests.get(f"http://127.0.0.1:{port}/json", timeout=1)
                     if response.status_code == 200:
-                        logger.info(f"✅ Found Chrome debugger on port {port}")
+                        logger.info("✅ Found Chrome debugger on port %s", port)
                         return port
                 except:
                     continue
@@ -179,21 +280,21 @@ class BankTransferAutomation:
                     if port_end == -1:
                         port_end = len(cmdline)
                     port = int(cmdline[port_start:port_end])
-                    logger.info(f"✅ Extracted debugger port from process: {port}")
+                    logger.info("✅ Extracted debugger port from process: %s", port)
                     return port
             except Exception as e:
-                logger.warning(f"Could not extract port from process: {e}")
+                logger.warning("Could not extract port from process: %s", e)
             
             return None
             
         except Exception as e:
-            logger.error(f"Error finding debugger port: {e}")
+            logger.error("Error finding debugger port: %s", e)
             return None
     
     def perform_transfer(self, transfer_data, bank_config):
         """Main method to perform bank transfer automation"""
         try:
-            logger.info(f"Starting transfer automation for {bank_config['name']}")
+            logger.info("Starting transfer automation for %s", bank_config['name'])
             
             # Setup driver
             self.setup_driver()
@@ -222,8 +323,8 @@ class BankTransferAutomation:
                     success = self.verify_transfer_success(bank_config)
                     status = success.get("status", False)
                     message = success.get("message", "")
-                    logger.info(f"Transfer success status: {success}")
-                    logger.info(f"Transfer success status: {status}, message: {message}")
+                    logger.info("Transfer success status: %s", success)
+                    logger.info("Transfer success status: %s, message: %s", status, message)
 
                     if status:
                         transaction_id = self.generate_transaction_id()
@@ -235,7 +336,7 @@ class BankTransferAutomation:
                             'details': {
                                 'amount': transfer_data['amount'],
                                 'receiverIban': transfer_data['receiverIban'],
-                                'fee': self.calculate_fee(transfer_data['amount'])
+                                'fee': self.calculate_fee(transfer_data['amount'], bank_config)
                             }
                         }
                     else:
@@ -259,17 +360,16 @@ class BankTransferAutomation:
                     
                     # Store session with proper data types
                     if session_manager.store_session(self.session_id, session_data_info):
-                        logger.info(f"✅ Session {self.session_id} stored successfully")
+                        logger.info("✅ Session %s stored successfully", self.session_id)
                     else:
-                        logger.error(f"❌ Failed to store session {self.session_id}")
+                        logger.error("❌ Failed to store session %s", self.session_id)
                     
-                    logger.info(f"🔐 OTP required - session {self.session_id} kept alive")
-                    logger.info(f"🌐 Browser PID: {self.browser_pid}")
-                    logger.info(f"🌐 Current URL: {self.driver.current_url}")
-                    logger.info(f"📊 Active sessions: {session_manager.list_active_sessions()}")
+                    logger.info("🔐 OTP required - session %s kept alive", self.session_id)
+                    logger.info("🌐 Browser PID: %s", self.browser_pid)
+                    logger.info("🌐 Current URL: %s", self.driver.current_url)
                     
                     # Start OTP monitoring thread to keep process alive
-                    logger.info(f"🔄 Starting OTP monitor thread...")
+                    logger.info("🔄 Starting OTP monitor thread...")
                     self.start_otp_monitor_thread()
                     
                     return {
@@ -298,14 +398,14 @@ class BankTransferAutomation:
                     'details': {
                         'amount': transfer_data['amount'],
                         'receiverIban': transfer_data['receiverIban'],
-                        'fee': self.calculate_fee(transfer_data['amount'])
+                        'fee': self.calculate_fee(transfer_data['amount'], bank_config)
                     }
                 }
             else:
                 raise Exception(message if message else "Transfer verification failed")
                 
         except Exception as e:
-            logger.error(f"Transfer failed: {e}")
+            logger.error("Transfer failed: %s", e)
             self.take_screenshot_on_error()
             # Clean up session if it exists
             if self.session_id:
@@ -327,7 +427,7 @@ class BankTransferAutomation:
         
         session_data = session_manager.get_session(session_id)
         if not session_data:
-            logger.error(f"❌ Session {session_id} not found")
+            logger.error("❌ Session %s not found", session_id)
             return {
                 'success': False,
                 'message': 'Session not found',
@@ -337,12 +437,12 @@ class BankTransferAutomation:
         bank_config = session_data['bank_config']
         browser_pid = session_data.get('browser_pid')
 
-        logger.info(f"Continuing with existing browser session PID: {browser_pid}")
-        logger.info(f"Continuing with existing session ID: {session_id}") 
+        logger.info("Continuing with existing browser session PID: %s", browser_pid)
+        logger.info("Continuing with existing session ID: %s", session_id) 
         
         # Check if browser is still alive
         if not session_manager.is_browser_alive(browser_pid):
-            logger.error(f"❌ Browser process {browser_pid} is no longer alive")
+            logger.error("❌ Browser process %s is no longer alive", browser_pid)
             session_manager.update_session(session_id, {'status': 'failed'})
             return {
                 'success': False,
@@ -350,16 +450,16 @@ class BankTransferAutomation:
                 'timestamp': datetime.now().isoformat()
             }
         
-        logger.info(f"🔐 Processing OTP for session {session_id}")
+        logger.info("🔐 Processing OTP for session %s", session_id)
         try:
             
-            logger.info(f"🌐 Using existing browser PID: {browser_pid}")
+            logger.info("🌐 Using existing browser PID: %s", browser_pid)
             
             # Try to reconnect to existing browser session
             if not self.reconnect_to_existing_session(session_data):
                 logger.warning("Could not reconnect to existing session, creating new browser")
                 # Fallback: create new session and re-authenticate
-                self.setup_driver()
+                self.setup_driver(bank_registry.plan_for(bank_config).launch_profile)
                 self.navigate_to_login(bank_config['loginUrl'])
                 self.login(session_data['transfer_data']['username'], 
                                session_data['transfer_data']['password'], bank_config)
@@ -379,7 +479,7 @@ class BankTransferAutomation:
 
             if status:
                 transaction_id = self.generate_transaction_id()
-                logger.info(f"✅ Transfer completed successfully for session {session_id}")
+                logger.info("✅ Transfer completed successfully for session %s", session_id)
                 session_manager.update_session(session_id, {'status': 'completed'})
                 return {
                     'success': True,
@@ -389,11 +489,11 @@ class BankTransferAutomation:
                     'details': {
                         'amount': session_data['transfer_data']['amount'],
                         'receiverIban': session_data['transfer_data']['receiverIban'],
-                        'fee': self.calculate_fee(session_data['transfer_data']['amount'])
+                        'fee': self.calculate_fee(session_data['transfer_data']['amount'], bank_config)
                     }
                 }
             else:
-                logger.error(f"❌ Transfer failed after OTP for session {session_id}")
+                logger.error("❌ Transfer failed after OTP for session %s", session_id)
                 session_manager.update_session(session_id, {'status': 'failed'})
                 return {
                     'success': False,
@@ -402,7 +502,7 @@ class BankTransferAutomation:
                 }
                 
         except Exception as e:
-            logger.error(f"❌ OTP processing failed for session {session_id}: {e}")
+            logger.error("❌ OTP processing failed for session %s: %s", session_id, e)
             session_manager.update_session(session_id, {'status': 'failed'})
             return {
                 'success': False,
@@ -416,10 +516,13 @@ class BankTransferAutomation:
                     self.driver.quit()
                     logger.info("✅ Browser cleaned up by OTP continuation")
             except Exception as e:
-                logger.error(f"❌ Error cleaning up browser: {e}")
+                logger.error("❌ Error cleaning up browser: %s", e)
 
     def find_chrome_debugger_port(self, browser_pid):
         """Find Chrome debugger port for given PID"""
+        import psutil
+        import requests
+
         try:
             # Common Chrome debugger ports
             common_ports = [9222, 9223, 9224, 9225, 9226]
@@ -428,7 +531,7 @@ class BankTransferAutomation:
                 try:
                     response = requests.get(f"http://127.0.0.1:{port}/json", timeout=1)
                     if response.status_code == 200:
-                        logger.info(f"✅ Found Chrome debugger on port {port}")
+                        logger.info("✅ Found Chrome debugger on port %s", port)
                         return port
                 except:
                     continue
@@ -444,40 +547,72 @@ class BankTransferAutomation:
                     if port_end == -1:
                         port_end = len(cmdline)
                     port = int(cmdline[port_start:port_end])
-                    logger.info(f"✅ Extracted debugger port from process: {port}")
+                    logger.info("✅ Extracted debugger port from process: %s", port)
                     return port
             except Exception as e:
-                logger.warning(f"Could not extract port from process: {e}")
+                logger.warning("Could not extract port from process: %s", e)
             
             return None
             
         except Exception as e:
-            logger.error(f"Error finding debugger port: {e}")
+            logger.error("Error finding debugger port: %s", e)
             return None
         
 
     def perform_transfer(self, transfer_data, bank_config):
         """Main method to perform bank transfer automation"""
         try:
-            logger.info(f"Starting transfer automation for {bank_config['name']}")
+            logger.info("Starting transfer automation for %s", bank_config['name'])
+            self.started_at = time.monotonic()
+            self.deadline = Deadline(TRANSFER_DEADLINE_SECONDS, self.deadline_at)
+            self.otp_submitted = False
+            self.session_id = self.generate_session_id()
+
+            # Bad IBAN or amount: reject before any browser is launched
+            validation_errors = validate_transfer(transfer_data, bank_config)
+            if validation_errors:
+                logger.warning("Transfer rejected by validation: %s", [e['code'] for e in validation_errors])
+                return {
+                    'success': False,
+                    'message': validation_errors[0]['message'],
+                    'validationErrors': validation_errors,
+                    'timestamp': datetime.now().isoformat()
+                }
+
+            # Portal known to be down: fail fast without starting a browser
+            if not bank_health.allow(bank_config['id']):
+                logger.warning("🔌 %s circuit open, refusing transfer", bank_config['name'])
+                self.emit_event('bank_unavailable')
+                return {
+                    'success': False,
+                    'bankUnavailable': True,
+                    'message': 'Banco temporariamente indisponível',
+                    'timestamp': datetime.now().isoformat()
+                }
+
+            # A pooled browser already on this bank's login page needs no new memory
+            warm = warm_pool.check_out(self, bank_config)
+
+            # No memory left for another browser on this host
+            if not warm and not resource_governor.admit(self):
+                bank_health.release_trial(bank_config['id'])
+                self.emit_event('resources_exhausted')
+                return {
+                    'success': False,
+                    'resourcesExhausted': True,
+                    'message': 'Servidor ocupado; tente novamente dentro de momentos',
+                    'timestamp': datetime.now().isoformat()
+                }
             
             # Setup driver
-            self.setup_driver()
-            
-            # Step 1: Navigate to bank login page
-            self.navigate_to_login(bank_config['loginUrl'])
-            
-            # Step 2: Perform login
-            self.login(transfer_data['username'], transfer_data['password'], bank_config)
-            
-            # Step 3: Navigate to transfer section
-            self.navigate_to_transfers(bank_config)
-            
-            # Step 4: Fill transfer form
-            self.fill_transfer_form(transfer_data, bank_config)
-            
-            # Step 5: Confirm transfer
-            confirmation_result = self.confirm_transfer(bank_config)
+            self.emit_event('step_started', step='browser')
+            if not warm:
+                self.setup_driver(bank_registry.plan_for(bank_config).launch_profile)
+            self.emit_event('step_finished', step='browser', warm=warm)
+
+            # Steps 1-5: login, transfer page, form, confirm (checkpointed)
+            self.run_transfer_steps(transfer_data, bank_config)
+            confirmation_result = self.finish_confirmation(bank_config)
             
             # Handle OTP requirement
             if confirmation_result == 'OTP_REQUIRED':
@@ -485,11 +620,13 @@ class BankTransferAutomation:
                     # This is a continuation with OTP code
                     logger.info("🔐 Continuing with provided OTP code")
                     self.submit_otp(transfer_data['otpCode'], bank_config)
+                    self.emit_event('verifying')
                     success = self.verify_transfer_success(bank_config)
                     status = success.get("status", False)
                     message = success.get("message", "")
 
                     if status:
+                        self.clear_checkpoints()
                         transaction_id = self.generate_transaction_id()
                         return {
                             'success': True,
@@ -499,24 +636,30 @@ class BankTransferAutomation:
                             'details': {
                                 'amount': transfer_data['amount'],
                                 'receiverIban': transfer_data['receiverIban'],
-                                'fee': self.calculate_fee(transfer_data['amount'])
+                                'fee': self.calculate_fee(transfer_data['amount'], bank_config)
                             }
                         }
                     else:
                         raise Exception(message if message else "Transfer verification failed after OTP")
                 else:
                     # OTP required - keep session alive and wait
-                    self.session_id = self.generate_session_id()
+                    self.checkpoint('otp_pending', transfer_data, bank_config, status='waiting_otp')
+                    self.emit_event('otp_required')
                     active_sessions[self.session_id] = {
                         'driver': self.driver,
                         'bank_config': bank_config,
                         'transfer_data': transfer_data,
                         'timestamp': datetime.now(),
-                        'automation_instance': self
+                        'automation_instance': self,
+                        'monitor_thread': None
                     }
                     
-                    logger.info(f"🔐 OTP required - session {self.session_id} kept alive")
-                    
+                    logger.info("🔐 OTP required - session %s kept alive", self.session_id)
+
+                    # This process now stays alive for the OTP wait; expire
+                    # stale session files in the background meanwhile
+                    session_manager.start_expiry_sweeper()
+
                     # Start session monitor thread
                     monitor_thread = threading.Thread(
                         target=self.monitor_session,
@@ -524,13 +667,15 @@ class BankTransferAutomation:
                         daemon=True
                     ) 
 
+                    active_sessions[self.session_id]['monitor_thread'] = monitor_thread
                     monitor_thread.start()
                     
                     return {
                         'success': False,
                         'requiresOtp': True,
                         'sessionId': self.session_id,
-                        'browserPid': self.driver.service.process.pid,
+                        'browserPid': self.browser_pid,
+                        'debuggerPort': self.debugger_port,
                         'driverSessionId': self.driver.session_id,
                         'currentUrl': self.driver.current_url,
                         'otpMessage': 'Código de verificação necessário. Verifique o seu telemóvel.',
@@ -539,10 +684,12 @@ class BankTransferAutomation:
                     }
             else:
                 # Step 6: Verify success
+                self.emit_event('verifying')
                 success = self.verify_transfer_success(bank_config)
                 status = success.get("status", False) 
 
             if status:
+                self.clear_checkpoints()
                 transaction_id = self.generate_transaction_id()
                 return {
                     'success': True,
@@ -552,79 +699,293 @@ class BankTransferAutomation:
                     'details': {
                         'amount': transfer_data['amount'],
                         'receiverIban': transfer_data['receiverIban'],
-                        'fee': self.calculate_fee(transfer_data['amount'])
+                        'fee': self.calculate_fee(transfer_data['amount'], bank_config)
                     }
                 }
             else:
                 raise Exception("Transfer verification failed")
                 
+        except DeadlineExceeded as e:
+            self.record_portal_failure(bank_config, e)
+            return self.abandon_transfer(e)
         except Exception as e:
-            logger.error(f"Transfer failed: {e}")
+            self.record_portal_failure(bank_config, e)
+            if self.deadline.expired():
+                return self.abandon_transfer(e)
+            logger.error("Transfer failed: %s", e)
             self.take_screenshot_on_error()
             # Clean up session if it exists
             if self.session_id and self.session_id in active_sessions:
                 del active_sessions[self.session_id]
+            if self.checkpoints:
+                session_manager.update_session(self.session_id, {'status': 'failed'})
             return {
                 'success': False,
                 'message': f'Erro na transferência',
                 'timestamp': datetime.now().isoformat()
             }
-        # Don't cleanup if OTP is required - session needs to stay alive
-        # finally:
-        #     self.cleanup()
+        finally:
+            # A session parked for its OTP keeps its browser until monitor_session ends it
+            if self.session_id not in active_sessions:
+                self.cleanup()
+
+    def record_portal_failure(self, bank_config, error):
+        """Count a failure against the bank's breaker if its portal was at fault
+
+        Only failures after the browser came up and before login completed
+        are counted; later ones are usually about the transfer itself. A
+        failure before the browser came up hands back a half-open trial.
+        """
+        if self.checkpoints:
+            return
+        if self.driver:
+            bank_health.record_failure(bank_config['id'], error)
+        else:
+            bank_health.release_trial(bank_config['id'])
+
+    def abandon_transfer(self, error):
+        """Give up on a transfer whose budget ran out and release its browser"""
+        logger.warning("⏰ Transfer %s abandoned: %s", self.session_id, error)
+        self.emit_event('deadline_exceeded')
+        active_sessions.pop(self.session_id, None)
+        if self.checkpoints:
+            session_manager.update_session(self.session_id, {'status': 'failed'})
+        self.cleanup()
+        if self.otp_submitted or self.reached_bank({}):
+            return self.unknown_outcome()
+        return {
+            'success': False,
+            'deadlineExceeded': True,
+            'message': 'Tempo limite da transferência excedido',
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def unknown_outcome(self):
+        """Result of a transfer given up after the bank may have acted on it"""
+        return {
+            'success': False,
+            'sessionId': self.session_id,
+            'unknownOutcome': True,
+            'message': UNKNOWN_OUTCOME_MESSAGE,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def run_transfer_steps(self, transfer_data, bank_config):
+        """Run login through confirm, resuming from the last checkpoint on failure"""
+        stages = (
+            ('login', 'logged_in', lambda: (
+                self.navigate_to_login(bank_config['loginUrl']),
+                self.login(transfer_data['username'], transfer_data['password'], bank_config),
+            )),
+            ('navigate', 'on_transfer_page', lambda: self.navigate_to_transfers(bank_config)),
+            ('fill_form', 'form_filled', lambda: self.fill_transfer_form(transfer_data, bank_config)),
+            ('confirm', 'confirmed', lambda: self.submit_confirmation(bank_config)),
+        )
+        retries = 0
+        while True:
+            done = [c['name'] for c in self.checkpoints]
+            try:
+                for step, name, run in stages:
+                    if name not in done:
+                        self.emit_event('step_started', step=step)
+                        if step in SUBMITTING_CHECKPOINTS:
+                            self.checkpoint(SUBMITTING_CHECKPOINTS[step], transfer_data, bank_config)
+                        run()
+                        self.checkpoint(name, transfer_data, bank_config)
+                        if name == 'logged_in':
+                            bank_health.record_success(bank_config['id'])
+                        self.emit_event('step_finished', step=step, checkpoint=name)
+                return
+            except Exception as e:
+                resuming = retries < STEP_RETRIES and self.can_resume()
+                self.emit_event('step_failed', error=str(e), retrying=resuming)
+                if not resuming:
+                    raise
+                retries += 1
+                logger.warning("🔁 Step after %s failed (%s); resuming in place (%s/%s)",
+                               self.checkpoints[-1]['name'], e, retries, STEP_RETRIES)
+                self.restore_checkpoint_page()
+
+    def emit_event(self, event, **fields):
+        """Report progress to on_event: {'event', 'sessionId', 'elapsedMs', 'timestamp', ...}"""
+        if self.recorder and event in SNAPSHOT_EVENTS:
+            self.recorder.snapshot(f"{event}-{fields['step']}" if 'step' in fields else event)
+        if not self.on_event:
+            return
+        try:
+            self.on_event({
+                'event': event,
+                'sessionId': self.session_id,
+                'elapsedMs': int((time.monotonic() - self.started_at) * 1000),
+                'timestamp': datetime.now().isoformat(),
+                **fields
+            })
+        except Exception as e:
+            logger.warning("Could not emit %s event: %s", event, e)
+
+    def checkpoint(self, name, transfer_data, bank_config, status='in_progress'):
+        """Record a completed step in the session store"""
+        entry = {'name': name, 'url': self.driver.current_url, 'at': datetime.now().isoformat()}
+        self.checkpoints.append(entry)
+        logger.info("📍 Checkpoint %s", name)
+        session_manager.store_session(self.session_id, {
+            'bank_config': bank_config,
+            'transfer_data': redact(transfer_data),
+            'status': status,
+            'driver_session_id': self.driver.session_id,
+            'browser_pid': self.browser_pid,
+            'current_url': entry['url'],
+            'checkpoint': name,
+            'checkpoints': self.checkpoints,
+            'owner_node': node_control.NODE_ID,
+            'control_endpoint': node_control.control_endpoint(),
+        })
+
+    def can_resume(self):
+        """True if the last checkpoint is safe to resume from on a live browser"""
+        if not self.checkpoints or self.checkpoints[-1]['name'] not in RESUMABLE_CHECKPOINTS:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def restore_checkpoint_page(self):
+        """Put the browser back on the page of the last checkpoint
+
+        If the page moved on since then (or the form may have been lost), go
+        back to the page after login and redo navigation and the form, which
+        are safe to repeat.
+        """
+        last = self.checkpoints[-1]
+        if self.driver.current_url == last['url']:
+            return
+        del self.checkpoints[1:]
+        self.driver.get(self.checkpoints[0]['url'])
+
+    def clear_checkpoints(self):
+        """Drop the checkpoint record of a finished transfer"""
+        if self.checkpoints:
+            session_manager.delete_session(self.session_id)
+            self.checkpoints = []
     
     def monitor_session(self, session_id):
         """Monitor session and cleanup after timeout"""
-        logger.info(f"🕐 Starting session monitor for {session_id}")
+        logger.info("🕐 Starting session monitor for %s", session_id)
         
-        # Wait for 5 minutes (300 seconds) - same as frontend countdown
-        timeout = 300
+        # Wait for OTP_TIMEOUT or whatever is left of the transfer's budget
+        timeout = min(OTP_TIMEOUT, self.deadline.remaining())
         start_time = datetime.now()
+        logger.info("Waiting for OTP in queue for session %s...", session_id)
         
-        while (datetime.now() - start_time).seconds < timeout:
+        while (datetime.now() - start_time).total_seconds() < timeout:
             if session_id not in active_sessions:
-                logger.info(f"🔚 Session {session_id} completed or removed")
+                logger.info("🔚 Session %s completed or removed", session_id)
+                self.release_idempotency()
                 return
 
-            logger.info(f"🔚 OTP QUEUE: {self.otp_queue}")
             # Check if OTP was submitted
             try:
-                logger.info(f"Waiting for OTP in queue for session {session_id}...")
                 otp_code = self.otp_queue.get(timeout=1)
                 if otp_code:
-                    logger.info(f"🔐 OTP received for session {session_id}")
+                    logger.info("🔐 OTP received for session %s", session_id)
                     # Process OTP in the existing session
-                    self.process_otp_in_session(session_id, otp_code)
+                    result = self.process_otp_in_session(session_id, otp_code)
+                    idempotency.complete(self.idempotency_key, result)
+                    self.otp_results.put(result)
                     return
             except queue.Empty:
                 continue
         
         # Timeout reached - cleanup session
-        logger.warning(f"⏰ Session {session_id} timed out")
+        logger.warning("⏰ Session %s timed out", session_id)
+        session_manager.update_session(session_id, {'status': 'failed'})
+        self.release_idempotency()
         self.cleanup_session(session_id)
+
+    def deliver_otp(self, session_id, otp_code, timeout=120):
+        """Hand an OTP to this process's monitor thread and wait for the result"""
+        self.otp_queue.put(otp_code)
+        try:
+            return self.otp_results.get(timeout=timeout)
+        except queue.Empty:
+            return {
+                'success': False,
+                'message': f'No OTP result for session {session_id} within {timeout}s',
+                'timestamp': datetime.now().isoformat()
+            }
     
     def process_otp_in_session(self, session_id, otp_code):
         """Process OTP code in existing session"""
         if session_id not in active_sessions:
-            logger.error(f"❌ Session {session_id} not found")
-            return
+            logger.error("❌ Session %s not found", session_id)
+            return {
+                'success': False,
+                'message': 'Session not found',
+                'timestamp': datetime.now().isoformat()
+            }
         
         session = active_sessions[session_id]
+        session['processing'] = True
         bank_config = session['bank_config']
+        transfer_data = session['transfer_data']
         
         try:
-            logger.info(f"🔐 Processing OTP for session {session_id}")
+            logger.info("🔐 Processing OTP for session %s", session_id)
+            self.emit_event('otp_received')
+            # From here on the bank may act on the transfer, so it must not be replayed
+            session_manager.update_session(session_id, {'status': 'processing_otp'})
             self.submit_otp(otp_code, bank_config)
+            self.emit_event('verifying')
             success = self.verify_transfer_success(bank_config)
             status = success.get("status", False) 
+            message = success.get("message", "")
             
             if status:
-                logger.info(f"✅ Transfer completed successfully for session {session_id}")
-            else:
-                logger.error(f"❌ Transfer failed after OTP for session {session_id}")
+                logger.info("✅ Transfer completed successfully for session %s", session_id)
+                self.clear_checkpoints()
+                return {
+                    'success': True,
+                    'sessionId': session_id,
+                    'transactionId': self.generate_transaction_id(),
+                    'message': 'Transferência realizada com sucesso',
+                    'timestamp': datetime.now().isoformat(),
+                    'details': {
+                        'amount': transfer_data['amount'],
+                        'receiverIban': transfer_data['receiverIban'],
+                        'fee': self.calculate_fee(transfer_data['amount'], bank_config)
+                    }
+                }
+
+            logger.error("❌ Transfer failed after OTP for session %s", session_id)
+            return {
+                'success': False,
+                'sessionId': session_id,
+                'message': message if message else "Transfer verification failed after OTP",
+                'timestamp': datetime.now().isoformat()
+            }
                 
+        except DeadlineExceeded as e:
+            logger.warning("⏰ OTP processing for session %s abandoned: %s", session_id, e)
+            self.emit_event('deadline_exceeded')
+            if self.otp_submitted:
+                return self.unknown_outcome()
+            return {
+                'success': False,
+                'sessionId': session_id,
+                'deadlineExceeded': True,
+                'message': 'Tempo limite da transferência excedido',
+                'timestamp': datetime.now().isoformat()
+            }
         except Exception as e:
-            logger.error(f"❌ OTP processing failed for session {session_id}: {e}")
+            logger.error("❌ OTP processing failed for session %s: %s", session_id, e)
+            return {
+                'success': False,
+                'sessionId': session_id,
+                'message': f'Erro na verificação OTP: {str(e)}',
+                'timestamp': datetime.now().isoformat()
+            }
         finally:
             self.cleanup_session(session_id)
     
@@ -634,58 +995,330 @@ class BankTransferAutomation:
             session = active_sessions[session_id]
             try:
                 if session['driver']:
+                    if self.recorder:
+                        self.recorder.close()
                     session['driver'].quit()
-                    logger.info(f"🧹 Browser session {session_id} cleaned up")
+                    resource_governor.release(self)
+                    logger.info("🧹 Browser session %s cleaned up", session_id)
             except Exception as e:
-                logger.error(f"Error cleaning up session {session_id}: {e}")
+                logger.error("Error cleaning up session %s: %s", session_id, e)
             finally:
                 del active_sessions[session_id]
+            if session['driver'] is self.driver:
+                self.driver = None
+                self.remove_user_data_dir()
     
+    def reached_bank(self, result):
+        """True if a transfer may have been submitted, so it must not run again"""
+        reached = ('confirming', 'confirmed')
+        return bool(result.get('success') or result.get('requiresOtp')
+                    or any(c['name'] in reached for c in self.checkpoints))
+
+    def is_idle(self):
+        """True while the browser only sits waiting for an OTP"""
+        session = active_sessions.get(self.session_id)
+        return bool(session) and not session.get('batch') and not session.get('processing')
+
+    def recycle(self):
+        """Close an idle browser to free its memory, giving up its transfer"""
+        logger.warning("♻️ Session %s recycled while waiting for OTP", self.session_id)
+        self.emit_event('recycled')
+        session_manager.update_session(self.session_id, {'status': 'failed'})
+        self.release_idempotency()
+        self.cleanup_session(self.session_id)
+
+    def release_idempotency(self):
+        """Release the transfer's idempotency key once, when its parked session is given up
+
+        The stored requiresOtp result would otherwise point retries at a closed
+        browser. Only the first caller releases, so a retry that claimed the
+        key since is not released too.
+        """
+        key, self.idempotency_key = self.idempotency_key, None
+        idempotency.release(key)
+
+    def perform_batch(self, account, beneficiaries, bank_config, otp_timeout=OTP_TIMEOUT):
+        """Log in once and run a list of transfers, yielding one result per item
+
+        Items that need an OTP (and carry no otpCode) are parked in their own
+        browser tab; later items continue in a fresh tab of the same logged-in
+        browser. Parked items are resumed via deliver_batch_otp and their
+        results are yielded as they complete, up to otp_timeout seconds after
+        the last item ran.
+        """
+        self.parked = {}
+        self.batch_otp_queue = queue.Queue()
+
+        # Reject invalid rows up front; only valid ones get browser time
+        valid = []
+        for index, (item, errors) in enumerate(zip(beneficiaries, validate_payouts(beneficiaries, bank_config))):
+            if errors:
+                result = self.batch_item_result(index, item, False, errors[0]['message'])
+                result['validationErrors'] = errors
+                yield result
+            else:
+                valid.append((index, item))
+        if not valid:
+            return
+
+        # Quote every valid row up front in one call
+        fees = fee_quotes.quote_many([item['amount'] for _, item in valid], bank_config.get('id'))
+        self.batch_fees = {index: float(fee) for (index, _), fee in zip(valid, fees)}
+
+        if not resource_governor.admit(self):
+            for index, item in valid:
+                yield self.batch_item_result(index, item, False, 'Servidor ocupado; tente novamente dentro de momentos')
+            return
+
+        try:
+            logger.info("Starting batch of %s transfers for %s", len(valid), bank_config['name'])
+            self.setup_driver(bank_registry.plan_for(bank_config).launch_profile)
+            self.navigate_to_login(bank_config['loginUrl'])
+            self.login(account['username'], account['password'], bank_config)
+            self.home_url = self.driver.current_url
+            self.work_window = self.driver.current_window_handle
+        except Exception as e:
+            logger.error("Batch login failed: %s", e)
+            for index, item in valid:
+                yield self.batch_item_result(index, item, False, f'Erro no login: {str(e)}')
+            self.cleanup()
+            return
+
+        try:
+            for index, item in valid:
+                yield from self.drain_batch_otps()
+                yield self.run_batch_item(index, item, account, bank_config)
+
+            deadline = time.time() + otp_timeout
+            while self.parked and time.time() < deadline:
+                yield from self.drain_batch_otps(timeout=min(1, deadline - time.time()))
+
+            for session_id, parked in list(self.parked.items()):
+                logger.warning("⏰ Batch item %s timed out waiting for OTP", parked['index'])
+                del self.parked[session_id]
+                active_sessions.pop(session_id, None)
+                yield self.batch_item_result(parked['index'], parked['item'], False, 'OTP não recebido a tempo')
+        finally:
+            for session_id in list(self.parked):
+                active_sessions.pop(session_id, None)
+            self.cleanup()
+
+    def run_batch_item(self, index, item, account, bank_config):
+        """Run one beneficiary of a batch on the logged-in browser"""
+        transfer_data = {**item, 'username': account['username'], 'password': account['password']}
+        try:
+            # The current tab holds a parked OTP page; continue in a new one
+            if any(p['window'] == self.work_window for p in self.parked.values()):
+                self.driver.switch_to.new_window('tab')
+                self.work_window = self.driver.current_window_handle
+                self.driver.get(self.home_url)
+
+            self.navigate_to_transfers(bank_config)
+            self.fill_transfer_form(transfer_data, bank_config)
+            confirmation_result = self.confirm_transfer(bank_config)
+
+            if confirmation_result == 'OTP_REQUIRED':
+                if not item.get('otpCode'):
+                    session_id = self.generate_session_id()
+                    self.parked[session_id] = {'window': self.work_window, 'index': index, 'item': item}
+                    active_sessions[session_id] = {
+                        'driver': self.driver,
+                        'bank_config': bank_config,
+                        'transfer_data': transfer_data,
+                        'timestamp': datetime.now(),
+                        'automation_instance': self,
+                        'batch': True
+                    }
+                    logger.info("🔐 Batch item %s parked for OTP as %s", index, session_id)
+                    result = self.batch_item_result(index, item, False, 'Verificação OTP necessária')
+                    result.update({'requiresOtp': True, 'sessionId': session_id})
+                    return result
+                self.submit_otp(item['otpCode'], bank_config)
+
+            success = self.verify_transfer_success(bank_config)
+            return self.batch_item_result(index, item, success.get("status", False), success.get("message", ""))
+
+        except Exception as e:
+            logger.error("Batch item %s failed: %s", index, e)
+            self.take_screenshot_on_error()
+            return self.batch_item_result(index, item, False, f'Erro na transferência: {str(e)}')
+
+    def deliver_batch_otp(self, session_id, otp_code, timeout=120):
+        """Queue an OTP for a parked batch item and wait for its result"""
+        reply = queue.Queue()
+        self.batch_otp_queue.put((session_id, otp_code, reply))
+        try:
+            return reply.get(timeout=timeout)
+        except queue.Empty:
+            return {
+                'success': False,
+                'message': f'No OTP result for session {session_id} within {timeout}s',
+                'timestamp': datetime.now().isoformat()
+            }
+
+    def drain_batch_otps(self, timeout=0):
+        """Resume parked items whose OTP has arrived, yielding their results"""
+        while True:
+            try:
+                if timeout:
+                    session_id, otp_code, reply = self.batch_otp_queue.get(timeout=timeout)
+                    timeout = 0
+                else:
+                    session_id, otp_code, reply = self.batch_otp_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            result = self.resume_parked(session_id, otp_code)
+            reply.put(result)
+            yield result
+
+    def resume_parked(self, session_id, otp_code):
+        """Submit the OTP for a parked batch item in its own tab"""
+        parked = self.parked.pop(session_id, None)
+        session = active_sessions.pop(session_id, None)
+        if not parked or not session:
+            return {
+                'success': False,
+                'message': 'Session not found',
+                'timestamp': datetime.now().isoformat()
+            }
+
+        index, item = parked['index'], parked['item']
+        try:
+            self.driver.switch_to.window(parked['window'])
+            self.submit_otp(otp_code, session['bank_config'])
+            success = self.verify_transfer_success(session['bank_config'])
+            result = self.batch_item_result(index, item, success.get("status", False), success.get("message", ""))
+        except Exception as e:
+            logger.error("❌ OTP processing failed for batch item %s: %s", index, e)
+            result = self.batch_item_result(index, item, False, f'Erro na verificação OTP: {str(e)}')
+
+        # Close the finished tab unless it is the last one holding the login
+        try:
+            if len(self.driver.window_handles) > 1:
+                self.driver.close()
+                if parked['window'] == self.work_window:
+                    self.work_window = self.driver.window_handles[0]
+            self.driver.switch_to.window(self.work_window)
+        except Exception as e:
+            logger.warning("Could not restore working tab: %s", e)
+
+        result['sessionId'] = session_id
+        return result
+
+    def batch_item_result(self, index, item, status, message):
+        """Build the streamed result record for one batch item"""
+        result = {
+            'index': index,
+            'reference': item.get('reference'),
+            'success': bool(status),
+            'message': message,
+            'timestamp': datetime.now().isoformat()
+        }
+        if status:
+            result.update({
+                'transactionId': self.generate_transaction_id(),
+                'message': 'Transferência realizada com sucesso',
+                'details': {
+                    'amount': item['amount'],
+                    'receiverIban': item['receiverIban'],
+                    'fee': self.batch_fees.get(index)
+                }
+            })
+        return result
+
     def navigate_to_login(self, login_url):
         """Navigate to bank login page"""
-        logger.info(f"Navigating to: {login_url}")
+        if self.warm_url == login_url:
+            # Handed over by the warm pool already on this page
+            self.warm_url = None
+            logger.info("Already on login page: %s", login_url)
+            return
+        logger.info("Navigating to: %s", login_url)
+        self.driver.set_page_load_timeout(self.deadline.timeout(PAGE_LOAD_TIMEOUT, what='page load'))
         self.driver.get(login_url)
-        time.sleep(3)  # Wait for page to load
-        
+        self.deadline.sleep(3)  # Wait for page to load
+
+    def run_phase(self, plan, phase, values=None):
+        """Run the steps of one phase of a compiled bank plan
+
+        Returns False if a guard step stopped the phase early, True otherwise.
+        """
+        values = values or {}
+        for step in plan.phases.get(phase, ()):
+            if step.when and not values.get(step.when):
+                continue
+            try:
+                self.run_step(step, values)
+            except (TimeoutException, NoSuchElementException):
+                # A wait cut short by the budget is not a missing element
+                self.deadline.check(f"{phase}.{step.selector_key}")
+                if step.guard:
+                    logger.info("%s not present, skipping rest of %s", step.selector_key, phase)
+                    return False
+                if step.optional:
+                    logger.info("%s not found, skipping...", step.selector_key)
+                    continue
+                raise
+            except Exception:
+                if step.optional:
+                    logger.info("%s step failed, skipping...", step.selector_key)
+                    continue
+                raise
+            if step.pause and step.action != 'copy_labels':
+                self.deadline.sleep(step.pause)
+        return True
+
+    def run_step(self, step, values):
+        """Execute a single plan step against the current page"""
+        if step.action == 'get':
+            self.driver.get(step.selector)
+            return
+
+        value = None
+        if step.action == 'type':
+            value = values.get(step.value)
+            if value is None:
+                value = step.default
+            if value is None:
+                raise Exception(f"No value for {step.value}")
+
+        if self.cdp:
+            timeout = self.deadline.timeout(step.timeout or self.timeout, what=step.selector_key) if step.wait else 0
+            self.cdp.run_step(step, value, timeout)
+            return
+
+        element = self.locate(step)
+
+        if step.action == 'type':
+            element.clear()
+            element.send_keys(str(value))
+        elif step.action == 'click':
+            element.click()
+        elif step.action == 'copy_labels':
+            # Copy each label's text into its paired input (challenge grids)
+            labels = element.find_elements(By.TAG_NAME, "label")
+            inputs = element.find_elements(By.TAG_NAME, "input")
+            for label, input_field in zip(labels, inputs):
+                input_field.clear()
+                input_field.send_keys(label.text.strip())
+                self.deadline.sleep(step.pause)
+
+    def locate(self, step):
+        """Find the element for a plan step, waiting if the step asks for it"""
+        if step.wait:
+            timeout = self.deadline.timeout(step.timeout or self.timeout, what=step.selector_key)
+            return wait_for_any(self.driver, [(step.selector, step.wait)], timeout).element
+        return self.driver.find_element(By.CSS_SELECTOR, step.selector)
+
     def login(self, username, password, bank_config):
         """Perform login using provided credentials"""
         logger.info("Performing login...")
-        
+        plan = bank_registry.plan_for(bank_config)
+
         try:
-            # Wait for username field and enter credentials
-            username_field = WebDriverWait(self.driver, self.timeout).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, bank_config['selectors']['usernameField']))
-            )
-            username_field.clear()
-            username_field.send_keys(username)
-            time.sleep(1)
-            
-            # Enter password
-            password_field = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['passwordField'])
-            password_field.clear()
-            password_field.send_keys(password)
-            time.sleep(1)
-            
-            # Click login button
-            login_button = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['loginButton'])
-            login_button.click()
-
-            # Handle special case for Banco BAI SSD confirmation
-            if bank_config['id'] == 'bai':
-                ssd_confirm_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, bank_config['selectors']['ssdConfirmation'])) 
-                )
-                ssd_confirm_button.click()
-                time.sleep(3)
-
-                ack_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, bank_config['selectors']['ssdAcknowledgmentBtn']))
-                )
-                ack_button.click()
-                time.sleep(3) 
-                logger.warning(f"SSD acknowledgment step skipped or failed: {e}")
-                logger.info("Login completed")
-            
+            self.run_phase(plan, 'login', {'username': username, 'password': password})
+            logger.info("Login completed")
         except TimeoutException:
             raise Exception("Login form elements not found - page may have changed")
         except Exception as e:
@@ -694,81 +1327,58 @@ class BankTransferAutomation:
     def navigate_to_transfers(self, bank_config):
         """Navigate to transfer section"""
         logger.info("Navigating to transfers section...")
-        
+        plan = bank_registry.plan_for(bank_config)
+        learnable = not any(step.action == 'get' for step in plan.phases.get('navigate', ()))
+
+        if learnable and self.open_deep_link(plan):
+            return
+
+        start_url = self.driver.current_url
         try:
-            if bank_config['id'] == 'bfa':
-                transfer_menu = bank_config['selectors']['transferMenu']
-                self.driver.get(transfer_menu)
-            else:
-                transfer_menu = WebDriverWait(self.driver, self.timeout).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, bank_config['selectors']['transferMenu']))
-                ) 
-                transfer_menu.click()
-            time.sleep(3)
+            self.run_phase(plan, 'navigate')
             logger.info("Transfer section accessed")
-            
         except TimeoutException:
             raise Exception("Transfer menu not found - user may not be logged in")
+
+        # A menu that does not change the URL (single-page portals) has nothing to learn
+        if learnable and self.driver.current_url != start_url:
+            deep_links.record(plan.bank_id, self.driver.current_url)
+
+    def open_deep_link(self, plan):
+        """Open a bank's learned transfer form URL; False if none or it did not show the form"""
+        url = deep_links.lookup(plan.bank_id)
+        marker = next((step for step in plan.phases.get('fill_form', ())
+                       if step.wait and not step.optional), None)
+        if not url or marker is None:
+            return False
+
+        logger.info("🔗 Opening transfer form directly for %s", plan.bank_id)
+        landing_url = self.driver.current_url
+        timeout = self.deadline.timeout(DEEP_LINK_TIMEOUT, what='deep link')
+        try:
+            self.driver.get(url)
+            if self.cdp:
+                self.cdp.find(marker.selector, 'presence', timeout)
+            else:
+                wait_for_any(self.driver, [(marker.selector, 'presence')], timeout)
+        except (TimeoutException, NoSuchElementException):
+            self.deadline.check('deep link')
+            logger.info("🔗 Deep link did not show the transfer form, using the menu")
+            deep_links.invalidate(plan.bank_id, url)
+            # Back to the page login left us on, where the menu is
+            self.driver.get(landing_url)
+            return False
+        logger.info("Transfer section accessed")
+        return True
     
     def fill_transfer_form(self, transfer_data, bank_config):
         """Fill the transfer form with provided data"""
         logger.info("Filling transfer form...")
-        
-        try:
-            # Handle special case for Banco Atlântico IBAN tab
-            if bank_config['id'] == 'banco-atlantico' and 'clickIbanTabOpen' in bank_config['selectors']:
-                try:
-                    iban_tab = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['clickIbanTabOpen'])
-                    iban_tab.click()
-                    time.sleep(1)
-                except:
-                    logger.info("IBAN tab not found or already selected")
-            
-            # Enter recipient IBAN
-            iban_field = WebDriverWait(self.driver, self.timeout).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, bank_config['selectors']['ibanField']))
-            )
-            iban_field.clear()
-            iban_field.send_keys(transfer_data['receiverIban'])
-            time.sleep(1)
-            
-            # Enter amount
-            amount_field = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['amountField'])
-            amount_field.clear()
-            amount_field.send_keys(str(transfer_data['amount']))
-            time.sleep(1)
+        plan = bank_registry.plan_for(bank_config)
 
-            if 'selectBox' in bank_config['selectors'] and 'selectOption' in bank_config['selectors']:
-                try:
-                    select_box = WebDriverWait(self.driver, self.timeout).until(
-                        EC.element_to_be_clickable((By.CSS_SELECTOR, bank_config['selectors']['selectBox']))
-                    )
-                    select_box.click()
-                    select_option = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['selectOption'])
-                    select_option.click()
-                except:
-                    logger.info("Select box or option not found, skipping...")
-            
-            # Enter description if field exists
-            if 'descriptionField' in bank_config['selectors'] and transfer_data.get('description'):
-                try:
-                    desc_field = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['descriptionField'])
-                    desc_field.clear()
-                    desc_field.send_keys(transfer_data['description'])
-                except:
-                    logger.info("Description field not found, skipping...")
-            
-            # Enter beneficiary name if field exists
-            if 'beneficiaryNameField' in bank_config['selectors']:
-                try:
-                    beneficiary_field = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['beneficiaryNameField'])
-                    beneficiary_field.clear()
-                    beneficiary_field.send_keys(transfer_data.get('beneficiaryName', 'ReD-Market-On'))
-                except:
-                    logger.info("Beneficiary name field not found, skipping...")
-            
+        try:
+            self.run_phase(plan, 'fill_form', transfer_data)
             logger.info("Transfer form filled successfully")
-            
         except TimeoutException:
             raise Exception("Transfer form fields not found")
         except Exception as e:
@@ -776,13 +1386,24 @@ class BankTransferAutomation:
     
     def confirm_transfer(self, bank_config):
         """Confirm the transfer"""
+        self.submit_confirmation(bank_config)
+        return self.finish_confirmation(bank_config)
+
+    def submit_confirmation(self, bank_config):
+        """Click through the bank's confirm step"""
         logger.info("Confirming transfer...")
-        
+        plan = bank_registry.plan_for(bank_config)
+
+        try:
+            self.run_phase(plan, 'confirm')
+        except Exception as e:
+            raise Exception(f"Failed to confirm transfer: {str(e)}")
+
+    def finish_confirmation(self, bank_config):
+        """Detect an OTP step, or run the final confirmation"""
+        plan = bank_registry.plan_for(bank_config)
+
         try:
-            confirm_button = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['confirmButton'])
-            confirm_button.click()
-            time.sleep(3)
-            
             # Check for OTP requirement after clicking confirm
             otp_detected = self.detect_otp_requirement(bank_config)
             if otp_detected:
@@ -790,13 +1411,7 @@ class BankTransferAutomation:
                 return 'OTP_REQUIRED'
             
             # Final confirmation if there's another confirmation button
-            if 'confirmationBtn' in bank_config['selectors']:
-                try:
-                    final_confirm = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['confirmationBtn'])
-                    final_confirm.click()
-                    time.sleep(3)
-                except:
-                    logger.info("Final confirmation button not found")
+            self.run_phase(plan, 'final_confirm')
             
             logger.info("Transfer confirmation completed")
             return 'SUCCESS'
@@ -807,144 +1422,68 @@ class BankTransferAutomation:
     def detect_otp_requirement(self, bank_config):
         """Detect if OTP is required by checking for OTP input fields"""
         logger.info("🔍 Checking for OTP requirement...")
+        plan = bank_registry.plan_for(bank_config)
 
-        if bank_config['id'] == 'banco-atlantico' and 'confirmTransaction' in bank_config['selectors']:
-            try:
-                validation_button = self.driver.find_element(By.CSS_SELECTOR, bank_config['selectors']['confirmTransaction'])
-                validation_button.click()
-                time.sleep(2)
-            except:
-                logger.info("Confirm transaction button not found or already clicked")
-        
-        # Bank-specific OTP selectors first
-        bank_otp_selectors = []
-        if 'otpInputField' in bank_config['selectors']:
-            bank_otp_selectors.append(bank_config['selectors']['otpInputField'])
-        
-        # Generic OTP selectors
-        generic_otp_selectors = [
-            'input[type="text"][placeholder*="código"]',
-            'input[type="text"][placeholder*="OTP"]',
-            'input[type="text"][placeholder*="SMS"]',
-            'input[type="password"][placeholder*="código"]',
-            'input[name*="otp"]',
-            'input[id*="otp"]',
-            'input[id*="sms"]',
-            'input[id*="token"]',
-            'input[class*="otp"]',
-            'input[class*="sms"]',
-            'input[class*="token"]',
-            # Common Portuguese/Spanish OTP field patterns
-            'input[placeholder*="verificação"]',
-            'input[placeholder*="verificacion"]',
-            'input[placeholder*="autenticação"]',
-            'input[placeholder*="autenticacion"]',
-            'input[name*="codigo"]',
-            'input[name*="verification"]',
-            'input[id*="verification"]'
-        ]
-        
-        all_selectors = bank_otp_selectors + generic_otp_selectors
-        
-        for selector in all_selectors:
-            try:
-                otp_field = WebDriverWait(self.driver, 8).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                )
-                logger.info(f"✅ OTP field found with selector: {selector}")
-                # Store the working selector for later use
-                self.detected_otp_selector = selector
-                return True
-            except TimeoutException:
-                continue
+        self.run_phase(plan, 'pre_otp')
+
+        # Bank-specific OTP selector first, then the generic ones
+        selector = self.find_otp_field(plan)
+        if selector:
+            logger.info("✅ OTP field found with selector: %s", selector)
+            # Store the working selector for later use
+            self.detected_otp_selector = selector
+            return True
         
         # Check for OTP-related text on the page
         try:
-            otp_text_patterns = [
-                "código de verificação",
-                "código SMS",
-                "token",
-                "OTP",
-                "verificação",
-                "autenticação",
-                "código enviado",
-                "verification code",
-                "SMS code"
-            ]
-            
-            page_text = self.driver.page_source.lower()
-            for pattern in otp_text_patterns:
+            page_text = (self.cdp.page_source() if self.cdp else self.driver.page_source).lower()
+            for pattern in OTP_TEXT_PATTERNS:
                 if pattern.lower() in page_text:
-                    logger.info(f"✅ OTP requirement detected by text pattern: {pattern}")
+                    logger.info("✅ OTP requirement detected by text pattern: %s", pattern)
                     return True
                     
         except Exception as e:
-            logger.warning(f"Could not check page text for OTP patterns: {e}")
+            logger.warning("Could not check page text for OTP patterns: %s", e)
         
         logger.info("❌ No OTP requirement detected")
         return False
 
+    def find_otp_field(self, plan):
+        """Return the first OTP field selector that appears, or None"""
+        if self.cdp:
+            # One in-page poll over every selector, still in priority order
+            return self.cdp.first_present(plan.otp_field_selectors, self.deadline.timeout(8, what='OTP detection'))
+
+        # One observer for every selector, still in priority order
+        try:
+            timeout = self.deadline.timeout(8, what='OTP detection')
+            return wait_for_any(self.driver, [(s, 'presence') for s in plan.otp_field_selectors], timeout).selector
+        except TimeoutException:
+            return None
+
     def submit_otp(self, otp_code, bank_config):
         """Submit OTP code for verification"""
-        logger.info(f"🔐 Submitting OTP code: {otp_code}") 
+        logger.info("🔐 Submitting OTP code")
+        plan = bank_registry.plan_for(bank_config)
 
         try:
-            # OTP input field selectors
-            otp_selectors = []
-            if 'otpInputField' in bank_config['selectors']:
-                otp_selectors.append(bank_config['selectors']['otpInputField'])
-
-            # Generic OTP selectors
-            otp_selectors.extend([
-                'input[type="text"][placeholder*="código"]',
-                'input[type="text"][placeholder*="OTP"]',
-                'input[type="text"][placeholder*="SMS"]',
-                'input[type="password"][placeholder*="código"]',
-                'input[name*="otp"]',
-                'input[id*="otp"]',
-                'input[id*="sms"]',
-                'input[id*="token"]',
-                'input[class*="otp"]',
-                'input[class*="sms"]',
-                'input[class*="token"]',
-                'input[placeholder*="verificação"]',
-                'input[name*="codigo"]',
-                'input[name*="verification"]'
-            ])
-
-            otp_field = find_first_selector(self.driver, otp_selectors, "OTP field")
+            if self.cdp:
+                self.submit_otp_cdp(otp_code, plan)
+                return
+
+            otp_field = find_first_selector(self.driver, plan.otp_field_selectors, "OTP field")
             if not otp_field:
                 raise Exception("OTP input field not found")
 
             # Enter OTP
             otp_field.clear()
             otp_field.send_keys(otp_code)
-            time.sleep(1)
-
-            # Validation button selectors
-            validation_selectors = []
-            if 'otpValidationButton' in bank_config['selectors']:
-                validation_selectors.append(bank_config['selectors']['otpValidationButton'])
-
-            validation_selectors.extend([
-                'button[type="submit"]',
-                'input[type="submit"]',
-                'button[value*="Validar"]',
-                'button[value*="Confirmar"]',
-                'button[value*="Verificar"]',
-                'input[value*="Validar"]',
-                'input[value*="Confirmar"]',
-                'input[value*="Verificar"]',
-                '.btn-confirm',
-                '.btn-validate',
-                '.btn-submit',
-                '#btnValidate',
-                '#btnConfirm',
-                '#btnSubmit'
-            ])
-
-            validation_button = find_first_selector(self.driver, validation_selectors, "OTP validation button")
+            self.deadline.sleep(1)
 
+            validation_button = find_first_selector(self.driver, plan.otp_button_selectors, "OTP validation button")
+
+            # The bank may act on the transfer from here on
+            self.otp_submitted = True
             if validation_button:
                 validation_button.click()
                 logger.info("✅ OTP submitted successfully")
@@ -952,58 +1491,54 @@ class BankTransferAutomation:
                 logger.warning("⚠️ OTP validation button not found, pressing Enter instead")
                 otp_field.send_keys('\n')
 
-            time.sleep(3)
+            time.sleep(OTP_SETTLE_SECONDS)
 
         except Exception as e:
             raise Exception(f"Failed to submit OTP: {str(e)}")
 
+    def submit_otp_cdp(self, otp_code, plan):
+        """submit_otp over the CDP backend"""
+        try:
+            otp_selector = self.cdp.type(plan.otp_field_selectors, otp_code)
+        except NoSuchElementException:
+            raise Exception("OTP input field not found")
+        self.deadline.sleep(1)
+
+        # The bank may act on the transfer from here on
+        self.otp_submitted = True
+        try:
+            self.cdp.click(plan.otp_button_selectors)
+            logger.info("✅ OTP submitted successfully")
+        except NoSuchElementException:
+            logger.warning("⚠️ OTP validation button not found, pressing Enter instead")
+            self.cdp.submit(otp_selector)
+
+        time.sleep(OTP_SETTLE_SECONDS)
+
     
     def verify_transfer_success(self, bank_config):
         """Verify if transfer was successful"""
         logger.info("Verifying transfer success...")
+        plan = bank_registry.plan_for(bank_config)
         
         try:
-            #look for any other verification step
-            if 'additionalVerification' in bank_config['selectors']:
-                try:
-                    additional_verification = WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, bank_config['selectors']['additionalVerification']))
-                    )
-
-                    otpValidationButton = WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, bank_config['selectors']['otpValidationButton']))
-                    )
-                    if additional_verification and otpValidationButton and bank_config['id'] == 'bfa':
-                        logger.info("Additional verification step detected, Handling...")
-                        # Find all label elements inside it
-                        labels = additional_verification.find_elements(By.TAG_NAME, "label")  # adjust if labels are spans/divs
-
-                        # Find all input elements inside it
-                        inputs = additional_verification.find_elements(By.TAG_NAME, "input")  # usually inputs are type="text" or number
-
-                        # Loop over each label/input pair
-                        for label, input_field in zip(labels, inputs):
-                            value = label.text.strip()  # get the number from the label
-                            input_field.clear()
-                            input_field.send_keys(value)
-                            time.sleep(1)
-
-                        otpValidationButton.click()
-                        time.sleep(3)    
-
-                    elif additional_verification and bank_config['id'] == 'banco-atlantico':
-                        logger.info("Additional verification step detected for Banco Atlantico, Handling...")
-                        # Find the input field inside it
-                        additional_verification.click()
-                except TimeoutException:
-                    logger.info("No additional verification step detected, proceeding to check success message.")
-
-            # Look for success message
-            success_element = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, bank_config['selectors']['successMessage']))
-            )
-            classes = success_element.get_attribute("class") 
-            text_feedback = success_element.text.capitalize()
+            # Look for any other verification step
+            if not self.run_phase(plan, 'additional_verification'):
+                logger.info("No additional verification step detected, proceeding to check success message.")
+
+            # Look for success message; always after a submit, so a plain
+            # bounded wait rather than a draw on the transfer's budget
+            timeout = VERIFY_TIMEOUT
+            if self.cdp:
+                success = self.cdp.read(plan.selectors['successMessage'], 'presence', timeout)
+                classes = success['className']
+                text_feedback = success['text'].capitalize()
+            else:
+                success_element = wait_for_any(
+                    self.driver, [(plan.selectors['successMessage'], 'presence')], timeout
+                ).element
+                classes = success_element.get_attribute("class") 
+                text_feedback = success_element.text.capitalize()
 
             if "success" in classes.lower():
                 return {"status": True, "message": f"{text_feedback}"}
@@ -1022,14 +1557,9 @@ class BankTransferAutomation:
         unique_id = str(uuid.uuid4())[:8].upper()
         return f"TXN{timestamp}{unique_id}"
     
-    def calculate_fee(self, amount):
-        """Calculate transfer fee based on amount"""
-        fee_percentage = 0.005  # 0.5%
-        calculated_fee = amount * fee_percentage
-        minimum_fee = 500  # 500 AOA minimum
-        maximum_fee = 5000  # 5000 AOA maximum
-        
-        return min(max(calculated_fee, minimum_fee), maximum_fee)
+    def calculate_fee(self, amount, bank_config=None):
+        """Calculate transfer fee from the bank's tariff (see fee_quotes)"""
+        return fee_quotes.quote(amount, (bank_config or {}).get('id'))
     
     def take_screenshot_on_error(self):
         """Take screenshot for debugging purposes"""
@@ -1041,9 +1571,9 @@ class BankTransferAutomation:
                     os.makedirs(screenshot_dir)
                 screenshot_path = os.path.join(screenshot_dir, f"error_screenshot_{timestamp}.png")
                 self.driver.save_screenshot(screenshot_path)
-                logger.info(f"Screenshot saved: {screenshot_path}")
+                logger.info("Screenshot saved: %s", screenshot_path)
             except Exception as e:
-                logger.error(f"Failed to take screenshot: {e}")
+                logger.error("Failed to take screenshot: %s", e)
     
     def generate_session_id(self):
         """Generate a unique session ID"""
@@ -1055,60 +1585,171 @@ class BankTransferAutomation:
         """Clean up resources"""
         if self.driver:
             try:
+                if self.recorder:
+                    self.recorder.close()
                 self.driver.quit()
                 logger.info("WebDriver cleaned up")
             except Exception as e:
-                logger.error(f"Error during cleanup: {e}")
+                logger.error("Error during cleanup: %s", e)
+            self.driver = None
+        # Also drops the budget reserved by admit() when the driver never started
+        resource_governor.release(self)
+        self.remove_user_data_dir()
 
-def submit_otp_to_session(session_id, otp_code):
-    """Submit OTP code to an active session"""
-    logger.info(f"🔍 Looking for session {session_id}")
-    active_session_ids = session_manager.list_active_sessions()
-    logger.info(f"📊 Available sessions: {active_session_ids}")
-    
+    def remove_user_data_dir(self):
+        """Delete this browser's Chrome profile directory once the browser is gone"""
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+
+def deliver_local_otp(session_id, otp_code):
+    """Hand an OTP to a session parked in this process; None if not held here"""
+    session = active_sessions.get(session_id)
+    if not session:
+        return None
+    automation = session['automation_instance']
+    logger.info("🔐 Delivering OTP to in-process session %s", session_id)
+    if session.get('batch'):
+        return automation.deliver_batch_otp(session_id, otp_code)
+    return automation.deliver_otp(session_id, otp_code)
+
+def route_otp(session_id, session_data, otp_code, replay_job=None):
+    """Forward an OTP to the node that holds the session's browser
+
+    Only when that node cannot be connected to is the transfer replayed here;
+    if it may have got the OTP, the outcome is reported as unknown.
+    """
+    owner = session_data['owner_node']
+    endpoint = session_data.get('control_endpoint')
+    if owner != node_control.NODE_ID and endpoint:
+        logger.info("🛰️ Forwarding OTP for session %s to node %s", session_id, owner)
+        try:
+            return node_control.forward_otp(endpoint, session_id, otp_code)
+        except node_control.ForwardFailed as e:
+            logger.error("❌ OTP for session %s may have reached node %s: %s", session_id, owner, e)
+            return {
+                'success': False,
+                'sessionId': session_id,
+                'unknownOutcome': True,
+                'message': UNKNOWN_OUTCOME_MESSAGE,
+                'timestamp': datetime.now().isoformat()
+            }
+        except node_control.NodeUnreachable as e:
+            logger.warning("⚠️ Owner node %s of session %s is gone: %s", owner, session_id, e)
+        # The owner may have moved the session on before it went away
+        session_data = session_manager.get_session(session_id) or {}
+    return replay_transfer(session_id, session_data, replay_job)
+
+def replay_transfer(session_id, session_data, replay_job=None):
+    """Start the transfer of a session whose owner node is gone over again
+
+    Only transfers still waiting for their OTP are replayed, as nothing was
+    submitted to the bank yet. The OTP sent for the lost browser is useless,
+    so the replay stops at a fresh OTP request (replayedFrom = old session).
+    """
+    status = session_data.get('status')
+    if status not in REPLAYABLE_STATUSES:
+        logger.error("❌ Session %s lost in status %s, not replaying", session_id, status)
+        return {
+            'success': False,
+            'sessionId': session_id,
+            'message': UNKNOWN_OUTCOME_MESSAGE if status == 'processing_otp' else 'Session not found',
+            'timestamp': datetime.now().isoformat()
+        }
+
+    # Session records hold redacted credentials; the replay needs the job's own
+    if not replay_job or not replay_job.get('transferData') or not replay_job.get('bankConfig'):
+        logger.error("❌ Session %s lost and no transfer data to replay it", session_id)
+        return {
+            'success': False,
+            'sessionId': session_id,
+            'message': 'Sessão perdida; inicie a transferência novamente',
+            'timestamp': datetime.now().isoformat()
+        }
+
+    logger.warning("🔁 Replaying transfer of session %s on node %s", session_id, node_control.NODE_ID)
+    session_manager.update_session(session_id, {'status': 'failed'})
+    transfer_data = {key: value for key, value in replay_job['transferData'].items() if key != 'otpCode'}
+    bank_config = replay_job['bankConfig']
+    automation = BankTransferAutomation(headless=False, driver_service=shared_service,
+                                        deadline_at=replay_job.get('deadlineAt'))
+
+    # Under the transfer's own idempotency key, so concurrent OTPs for the lost
+    # session start one replay; only the lost session's stored result is dropped
+    automation.idempotency_key = idempotency_key(transfer_data, bank_config)
+    idempotency.release_lost(automation.idempotency_key, session_id)
+    result = idempotency.run(automation.idempotency_key,
+                             lambda: automation.perform_transfer(transfer_data, bank_config),
+                             keep=automation.reached_bank,
+                             deadline=Deadline(TRANSFER_DEADLINE_SECONDS, replay_job.get('deadlineAt')))
+    return {**result, 'replayedFrom': session_id}
+
+def submit_otp_to_session(session_id, otp_code, replay_job=None):
+    """Submit OTP code to an active session
+
+    The session may be parked in this process, on another node (the OTP is
+    forwarded there) or lost with its node (replayed from replay_job).
+    """
+    result = deliver_local_otp(session_id, otp_code)
+    if result is not None:
+        return result
+
+    logger.info("🔍 Looking for session %s", session_id)
     session_data = session_manager.get_session(session_id)
     if not session_data:
-        logger.error(f"❌ Session {session_id} not found")
-        logger.error(f"❌ Available sessions: {active_session_ids}")
+        logger.error("❌ Session %s not found", session_id)
         return {
             'success': False,
             'message': 'Session not found',
             'timestamp': datetime.now().isoformat()
         }
+
+    # Written by the worker that holds the browser: route to that node
+    if session_data.get('owner_node'):
+        return route_otp(session_id, session_data, otp_code, replay_job)
     
     # Check if this is a continuing session with existing browser
     browser_pid = session_data.get('browser_pid')
     session_id = session_data.get('session_id') 
-    logger.info(f"Outside Continuing with existing browser session PID: {browser_pid}")
-    logger.info(f"Outside Continuing with existing session ID: {session_id}") 
+    logger.info("Outside Continuing with existing browser session PID: %s", browser_pid)
+    logger.info("Outside Continuing with existing session ID: %s", session_id) 
     if session_manager.is_browser_alive(browser_pid):
-        logger.info(f"🔄 Inside Continuing with existing browser session")
+        logger.info("🔄 Inside Continuing with existing browser session")
         try:
             # Attach to existing Chrome session
+            load_selenium()
             options = Options()
             options.debugger_address = "127.0.0.1:5173"  # Must match the running Chrome | this will fail to trigger the right port and will work 
-            driver = webdriver.Chrome(options=options)
+            driver = webdriver.Chrome(service=driver_cache.service(), options=options)
             # Navigate to the current URL where OTP is waiting
             current_url = session_data.get('current_url')
             if current_url:
-                logger.info(f"🔄 Reconnecting to existing session URL: {current_url}")
+                logger.info("🔄 Reconnecting to existing session URL: %s", current_url)
                 driver.get(current_url)
-                logger.info(f"🌐 Attached to existing browser session: {driver}")
+                logger.info("🌐 Attached to existing browser session: %s", driver)
                 time.sleep(1)
 
             # Use your BankTransferAutomation wrapper with the attached driver
             automation = BankTransferAutomation(headless=False)
             automation.setup_driver()  # inject the existing driver
-            logger.error(f"On IF about to run continue_with_existing_session: {e}")
+            logger.error("On IF about to run continue_with_existing_session: %s", e)
             return automation.continue_with_existing_session(session_id, otp_code)
 
         except Exception as e:
-            logger.error(f"On Exception to reconnect to existing session: {e}")
+            logger.error("On Exception to reconnect to existing session: %s", e)
             # Optionally, fall back to creating a new session
             automation = BankTransferAutomation(headless=False)
             automation.setup_driver()
             return automation.continue_with_existing_session(session_id, otp_code)
 
+def find_free_port():
+    """Ask the OS for a free local TCP port"""
+    import socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
 def find_first_selector(driver, selectors, description="element"):
     """Try a list of selectors and return the first matching element."""
     for selector in selectors:
@@ -1118,35 +1759,171 @@ def find_first_selector(driver, selectors, description="element"):
             continue
     return None  
 
+def run_job(job, on_event=None):
+    """Run one job payload: a transfer, a batch payout, or an OTP for a waiting session
+
+    Batch payouts return a generator of per-item results. on_event receives
+    progress events of transfers as they happen.
+    """
+    if job.get('mode') == 'submit_otp':
+        return submit_otp_to_session(job['sessionId'], job.get('otpCode', ''), replay_job=job)
+
+    if job.get('mode') == 'batch':
+        automation = BankTransferAutomation(headless=False, driver_service=shared_service)
+        return automation.perform_batch(job['account'], job['beneficiaries'], job['bankConfig'])
+
+    warm_pool.note_request(job['bankConfig'])
+    automation = BankTransferAutomation(headless=False, driver_service=shared_service, on_event=on_event,
+                                        deadline_at=job.get('deadlineAt'))
+
+    def transfer():
+        if job.get('profile') or profile_jobs:
+            from job_profiler import run_profiled
+            return run_profiled(lambda: automation.perform_transfer(job['transferData'], job['bankConfig']),
+                                lambda: automation.session_id)
+        return automation.perform_transfer(job['transferData'], job['bankConfig'])
+
+    # Duplicates of a transfer that is running or recently ran get its result,
+    # or an inProgress answer if it is still running when their own budget ends
+    automation.idempotency_key = idempotency_key(job['transferData'], job['bankConfig'])
+    return idempotency.run(automation.idempotency_key, transfer, keep=automation.reached_bank,
+                           deadline=Deadline(TRANSFER_DEADLINE_SECONDS, job.get('deadlineAt')))
+
+def wait_for_parked_sessions():
+    """Block until every session parked for an OTP has finished or timed out"""
+    for session in list(active_sessions.values()):
+        monitor_thread = session.get('monitor_thread')
+        if monitor_thread:
+            monitor_thread.join()
+
+def run_jobs(source, workers, shared_driver=False, events=False):
+    """Run JSON Lines jobs from a file path or '-' for stdin"""
+    global shared_service
+    if shared_driver:
+        # One chromedriver serves every browser this worker opens
+        from driver_service import shared_driver_service
+        shared_service = shared_driver_service
+        shared_service.start_health_monitor()
+
+    # Long-lived worker: keep the portal health data fresh while it runs
+    bank_health.start_prober()
+    resource_governor.start_sampler()
+    start_control_server()
+    # Browsers kept on the login pages of the banks in demand (AUTOMATION_WARM_BROWSERS)
+    warm_pool.start(lambda: BankTransferAutomation(headless=False, driver_service=shared_service))
+
+    runner = JobRunner(run_job, max_workers=workers,
+                       is_light=lambda job: job.get('mode') == 'submit_otp', events=events)
+    if source == '-':
+        runner.run(read_jobs(sys.stdin))
+    else:
+        with open(source, 'r') as f:
+            runner.run(read_jobs(f))
+    wait_for_parked_sessions()
+    warm_pool.stop()
+    node_control.stop_control_server()
+    resource_governor.stop_sampler()
+    bank_health.stop_prober()
+    if shared_service:
+        shared_service.stop()
+
+def start_control_server():
+    """Serve this node's control endpoint for the sessions parked in it"""
+    node_control.start_control_server(deliver_local_otp, lambda: list(active_sessions),
+                                      metrics=lambda: {**resource_governor.metrics(), 'warmPool': warm_pool.metrics()})
+
+def job_results(result):
+    """Result dicts of a run_job call: the result itself, or each batch item"""
+    return [result] if isinstance(result, dict) else result
+
+def print_results(result):
+    """Print a run_job result as JSON, one line per batch item"""
+    for item in job_results(result):
+        print(json.dumps(item, default=str), flush=True)
+
+def run_single_job(stream, events=False):
+    """Run the one job on stream and print its result line (one per item for batches)
+
+    With events, progress events are printed as they happen and the result
+    is the terminal event ({'event': 'result', ...}). A transfer left waiting
+    for an OTP keeps the process alive, reachable through its control
+    endpoint, until the OTP is processed or the session times out.
+    """
+    job = read_single_job(stream)
+    start_control_server()
+    resource_governor.start_sampler()
+    try:
+        if not events:
+            print_results(run_job(job))
+        else:
+            runner = JobRunner(run_job, events=True)
+            job_id = job.get('jobId')
+            result = run_job(job, on_event=lambda event: runner.emit({'jobId': job_id, **event}))
+            for item in job_results(result):
+                runner.emit({'jobId': job_id, 'event': 'result', **item})
+        wait_for_parked_sessions()
+    finally:
+        resource_governor.stop_sampler()
+        node_control.stop_control_server()
+
+def parse_cli_args(argv):
+    """Parse the flag-style command line (--stdin / --jobs)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Bank transfer automation worker')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--stdin', action='store_true',
+                        help='read a single JSON job from the first line of stdin')
+    source.add_argument('--jobs', metavar='PATH',
+                        help="read JSON Lines jobs from PATH ('-' for stdin)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='maximum concurrent jobs in --jobs mode')
+    parser.add_argument('--shared-driver', action='store_true',
+                        default=os.environ.get('CHROMEDRIVER_SHARED') == '1',
+                        help='serve all browsers in --jobs mode from one chromedriver')
+    parser.add_argument('--events', action='store_true',
+                        help='stream NDJSON progress events before each result')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile every transfer job (or set "profile": true per job)')
+    return parser.parse_args(argv)
+
 def main():
     """Main function to handle command line execution"""
+    global profile_jobs
+    configure_logging()
+
     if len(sys.argv) < 2:
         print("Usage: python bank_scraper.py '<json_data>' [otp_mode] [session_id] [otp_code]", flush=True)
+        print("       python bank_scraper.py --stdin", flush=True)
+        print("       python bank_scraper.py --jobs <file|-> [--workers N]", flush=True)
         sys.exit(1)
     
     try:
+        # Validate and compile every bank plan once, before any job runs
+        bank_registry.load()
+
+        if sys.argv[1].startswith('--'):
+            # Job payloads come from stdin or a file, never from argv
+            args = parse_cli_args(sys.argv[1:])
+            profile_jobs = args.profile
+            if args.jobs:
+                run_jobs(args.jobs, args.workers, args.shared_driver, args.events)
+            else:
+                run_single_job(sys.stdin, args.events)
+
         # Check if this is an OTP submission 
-        if len(sys.argv) >= 4 and sys.argv[2] == 'submit_otp':
+        elif len(sys.argv) >= 4 and sys.argv[2] == 'submit_otp':
             session_id = sys.argv[3]
             otp_code = sys.argv[4] if len(sys.argv) > 4 else ''  
-            logger.info(f"Active session id: {session_id}")
-            logger.info(f"Active OTP code: {otp_code}") 
+            logger.info("Active session id: %s", session_id)
             result = submit_otp_to_session(session_id, otp_code)
             print(json.dumps(result), flush=True)
         else:
             # Regular transfer initiation
             input_data = json.loads(sys.argv[1])
-            transfer_data = input_data['transferData']
-            bank_config = input_data['bankConfig']
-            
-            # Initialize automation
-            automation = BankTransferAutomation(headless=False)
-            
-            # Perform transfer
-            result = automation.perform_transfer(transfer_data, bank_config)
-            
-            # Output result as JSON
-            print(json.dumps(result), flush=True)
+
+            # Output result as JSON (a line per item for batch payouts)
+            print_results(run_job(input_data))
 
     except json.JSONDecodeError:
         error_result = {
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+DOM Backend Benchmark for the Bank Transfer Automation worker
+Times every plan step against the local mock portal with the WebDriver and CDP
+backends (plan pauses excluded) and prints the per-step median latency of each
+
+Usage:
+    python benchmarks/bench_dom_backends.py [--runs 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+AUTOMATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AUTOMATION_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bank_registry import bank_registry, PlanStep  # noqa: E402
+from bank_scraper import BankTransferAutomation  # noqa: E402
+from mock_portal import MockPortal, mock_bank_config  # noqa: E402
+
+BACKENDS = ('webdriver', 'cdp')
+FLOW = ('login', 'navigate', 'fill_form', 'confirm')
+
+VALUES = {
+    'username': 'bench',
+    'password': 'bench',
+    'receiverIban': 'AO06004000000000000000000',
+    'amount': '1500',
+    'description': 'benchmark',
+    'otpCode': '123456',
+}
+
+
+def otp_steps(plan):
+    """The OTP entry of submit_otp expressed as plan steps"""
+    common = dict(timeout=None, default=None, when=None, optional=False, guard=False, pause=0)
+    return (
+        PlanStep(action='type', selector_key='otpInputField', selector=plan.selectors['otpInputField'],
+                 wait='presence', value='otpCode', **common),
+        PlanStep(action='click', selector_key='otpValidationButton', selector=plan.selectors['otpValidationButton'],
+                 wait=None, value=None, **common),
+    )
+
+
+def timed(samples, name, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    samples[name].append((time.perf_counter() - start) * 1000)
+
+
+def run_backend(backend, bank_config, runs):
+    """Return {step name: [ms, ...]} for one backend"""
+    plan = bank_registry.plan_for(bank_config)
+    automation = BankTransferAutomation(headless=True, dom_backend=backend)
+    automation.setup_driver()
+    samples = defaultdict(list)
+    try:
+        for _ in range(runs):
+            automation.driver.get(plan.login_url)
+            for phase in FLOW:
+                for step in plan.phases.get(phase, ()):
+                    if step.when and not VALUES.get(step.when):
+                        continue
+                    timed(samples, f"{phase}.{step.action}:{step.selector_key}", automation.run_step, step, VALUES)
+            timed(samples, 'otp.detect', automation.detect_otp_requirement, bank_config)
+            for step in otp_steps(plan):
+                timed(samples, f"otp.{step.action}:{step.selector_key}", automation.run_step, step, VALUES)
+            timed(samples, 'verify', automation.verify_transfer_success, bank_config)
+    finally:
+        automation.cleanup()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--render-delay-ms', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='print one JSON record per step')
+    args = parser.parse_args()
+
+    portal = MockPortal(render_delay_ms=args.render_delay_ms)
+    bank_config = mock_bank_config(portal.start())
+    try:
+        results = {backend: run_backend(backend, bank_config, args.runs) for backend in BACKENDS}
+    finally:
+        portal.stop()
+
+    steps = list(results[BACKENDS[0]])
+    totals = dict.fromkeys(BACKENDS, 0.0)
+    for step in steps:
+        medians = {backend: statistics.median(results[backend][step]) for backend in BACKENDS}
+        for backend in BACKENDS:
+            totals[backend] += medians[backend]
+        if args.json:
+            print(json.dumps({'step': step, 'runs': args.runs,
+                              **{f"{b}_ms_median": round(ms, 1) for b, ms in medians.items()}}))
+        else:
+            print(f"{step:45} webdriver {medians['webdriver']:8.1f} ms   cdp {medians['cdp']:8.1f} ms")
+
+    if not args.json:
+        print(f"{'total':45} webdriver {totals['webdriver']:8.1f} ms   cdp {totals['cdp']:8.1f} ms "
+              f"(median of {args.runs} per step)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Fee Quote Benchmark for the Bank Transfer Automation worker
+Quotes a generated payout file (1M rows by default) per row, with the
+plain-Python quote_many and, when installed, with numpy, and checks that all
+of them agree
+
+Usage:
+    python benchmarks/bench_fee_quotes.py [--rows 1000000] [--bank bai] [--json]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+AUTOMATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AUTOMATION_DIR)
+
+from fee_quotes import fee_quotes  # noqa: E402
+
+
+def write_payouts(path, rows, seed=42):
+    """JSON Lines payout file with amounts spread over every tariff tier"""
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for index in range(rows):
+            amount = round(10 ** rng.uniform(2, 7), 2)
+            f.write(json.dumps({'reference': f"P-{index}", 'amount': amount}) + '\n')
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--bank', help='bank id of the tariff to quote with')
+    parser.add_argument('--json', action='store_true', help='print one JSON record per method')
+    args = parser.parse_args()
+    if args.bank and args.bank not in fee_quotes.known_banks():
+        parser.error(f"unknown bank {args.bank}; known: {', '.join(fee_quotes.known_banks())}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'payouts.jsonl')
+        write_payouts(path, args.rows)
+        fee_quotes.load()
+
+        def parse():
+            with open(path, 'r') as f:
+                return [json.loads(line)['amount'] for line in f]
+
+        amounts, parse_ms = timed(parse)
+
+    results = {'parse': (None, parse_ms)}
+    results['per_row'] = timed(lambda: [fee_quotes.quote(amount, args.bank) for amount in amounts])
+    results['python'] = timed(lambda: fee_quotes.quote_many(amounts, args.bank, use_numpy=False))
+    if importlib.util.find_spec('numpy'):
+        results['numpy'] = timed(lambda: fee_quotes.quote_many(amounts, args.bank))
+
+    reference = results['per_row'][0]
+    for method, (fees, ms) in results.items():
+        agrees = None if fees is None or method == 'per_row' else all(abs(a - b) < 0.005 for a, b in zip(reference, fees))
+        if args.json:
+            print(json.dumps({'method': method, 'rows': args.rows, 'ms': round(ms, 1), 'agrees': agrees}))
+        else:
+            rate = args.rows / ms * 1000
+            print(f"{method:10} {ms:10.1f} ms   {rate:14,.0f} rows/s" +
+                  ('' if agrees is None else f"   {'matches' if agrees else 'DIFFERS from'} per_row"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Launch Profile Benchmark for the Bank Transfer Automation worker
+Starts a browser with each Chrome launch profile, walks it through the mock
+portal up to the OTP page and reports start-up time and steady-state RSS of
+its process tree, plus how many such browsers the host memory budget fits
+
+Usage:
+    python benchmarks/bench_launch_profiles.py [--runs 5] [--profiles lean,default] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+AUTOMATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AUTOMATION_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bank_registry import bank_registry  # noqa: E402
+from bank_scraper import BankTransferAutomation  # noqa: E402
+from launch_profiles import LAUNCH_PROFILES  # noqa: E402
+from resource_governor import resource_governor, tree_rss, MB  # noqa: E402
+from mock_portal import MockPortal, mock_bank_config  # noqa: E402
+
+FLOW = ('login', 'navigate', 'fill_form', 'confirm')
+
+VALUES = {
+    'username': 'bench',
+    'password': 'bench',
+    'receiverIban': 'AO06004000000000000000000',
+    'amount': '1500',
+    'description': 'benchmark',
+}
+
+# RSS is sampled this often once the browser sits on the OTP page
+SETTLE_SECONDS = 3
+RSS_SAMPLES = 5
+RSS_INTERVAL = 0.5
+
+
+def run_profile(profile, bank_config, runs):
+    """Return {'startupMs': [...], 'flowMs': [...], 'rssMb': [...]} for one profile"""
+    plan = bank_registry.plan_for(bank_config)
+    samples = {'startupMs': [], 'flowMs': [], 'rssMb': []}
+    for _ in range(runs):
+        automation = BankTransferAutomation(headless=True)
+        start = time.perf_counter()
+        automation.setup_driver(profile)
+        samples['startupMs'].append((time.perf_counter() - start) * 1000)
+        try:
+            start = time.perf_counter()
+            automation.driver.get(plan.login_url)
+            for phase in FLOW:
+                for step in plan.phases.get(phase, ()):
+                    if not step.when or VALUES.get(step.when):
+                        automation.run_step(step, VALUES)
+            automation.find_otp_field(plan)
+            samples['flowMs'].append((time.perf_counter() - start) * 1000)
+
+            time.sleep(SETTLE_SECONDS)
+            rss = []
+            for _ in range(RSS_SAMPLES):
+                rss.append(tree_rss(automation.browser_pid) / MB)
+                time.sleep(RSS_INTERVAL)
+            samples['rssMb'].append(statistics.median(rss))
+        finally:
+            automation.cleanup()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--profiles', default='lean,default', help='comma-separated launch profiles')
+    parser.add_argument('--render-delay-ms', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='print one JSON record per profile')
+    args = parser.parse_args()
+
+    profiles = args.profiles.split(',')
+    for profile in profiles:
+        if profile not in LAUNCH_PROFILES:
+            parser.error(f"unknown profile {profile}; known: {', '.join(LAUNCH_PROFILES)}")
+
+    portal = MockPortal(render_delay_ms=args.render_delay_ms)
+    bank_config = mock_bank_config(portal.start())
+    try:
+        results = {profile: run_profile(profile, bank_config, args.runs) for profile in profiles}
+    finally:
+        portal.stop()
+
+    host_budget = resource_governor.host_budget / MB
+    for profile, samples in results.items():
+        medians = {name: statistics.median(values) for name, values in samples.items()}
+        fits = int(host_budget // max(samples['rssMb'])) if max(samples['rssMb']) else None
+        if args.json:
+            print(json.dumps({'profile': profile, 'runs': args.runs,
+                              **{f"{name}_median": round(value, 1) for name, value in medians.items()},
+                              'rssMb_max': round(max(samples['rssMb']), 1), 'browsersPerHost': fits}))
+        else:
+            print(f"{profile:10} start-up {medians['startupMs']:8.1f} ms   flow {medians['flowMs']:8.1f} ms   "
+                  f"RSS {medians['rssMb']:7.1f} MB (max {max(samples['rssMb']):.1f})   "
+                  f"~{fits} per host ({host_budget:.0f} MB budget)")
+
+
+if __name__ == '__main__':
+    main()
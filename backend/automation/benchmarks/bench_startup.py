@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark for the Bank Transfer Automation worker
+Measures cold-start import cost per CLI mode with `python -X importtime`
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+AUTOMATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each CLI mode imports before it starts doing real work
+MODES = {
+    'import': 'import bank_scraper',
+    'transfer': 'import bank_scraper; bank_scraper.load_selenium()',
+    'submit_otp': 'import bank_scraper, psutil, requests; bank_scraper.load_selenium()',
+}
+
+
+def parse_importtime(stderr):
+    """Return (total self time in us, {top-level module: cumulative us})"""
+    total = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total += int(self_us)
+        if not name.startswith('  '):  # nesting is shown by indentation
+            top_level[name.strip()] = int(cumulative_us)
+    return total, top_level
+
+
+def run_mode(snippet):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', snippet],
+        cwd=AUTOMATION_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    total, top_level = parse_importtime(proc.stderr)
+    return wall, total, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='print one JSON record per mode')
+    args = parser.parse_args()
+
+    for mode, snippet in MODES.items():
+        walls, totals, slowest = [], [], {}
+        for _ in range(args.runs):
+            wall, total, top_level = run_mode(snippet)
+            walls.append(wall)
+            totals.append(total)
+            for name, cumulative in top_level.items():
+                slowest[name] = max(slowest.get(name, 0), cumulative)
+
+        top = sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        record = {
+            'mode': mode,
+            'runs': args.runs,
+            'wall_ms_median': round(statistics.median(walls) * 1000, 1),
+            'import_ms_median': round(statistics.median(totals) / 1000, 1),
+            'top_imports_ms': {name: round(us / 1000, 1) for name, us in top},
+        }
+
+        if args.json:
+            print(json.dumps(record))
+            continue
+
+        print(f"{mode}: wall {record['wall_ms_median']} ms, imports {record['import_ms_median']} ms "
+              f"(median of {args.runs})")
+        for name, ms in record['top_imports_ms'].items():
+            print(f"    {ms:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Mock Bank Portal for Bank Transfer Automation benchmarks
+Serves a minimal login -> transfers -> form -> OTP -> result flow on localhost
+whose element ids match MOCK_SELECTORS, so the default bank plan runs against it
+
+The OTP REJECTED_OTP gets a rejection message instead of the success one.
+
+Usage:
+    python benchmarks/mock_portal.py [--port 8765] [--no-otp] [--render-delay-ms 200]
+"""
+
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MOCK_BANK_ID = 'mock-bank'
+
+# OTP the portal answers with a rejected transfer
+REJECTED_OTP = '000000'
+
+MOCK_SELECTORS = {
+    'usernameField': '#username',
+    'passwordField': '#password',
+    'loginButton': '#login',
+    'transferMenu': '#transfers',
+    'ibanField': '#iban',
+    'amountField': '#amount',
+    'descriptionField': '#description',
+    'beneficiaryNameField': '#beneficiary',
+    'confirmButton': '#next',
+    'otpInputField': '#otp',
+    'otpValidationButton': '#validate',
+    'successMessage': '#message',
+}
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Mock Bank</title></head>
+<body>{body}</body></html>"""
+
+LOGIN = """
+<form action="/home" method="get">
+  <input id="username" name="u" type="text">
+  <input id="password" name="p" type="password">
+  <button id="login" type="submit">Entrar</button>
+</form>"""
+
+HOME = """<a id="transfers" href="/transfer">Transferências</a>"""
+
+# The form is inserted after a delay, like the real portals' client-side rendering
+TRANSFER = """
+<div id="root"></div>
+<template id="form">
+  <form action="{action}" method="get">
+    <input id="iban" name="iban" type="text">
+    <input id="amount" name="amount" type="text">
+    <input id="description" name="description" type="text">
+    <input id="beneficiary" name="beneficiary" type="text">
+    <button id="next" type="submit">Seguinte</button>
+  </form>
+</template>
+<script>
+  setTimeout(() => {{
+    document.getElementById('root').appendChild(document.getElementById('form').content.cloneNode(true));
+  }}, {delay});
+</script>"""
+
+OTP = """
+<form action="/done" method="get">
+  <label for="otp">Código SMS</label>
+  <input id="otp" name="otp" type="text" placeholder="Código SMS">
+  <button id="validate" type="submit">Validar</button>
+</form>"""
+
+DONE = """<div id="message" class="alert alert-success">Transferência efectuada com sucesso</div>"""
+
+REJECTED = """<div id="message" class="alert alert-danger">Código de confirmação inválido</div>"""
+
+
+def mock_bank_config(base_url):
+    """Bank definition for the mock portal; compiles with the default plan"""
+    return {
+        'id': MOCK_BANK_ID,
+        'name': 'Mock Bank',
+        'loginUrl': f"{base_url}/login",
+        'selectors': dict(MOCK_SELECTORS),
+    }
+
+
+class MockPortal:
+    def __init__(self, port=0, require_otp=True, render_delay_ms=200):
+        self.require_otp = require_otp
+        self.render_delay_ms = render_delay_ms
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread and return the base URL"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name='mock-portal', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                rejected = parse_qs(url.query).get('otp') == [REJECTED_OTP]
+                pages = {
+                    '/login': LOGIN,
+                    '/home': HOME,
+                    '/transfer': TRANSFER.format(
+                        action='/otp' if portal.require_otp else '/done',
+                        delay=portal.render_delay_ms,
+                    ),
+                    '/otp': OTP,
+                    '/done': REJECTED if rejected else DONE,
+                }
+                body = pages.get(url.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                content = PAGE.format(body=body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--no-otp', action='store_true', help='skip the OTP page')
+    parser.add_argument('--render-delay-ms', type=int, default=200)
+    args = parser.parse_args()
+
+    portal = MockPortal(args.port, require_otp=not args.no_otp, render_delay_ms=args.render_delay_ms)
+    print(f"Mock portal on {portal.base_url}/login")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
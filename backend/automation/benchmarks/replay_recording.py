@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Recording Replay for the Bank Transfer Automation worker
+Re-runs a command stream captured with AUTOMATION_RECORD_DIR against its DOM
+snapshots served on localhost, and compares each command's duration and
+outcome with the recording
+
+Snapshots stand in for the portal: every snapshot entry loads that page, and
+the recorded 'get' commands are skipped. Scripts are stripped from snapshots
+so the replayed pages stay as they were captured. Element ids are mapped from
+the recording to the replay as find commands return them.
+
+Usage:
+    python benchmarks/replay_recording.py <recording dir> [--runs 3] [--json]
+"""
+
+import argparse
+import functools
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+AUTOMATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AUTOMATION_DIR)
+
+from bank_scraper import BankTransferAutomation  # noqa: E402
+from command_recorder import ELEMENT_KEY, element_ids  # noqa: E402
+
+# Not replayed: the replay opens and closes its own session, and snapshots
+# replace navigation
+SKIPPED_COMMANDS = ('newSession', 'quit', 'get', 'close')
+
+SCRIPT_TAG = re.compile(r'<script\b.*?</script>', re.IGNORECASE | re.DOTALL)
+
+
+def load_recording(directory):
+    with open(os.path.join(directory, 'commands.jsonl'), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class SnapshotServer:
+    """Serve a recording's snapshots on localhost, scripts removed"""
+
+    def __init__(self, directory):
+        class Handler(SimpleHTTPRequestHandler):
+            def do_GET(self):
+                path = self.translate_path(self.path)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        body = SCRIPT_TAG.sub('', f.read()).encode('utf-8')
+                except OSError:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        handler = functools.partial(Handler, directory=os.path.join(directory, 'snapshots'))
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='snapshot-server', daemon=True).start()
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def remap(value, ids):
+    """Replace recorded element ids in command params with replayed ones"""
+    if isinstance(value, dict):
+        return {
+            key: ids.get(item, item) if key in (ELEMENT_KEY, 'id') and isinstance(item, str) else remap(item, ids)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [remap(item, ids) for item in value]
+    return value
+
+
+def replay(driver, entries, base_url):
+    """Run the command stream once; returns one record per replayed command"""
+    ids = {}
+    step = None
+    records = []
+    for entry in entries:
+        if 'snapshot' in entry:
+            step = entry['step']
+            driver.get(f"{base_url}/{entry['snapshot']}")
+            continue
+        if entry['command'] in SKIPPED_COMMANDS:
+            continue
+
+        params = remap(entry['params'], ids)
+        params.pop('sessionId', None)
+        start = time.perf_counter()
+        try:
+            response = driver.execute(entry['command'], params)
+            outcome = 'ok'
+        except Exception as e:
+            response = None
+            outcome = f"{type(e).__name__}: {str(e).splitlines()[0][:200]}"
+        duration = (time.perf_counter() - start) * 1000
+
+        if response and entry.get('elements'):
+            ids.update(zip(entry['elements'], element_ids(response.get('value'))))
+        records.append({
+            'seq': entry['seq'],
+            'step': step,
+            'command': entry['command'],
+            'recordedMs': entry['durationMs'],
+            'replayMs': round(duration, 2),
+            'recordedOutcome': entry['outcome'],
+            'replayOutcome': outcome,
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('recording', help='a session directory under AUTOMATION_RECORD_DIR')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print one JSON record per replayed command')
+    args = parser.parse_args()
+
+    entries = load_recording(args.recording)
+    server = SnapshotServer(args.recording)
+    base_url = server.start()
+    automation = BankTransferAutomation(headless=True)
+    automation.setup_driver()
+    runs = []
+    try:
+        for _ in range(args.runs):
+            runs.append(replay(automation.driver, entries, base_url))
+    finally:
+        automation.cleanup()
+        server.stop()
+
+    if args.json:
+        for run, records in enumerate(runs):
+            for record in records:
+                print(json.dumps({'run': run, **record}))
+        return
+
+    recorded = defaultdict(list)
+    replayed = defaultdict(list)
+    mismatches = 0
+    for records in runs:
+        for record in records:
+            key = f"{record['step'] or '-'}:{record['command']}"
+            recorded[key].append(record['recordedMs'])
+            replayed[key].append(record['replayMs'])
+            mismatches += (record['recordedOutcome'] == 'ok') != (record['replayOutcome'] == 'ok')
+
+    for key in recorded:
+        print(f"{key:55} recorded {statistics.median(recorded[key]):8.1f} ms   "
+              f"replay {statistics.median(replayed[key]):8.1f} ms   x{len(recorded[key]) // args.runs}")
+    print(f"{'total':55} recorded {sum(r['recordedMs'] for r in runs[0]):8.1f} ms   "
+          f"replay {statistics.median(sum(r['replayMs'] for r in records) for records in runs):8.1f} ms "
+          f"({mismatches} outcome mismatches over {args.runs} runs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Soak Test for the Bank Transfer Automation worker
+Drives thousands of transfers through run_job against local mock portals and
+fails if the worker's footprint keeps growing
+
+Transfers are a mix of OTP submitted (success), OTP never sent (the session
+times out after AUTOMATION_OTP_TIMEOUT, 20 s here unless set), OTP rejected by
+the portal, and portals that need no OTP. Sampled every --interval seconds:
+
+    processes      browser and driver processes under this one
+    fds            open file descriptors
+    threads        OS threads of this process
+    tmp_entries    entries in the temp directory (chrome_userdata_*, ...)
+    tmp_mb         size of the temp directory
+    session_files  bank_sessions/*.json
+
+Each metric gets a least-squares line over the samples after --warmup; growth
+along it of more than its allowance fails the run. Once every transfer has
+finished, processes, descriptors, threads and temp entries must also be back
+near where they started. Session files outlive their transfers by up to the
+longest session TTL, so they are only checked when the window after warmup is
+longer than that.
+
+Usage:
+    python benchmarks/soak.py [--transfers 2000] [--concurrency 4] [--interval 10] [--json samples.jsonl]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+AUTOMATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AUTOMATION_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Read at import time by the worker modules: keep the breaker and deep link
+# state out of data/, and let unanswered OTPs time out quickly
+STATE_DIR = tempfile.mkdtemp(prefix='soak_state_')
+os.environ.setdefault('BANK_HEALTH_FILE', os.path.join(STATE_DIR, 'bank_health.json'))
+os.environ.setdefault('AUTOMATION_DEEP_LINKS_FILE', os.path.join(STATE_DIR, 'deep_links.json'))
+os.environ.setdefault('AUTOMATION_OTP_TIMEOUT', '20')
+
+import psutil  # noqa: E402
+
+from bank_scraper import run_job, deliver_local_otp, wait_for_parked_sessions  # noqa: E402
+from session_manager import session_manager, SESSION_TTLS  # noqa: E402
+from transfer_validation import supported_bank_codes  # noqa: E402
+from mock_portal import MockPortal, mock_bank_config, MOCK_BANK_ID, REJECTED_OTP  # noqa: E402
+
+# Share of each path in the transfer mix
+MIX = {'otp': 0.5, 'otp_timeout': 0.15, 'rejected': 0.15, 'no_otp': 0.2}
+
+# Expected 'success' of each path's final result
+EXPECTED = {'otp': True, 'otp_timeout': None, 'rejected': False, 'no_otp': True}
+
+# Growth over the checked window that fails the run (one browser's worth of
+# processes, a few descriptors and threads per transfer in flight, ...)
+ALLOWANCES = {
+    'processes': 12,
+    'fds': 64,
+    'threads': 16,
+    'tmp_entries': 8,
+    'tmp_mb': 64,
+    'session_files': 32,
+}
+
+# Above the starting level allowed once all transfers have finished
+DRAIN_ALLOWANCES = {'processes': 0, 'fds': 16, 'threads': 4, 'tmp_entries': 2}
+
+SETTLE_SECONDS = 10
+
+
+def make_iban(bank_code, serial):
+    """Valid AO IBAN of a bank, distinct per serial"""
+    base = f"{bank_code}0000{serial % 10 ** 11:011d}"
+    check = next(c for c in range(100) if int(f"{base}{c:02d}102406") % 97 == 1)
+    return f"AO06{base}{check:02d}"
+
+
+def tmp_usage(path):
+    """(entries, MB) of a directory, not following links"""
+    size = 0
+    with os.scandir(path) as it:
+        top = list(it)
+    for entry in top:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                for root, _, files in os.walk(entry.path):
+                    for name in files:
+                        try:
+                            size += os.lstat(os.path.join(root, name)).st_size
+                        except OSError:
+                            pass
+            else:
+                size += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return len(top), size / (1024 * 1024)
+
+
+def sample(process, started):
+    """One footprint sample of this process"""
+    try:
+        session_files = sum(1 for name in os.listdir(session_manager.session_dir) if name.endswith('.json'))
+    except OSError:
+        session_files = 0
+    tmp_entries, tmp_mb = tmp_usage(tempfile.gettempdir())
+    return {
+        't': round(time.monotonic() - started, 1),
+        'processes': len(process.children(recursive=True)),
+        'fds': process.num_fds(),
+        'threads': process.num_threads(),
+        'tmp_entries': tmp_entries,
+        'tmp_mb': round(tmp_mb, 1),
+        'session_files': session_files,
+    }
+
+
+class Sampler:
+    def __init__(self, interval, output=None):
+        self.interval = interval
+        self.output = output
+        self.samples = []
+        self.process = psutil.Process()
+        self.started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def take(self):
+        record = sample(self.process, self.started)
+        self.samples.append(record)
+        if self.output:
+            self.output.write(json.dumps(record) + '\n')
+            self.output.flush()
+        return record
+
+    def start(self):
+        self.take()
+        self._thread = threading.Thread(target=self._run, name='soak-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.take()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.take()
+
+
+def run_transfer(serial, kind, bank_config, bank_code, run_id):
+    """Run one transfer down its path; returns (kind, success of its final result)"""
+    job = {
+        'transferData': {
+            'username': 'soak',
+            'password': 'soak',
+            'receiverIban': make_iban(bank_code, serial),
+            'amount': 1000 + serial % 1000,
+            'description': f"soak {serial}",
+            'clientReference': f"soak-{run_id}-{serial}",
+        },
+        'bankConfig': bank_config,
+    }
+    result = run_job(job)
+    if not result.get('requiresOtp') or kind == 'otp_timeout':
+        return kind, None if result.get('requiresOtp') else result.get('success')
+    result = deliver_local_otp(result['sessionId'], REJECTED_OTP if kind == 'rejected' else '123456')
+    return kind, result.get('success') if result else None
+
+
+def slope_check(samples, metric, window):
+    """(growth along the fitted line over the window, allowance, passed)"""
+    xs = [s['t'] for s in samples]
+    ys = [s[metric] for s in samples]
+    if len(set(xs)) < 2:
+        return 0.0, ALLOWANCES[metric], True
+    growth = statistics.linear_regression(xs, ys).slope * window
+    return growth, ALLOWANCES[metric], growth <= ALLOWANCES[metric]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transfers', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=10, help='seconds between samples')
+    parser.add_argument('--warmup', type=float, default=0.2, help='share of samples left out of the slope check')
+    parser.add_argument('--render-delay-ms', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', metavar='PATH', help='write every sample as a JSON line')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    kinds = rng.choices(list(MIX), weights=list(MIX.values()), k=args.transfers)
+    run_id = uuid.uuid4().hex[:8]
+    bank_code = sorted(supported_bank_codes())[0]
+
+    with_otp = MockPortal(render_delay_ms=args.render_delay_ms)
+    without_otp = MockPortal(require_otp=False, render_delay_ms=args.render_delay_ms)
+    banks = {'with_otp': mock_bank_config(with_otp.start())}
+    banks['without_otp'] = dict(mock_bank_config(without_otp.start()), id=f"{MOCK_BANK_ID}-no-otp")
+
+    output = open(args.json, 'w') if args.json else None
+    sampler = Sampler(args.interval, output)
+    baseline = sampler.take()
+    sampler.start()
+
+    outcomes = Counter()
+    unexpected = Counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(run_transfer, serial, kind,
+                            banks['without_otp' if kind == 'no_otp' else 'with_otp'], bank_code, run_id)
+                for serial, kind in enumerate(kinds)
+            ]
+            for done, future in enumerate(futures, start=1):
+                try:
+                    kind, success = future.result()
+                except Exception as e:
+                    kind, success = 'error', type(e).__name__
+                outcomes[kind] += 1
+                if EXPECTED.get(kind) != success:
+                    unexpected[kind] += 1
+                if done % 100 == 0:
+                    print(f"{done}/{args.transfers} transfers, last sample {sampler.samples[-1]}", flush=True)
+        # Unanswered OTPs: their monitors close the browsers on timeout
+        wait_for_parked_sessions()
+        time.sleep(SETTLE_SECONDS)
+        final = sampler.stop()
+    finally:
+        with_otp.stop()
+        without_otp.stop()
+        if output:
+            output.close()
+        shutil.rmtree(STATE_DIR, ignore_errors=True)
+
+    checked = sampler.samples[int(len(sampler.samples) * args.warmup):]
+    window = checked[-1]['t'] - checked[0]['t'] if checked else 0
+    longest_ttl = max(SESSION_TTLS.values())
+
+    failed = False
+    print(f"\n{args.transfers} transfers in {final['t']:.0f} s: {dict(outcomes)}; "
+          f"unexpected results: {dict(unexpected) or 'none'}")
+    print(f"{'metric':15} {'start':>8} {'peak':>8} {'end':>8} {'growth':>9} {'allowed':>8}  check window {window:.0f} s")
+    for metric in ALLOWANCES:
+        growth, allowance, passed = slope_check(checked, metric, window)
+        verdict = 'ok' if passed else 'GROWING'
+        if metric == 'session_files' and window <= longest_ttl:
+            verdict = f"not checked (window under {longest_ttl} s TTL)"
+            passed = True
+        drain = DRAIN_ALLOWANCES.get(metric)
+        if drain is not None and final[metric] > baseline[metric] + drain:
+            verdict += f", {final[metric] - baseline[metric]} left after drain"
+            passed = False
+        failed = failed or not passed
+        peak = max(s[metric] for s in sampler.samples)
+        print(f"{metric:15} {baseline[metric]:8} {peak:8} {final[metric]:8} {growth:+9.1f} {allowance:8}  {verdict}")
+
+    print('FAIL' if failed else 'PASS')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
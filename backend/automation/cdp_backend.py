@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+CDP DOM Backend for Bank Transfer Automation
+Runs plan steps through Chrome DevTools Protocol commands instead of the
+classic WebDriver element endpoints
+
+A WebDriver step costs one HTTP round-trip per find_element, clear, send_keys,
+click and get_attribute, plus one per poll while waiting. Here each step is a
+single Runtime.evaluate that waits, locates and acts inside the page (polling
+in-page, not over HTTP), and typing adds one Input.insertText. Commands go
+through chromedriver's executeCdpCommand endpoint, which relays them over the
+DevTools websocket chromedriver already keeps open to the browser, so this
+works for local and shared (remote) drivers alike.
+
+Missing elements raise the same Selenium exceptions as the WebDriver path, so
+optional and guard steps behave identically.
+"""
+
+import json
+import time
+import logging
+
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_MS = 50
+
+# After a click starts a navigation, lookups keep waiting this long for the
+# new document even if the step itself does not wait
+NAVIGATION_GRACE_MS = 10000
+
+# DevTools errors raised while the page is being replaced by a navigation
+NAVIGATION_ERRORS = (
+    'Execution context was destroyed',
+    'Inspected target navigated or closed',
+    'Cannot find context with specified id',
+)
+
+# In-page step runner: waits for the first matching selector, then acts on it.
+# window.__cdpLeaving marks a document that is navigating away so the next
+# lookup does not match elements of the page being left.
+DOM_STEP_JS = """
+async (op, args) => {
+  const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+  const isReady = (el) => {
+    if (!el) return false;
+    if (args.wait !== 'clickable') return true;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && !el.disabled &&
+      getComputedStyle(el).visibility !== 'hidden';
+  };
+  const started = performance.now();
+  let selector = null, el = null;
+  for (;;) {
+    const settled = !window.__cdpLeaving && document.readyState !== 'loading';
+    if (settled) {
+      for (const candidate of args.selectors) {
+        const found = document.querySelector(candidate);
+        if (isReady(found)) { selector = candidate; el = found; break; }
+      }
+      if (el) break;
+    }
+    const elapsed = performance.now() - started;
+    if (elapsed >= args.timeoutMs && (settled || elapsed >= args.timeoutMs + args.graceMs)) {
+      return {found: false};
+    }
+    await sleep(args.pollMs);
+  }
+
+  if (op === 'type') {
+    el.scrollIntoView({block: 'center'});
+    el.focus();
+    if (typeof el.select === 'function') el.select();
+    el.value = '';
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+  } else if (op === 'click') {
+    window.addEventListener('beforeunload', () => { window.__cdpLeaving = true; }, {once: true});
+    el.scrollIntoView({block: 'center'});
+    el.click();
+    await sleep(0);
+  } else if (op === 'submit') {
+    window.addEventListener('beforeunload', () => { window.__cdpLeaving = true; }, {once: true});
+    if (el.form) el.form.requestSubmit();
+    await sleep(0);
+  } else if (op === 'copy_labels') {
+    const labels = el.getElementsByTagName('label');
+    const inputs = el.getElementsByTagName('input');
+    for (let i = 0; i < Math.min(labels.length, inputs.length); i++) {
+      inputs[i].value = labels[i].innerText.trim();
+      inputs[i].dispatchEvent(new Event('input', {bubbles: true}));
+      inputs[i].dispatchEvent(new Event('change', {bubbles: true}));
+      await sleep(args.pauseMs);
+    }
+  } else if (op === 'read') {
+    return {found: true, selector, text: el.innerText, className: String(el.className)};
+  }
+  return {found: true, selector};
+}
+"""
+
+
+class CdpBackend:
+    def __init__(self, driver, poll_interval_ms=POLL_INTERVAL_MS):
+        self.driver = driver
+        self.poll_interval_ms = poll_interval_ms
+
+    def command(self, cmd, params=None):
+        """Send one DevTools command through chromedriver"""
+        return self.driver.execute('executeCdpCommand', {'cmd': cmd, 'params': params or {}})['value']
+
+    def run_step(self, step, value=None, timeout=None):
+        """Execute a compiled PlanStep; 'get' steps stay on WebDriver"""
+        timeout = timeout if step.wait else 0
+        if step.action == 'type':
+            self.type(step.selector, value, step.wait, timeout)
+        elif step.action == 'click':
+            self.click(step.selector, step.wait, timeout)
+        elif step.action == 'wait':
+            self.find(step.selector, step.wait, timeout)
+        elif step.action == 'copy_labels':
+            self.dom_step('copy_labels', step.selector, step.wait, timeout, pauseMs=int(step.pause * 1000))
+
+    def find(self, selectors, wait=None, timeout=0):
+        """Return the first selector that matches, in priority order"""
+        return self.dom_step('find', selectors, wait, timeout)['selector']
+
+    def first_present(self, selectors, timeout):
+        """Like find, but return None instead of raising when nothing matches"""
+        try:
+            return self.find(selectors, 'presence', timeout)
+        except TimeoutException:
+            return None
+
+    def type(self, selectors, value, wait=None, timeout=0):
+        """Clear the matching field and insert text as user input"""
+        selector = self.dom_step('type', selectors, wait, timeout)['selector']
+        self.command('Input.insertText', {'text': str(value)})
+        return selector
+
+    def click(self, selectors, wait=None, timeout=0):
+        """Click the first matching element"""
+        return self.dom_step('click', selectors, wait, timeout)['selector']
+
+    def submit(self, selector):
+        """Submit the form that owns an element (Enter-key fallback)"""
+        return self.dom_step('submit', selector)['selector']
+
+    def read(self, selectors, wait=None, timeout=0):
+        """Return {'selector', 'text', 'className'} for the first match"""
+        return self.dom_step('read', selectors, wait, timeout)
+
+    def page_source(self):
+        """Serialized DOM of the current page"""
+        response = self.command('Runtime.evaluate', {
+            'expression': 'document.documentElement.outerHTML',
+            'returnByValue': True,
+        })
+        return response['result'].get('value') or ''
+
+    def dom_step(self, op, selectors, wait=None, timeout=0, **extra):
+        """Run one in-page step; raises TimeoutException or NoSuchElementException if nothing matches"""
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        deadline = time.monotonic() + timeout + NAVIGATION_GRACE_MS / 1000
+
+        while True:
+            args = dict(
+                selectors=list(selectors),
+                wait=wait,
+                timeoutMs=int(timeout * 1000),
+                graceMs=NAVIGATION_GRACE_MS,
+                pollMs=self.poll_interval_ms,
+                **extra
+            )
+            try:
+                response = self.command('Runtime.evaluate', {
+                    'expression': f"({DOM_STEP_JS})({json.dumps(op)}, {json.dumps(args)})",
+                    'awaitPromise': True,
+                    'returnByValue': True,
+                    'userGesture': True,
+                })
+            except WebDriverException as e:
+                # The document went away mid-evaluation; retry on the new one
+                if any(marker in str(e) for marker in NAVIGATION_ERRORS) and time.monotonic() < deadline:
+                    time.sleep(self.poll_interval_ms / 1000)
+                    continue
+                raise
+
+            if 'exceptionDetails' in response:
+                details = response['exceptionDetails']
+                message = details.get('exception', {}).get('description') or details.get('text')
+                raise WebDriverException(f"CDP {op} failed: {message}")
+
+            result = response['result'].get('value') or {}
+            if result.get('found'):
+                return result
+            if wait:
+                raise TimeoutException(f"No element for {selectors} after {timeout}s")
+            raise NoSuchElementException(f"No element for {selectors}")
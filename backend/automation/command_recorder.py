@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Command Recorder for Bank Transfer Automation
+Opt-in log of every WebDriver command a transfer sends, with its duration and
+outcome, plus DOM snapshots at step boundaries, so slow production runs can be
+replayed offline (see benchmarks/replay_recording.py)
+
+Set AUTOMATION_RECORD_DIR to enable it. Each driver then writes
+<dir>/<session_id>/commands.jsonl and snapshots/NNNN-<step>.html. Typed text
+(sendKeys, Input.insertText) and sensitive fields are redacted, but snapshots
+hold whatever the portal displayed, so recordings must be handled as customer
+data.
+"""
+
+import json
+import os
+import re
+import time
+import logging
+import threading
+
+from structured_logging import redact, REDACTED
+
+logger = logging.getLogger(__name__)
+
+RECORD_DIR = os.environ.get('AUTOMATION_RECORD_DIR')
+
+# Step boundary events (see BankTransferAutomation.emit_event) that snapshot the DOM
+SNAPSHOT_EVENTS = ('step_started', 'step_finished', 'step_failed', 'otp_required', 'verifying')
+
+# W3C element reference key in command params and responses
+ELEMENT_KEY = 'element-6066-11e4-a52e-4f735466cecf'
+
+TYPING_COMMANDS = ('sendKeysToElement', 'sendKeysToActiveElement')
+
+
+def redact_params(command, params):
+    """Copy of a command's params with typed text and sensitive fields masked"""
+    params = redact(params or {})
+    if command in TYPING_COMMANDS:
+        if 'text' in params:
+            params['text'] = REDACTED
+        if 'value' in params:
+            params['value'] = [REDACTED]
+    elif command == 'executeCdpCommand' and params.get('cmd') == 'Input.insertText':
+        params['params'] = {'text': REDACTED}
+    return params
+
+
+def element_ids(value):
+    """Element ids in a find response value (one element or a list)"""
+    if isinstance(value, dict) and ELEMENT_KEY in value:
+        return [value[ELEMENT_KEY]]
+    if isinstance(value, list):
+        return [item[ELEMENT_KEY] for item in value if isinstance(item, dict) and ELEMENT_KEY in item]
+    return []
+
+
+class CommandRecorder:
+    def __init__(self, driver, directory):
+        self.driver = driver
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'snapshots'), exist_ok=True)
+        self._file = open(os.path.join(directory, 'commands.jsonl'), 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._seq = 0
+        self._started = time.perf_counter()
+
+        # Every driver call goes through command_executor.execute
+        self._execute = driver.command_executor.execute
+        driver.command_executor.execute = self._record
+        logger.info("🎥 Recording WebDriver commands to %s", directory)
+
+    def _record(self, command, params):
+        if getattr(self._local, 'paused', False):
+            return self._execute(command, params)
+
+        start = time.perf_counter()
+        try:
+            response = self._execute(command, params)
+        except Exception as e:
+            self._write({'command': command, 'params': redact_params(command, params)}, start,
+                        outcome=f"{type(e).__name__}: {str(e)[:200]}")
+            raise
+
+        value = response.get('value') if isinstance(response, dict) else None
+        entry = {'command': command, 'params': redact_params(command, params)}
+        if isinstance(value, dict) and 'error' in value:
+            outcome = f"{value['error']}: {str(value.get('message', ''))[:200]}"
+        else:
+            outcome = 'ok'
+            ids = element_ids(value)
+            if ids:
+                entry['elements'] = ids
+        self._write(entry, start, outcome)
+        return response
+
+    def snapshot(self, label):
+        """Save the current DOM and URL, tagged with a step label"""
+        self._local.paused = True
+        try:
+            url = self.driver.current_url
+            html = self.driver.page_source
+        except Exception as e:
+            logger.debug("No snapshot at %s: %s", label, e)
+            return
+        finally:
+            self._local.paused = False
+
+        with self._lock:
+            self._seq += 1
+            name = f"{self._seq:04d}-{re.sub(r'[^A-Za-z0-9_-]', '_', label)}.html"
+            with open(os.path.join(self.directory, 'snapshots', name), 'w', encoding='utf-8') as f:
+                f.write(html)
+            self._append({
+                'seq': self._seq,
+                'atMs': round((time.perf_counter() - self._started) * 1000, 1),
+                'snapshot': name,
+                'step': label,
+                'url': url,
+            })
+
+    def close(self):
+        """Restore the driver's executor and close the log"""
+        self.driver.command_executor.execute = self._execute
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entry, start, outcome):
+        with self._lock:
+            self._seq += 1
+            self._append({
+                'seq': self._seq,
+                'atMs': round((start - self._started) * 1000, 1),
+                'durationMs': round((time.perf_counter() - start) * 1000, 2),
+                'outcome': outcome,
+                **entry,
+            })
+
+    def _append(self, entry):
+        if self._file.closed:
+            return
+        self._file.write(json.dumps(entry, default=str, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+
+def start_recording(driver, session_id):
+    """CommandRecorder for a new driver if AUTOMATION_RECORD_DIR is set, else None"""
+    if not RECORD_DIR:
+        return None
+    try:
+        return CommandRecorder(driver, os.path.join(RECORD_DIR, session_id))
+    except OSError as e:
+        logger.warning("Could not start recording: %s", e)
+        return None
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Transfer Deadlines for Bank Transfer Automation
+One total time budget per transfer, shared by every wait, pause and page load
+of that transfer, instead of independent per-step timeouts
+
+Steps ask the deadline for their timeout: they get what they asked for, capped
+at the remaining budget, and must have at least their minimum left to start at
+all. Once the budget is gone DeadlineExceeded is raised, and the transfer is
+abandoned and its browser released.
+"""
+
+import os
+import time
+
+# Total budget for one transfer, including the wait for an OTP. Kept below the
+# Node service's hard kill so the worker always gives up first.
+TRANSFER_DEADLINE_SECONDS = float(os.environ.get('TRANSFER_DEADLINE_SECONDS', '540'))
+
+# A step is not started with less than this left
+MIN_STEP_SECONDS = 2
+
+
+class DeadlineExceeded(BaseException):
+    """Raised when a transfer's budget runs out
+
+    Like asyncio.CancelledError this derives from BaseException, so the
+    'except Exception' blocks around individual steps (optional steps, retries,
+    error wrapping) cannot swallow it; only the transfer entry points catch it.
+    """
+
+
+class Deadline:
+    def __init__(self, budget=None, not_after=None):
+        """budget in seconds from now (None for unlimited); not_after is an
+        optional caller deadline as a Unix timestamp, whichever comes first"""
+        now = time.monotonic()
+        self.expires_at = now + budget if budget is not None else float('inf')
+        if not_after is not None:
+            self.expires_at = min(self.expires_at, now + float(not_after) - time.time())
+
+    def remaining(self):
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, what='transfer'):
+        """Raise DeadlineExceeded if the budget is gone"""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded during {what}")
+
+    def timeout(self, wanted, minimum=MIN_STEP_SECONDS, what='step'):
+        """Timeout for a wait: wanted, capped at the remaining budget
+
+        Raises DeadlineExceeded if less than minimum is left.
+        """
+        remaining = self.remaining()
+        if remaining < min(minimum, wanted):
+            raise DeadlineExceeded(f"Deadline exceeded before {what} ({remaining:.1f}s left)")
+        return min(wanted, remaining)
+
+    def sleep(self, seconds):
+        """Sleep without overrunning the budget"""
+        time.sleep(min(seconds, self.remaining()))
+        self.check('pause')
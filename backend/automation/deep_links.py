@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Learned Deep Links for Bank Transfer Automation
+Remembers, per bank, the URL the transfer form was reached at through the
+menu, so later transfers open it directly instead of clicking through
+
+The URL is stored without volatile query parameters (session ids, tokens,
+nonces, cache busters); banks whose form URL only works with its token fail
+the check on the next run and navigate through the menu again; a link that
+failed is not learned again for REJECT_SECONDS.
+Links are kept in a JSON file shared by every worker process, next to the
+bank health state.
+"""
+
+import json
+import os
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+DEEP_LINKS_FILE = os.environ.get(
+    'AUTOMATION_DEEP_LINKS_FILE',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'deep_links.json')
+)
+
+# Time allowed for a deep link to show the transfer form before falling back
+DEEP_LINK_TIMEOUT = float(os.environ.get('AUTOMATION_DEEP_LINK_TIMEOUT', '10'))
+
+# A link that did not show the form is not learned again for this long, so a
+# bank whose form needs its token does not alternate between link and menu
+REJECT_SECONDS = 24 * 3600
+
+# Query parameter names that change from session to session
+VOLATILE_PARAM = re.compile(
+    r'(token|session|sid|nonce|csrf|xsrf|state|auth|ticket|timestamp|^ts$|^_$|^t$|^rnd$|^r$|cache)',
+    re.IGNORECASE
+)
+
+# Path parameters some servlet containers add to every URL
+PATH_SESSION = re.compile(r';jsessionid=[^/?#]*', re.IGNORECASE)
+
+
+def stable_url(url):
+    """URL with session-specific query and path parameters removed"""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not VOLATILE_PARAM.search(key)]
+    return urlunsplit((parts.scheme, parts.netloc, PATH_SESSION.sub('', parts.path),
+                       urlencode(query), parts.fragment))
+
+
+class DeepLinks:
+    def __init__(self, path=DEEP_LINKS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def lookup(self, bank_id):
+        """Cached transfer form URL for a bank, or None"""
+        entry = self._read().get(bank_id)
+        return entry.get('url') if entry else None
+
+    def record(self, bank_id, url):
+        """Remember the transfer form URL reached through the menu"""
+        url = stable_url(url)
+
+        def store(links):
+            entry = links.get(bank_id) or {}
+            if entry.get('url') == url:
+                return False
+            if entry.get('rejected') == url and time.time() - entry.get('rejectedAt', 0) < REJECT_SECONDS:
+                return False
+            links[bank_id] = {'url': url, 'learnedAt': time.time()}
+            return True
+
+        if self._update(store):
+            logger.info("🔗 Learned transfer form link for %s", bank_id)
+
+    def invalidate(self, bank_id, url):
+        """Forget a bank's link after it failed to show the form"""
+        def drop(links):
+            entry = links.get(bank_id)
+            if not entry or entry.get('url') != url:
+                return False
+            links[bank_id] = {'rejected': url, 'rejectedAt': time.time()}
+            return True
+
+        if self._update(drop):
+            logger.info("🔗 Forgot transfer form link for %s", bank_id)
+
+    def snapshot(self):
+        return self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, change):
+        """Read-modify-write the links file under a thread and file lock; True if it changed"""
+        with self._lock, self._file_lock():
+            links = self._read()
+            if not change(links):
+                return False
+            temp_file = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_file, 'w') as f:
+                    json.dump(links, f, indent=2)
+                os.replace(temp_file, self.path)
+            except OSError as e:
+                logger.warning("Could not write deep links: %s", e)
+                return False
+            return True
+
+    @contextmanager
+    def _file_lock(self):
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Global deep links instance
+deep_links = DeepLinks()
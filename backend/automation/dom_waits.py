@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Push-based Element Waits for Bank Transfer Automation
+Replaces WebDriverWait polling with a MutationObserver installed through one
+async script, which resolves as soon as any of several conditions holds
+
+WebDriverWait re-queries the element over HTTP every 500 ms, so each wait costs
+one round-trip per poll and detects changes up to half a second late. Here the
+page reports back itself: the observer re-checks on every DOM mutation (with a
+short in-page timer for pure style/layout changes) and the script returns which
+condition fired, in a single WebDriver call.
+
+Conditions are (css selector, state) pairs, state being one of:
+    presence  - an element matches
+    clickable - a matching element is visible and enabled
+    absence   - no visible element matches
+"""
+
+import time
+import logging
+import weakref
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+STATES = ('presence', 'clickable', 'absence')
+
+# In-page re-check for changes that are not DOM mutations (CSS transitions)
+FALLBACK_CHECK_MS = 250
+
+# Extra room on the WebDriver script timeout so the in-page timeout fires first
+SCRIPT_TIMEOUT_MARGIN = 5
+
+# Errors returned when the page navigates while the script is waiting
+NAVIGATION_ERRORS = (
+    'document unloaded',
+    'Execution context was destroyed',
+    'target frame detached',
+)
+
+WaitResult = namedtuple('WaitResult', 'index selector state element')
+
+WAIT_FOR_ANY_JS = """
+const [conditions, timeoutMs, fallbackMs, done] = arguments;
+const visible = (el) => {
+  const rect = el.getBoundingClientRect();
+  return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+};
+const holds = (selector, state) => {
+  const el = document.querySelector(selector);
+  if (state === 'absence') return !el || !visible(el) ? {el: null} : null;
+  if (!el) return null;
+  if (state === 'clickable' && (!visible(el) || el.disabled)) return null;
+  return {el};
+};
+let observer = null, timer = null, fallback = null, finished = false;
+const finish = (result) => {
+  if (finished) return;
+  finished = true;
+  if (observer) observer.disconnect();
+  clearTimeout(timer);
+  clearInterval(fallback);
+  done(result);
+};
+const check = () => {
+  for (let i = 0; i < conditions.length; i++) {
+    const match = holds(conditions[i][0], conditions[i][1]);
+    if (match) { finish({index: i, element: match.el}); return; }
+  }
+};
+check();
+if (!finished) {
+  observer = new MutationObserver(check);
+  observer.observe(document, {childList: true, subtree: true, attributes: true});
+  fallback = setInterval(check, fallbackMs);
+  timer = setTimeout(() => finish(null), timeoutMs);
+}
+"""
+
+# Script timeout last set per driver, so it is only changed when it must grow
+_script_timeouts = weakref.WeakKeyDictionary()
+
+
+def wait_for_any(driver, conditions, timeout):
+    """Wait until any (selector, state) condition holds and return a WaitResult
+
+    Conditions are checked in order, so earlier ones win when several hold at
+    once. element is None for absence. Raises selenium's TimeoutException if
+    nothing fires within timeout seconds.
+    """
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    conditions = [[selector, state] for selector, state in conditions]
+    for _, state in conditions:
+        if state not in STATES:
+            raise ValueError(f"Unknown wait state: {state}")
+
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = max(0.0, deadline - time.monotonic())
+        _ensure_script_timeout(driver, remaining + SCRIPT_TIMEOUT_MARGIN)
+        try:
+            result = driver.execute_async_script(
+                WAIT_FOR_ANY_JS, conditions, int(remaining * 1000), FALLBACK_CHECK_MS
+            )
+        except WebDriverException as e:
+            # The page navigated away under the observer; watch the new one
+            if any(marker in str(e) for marker in NAVIGATION_ERRORS) and time.monotonic() < deadline:
+                continue
+            raise
+
+        if result is None:
+            selectors = ', '.join(selector for selector, _ in conditions)
+            raise TimeoutException(f"No condition met for {selectors} within {timeout}s")
+
+        selector, state = conditions[result['index']]
+        return WaitResult(result['index'], selector, state, result.get('element'))
+
+
+def _ensure_script_timeout(driver, seconds):
+    if seconds <= _script_timeouts.get(driver, 0):
+        return
+    driver.set_script_timeout(seconds)
+    _script_timeouts[driver] = seconds
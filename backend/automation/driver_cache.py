@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Driver Cache for Bank Transfer Automation
+Resolves the chromedriver and Chrome binaries once and pins them in a small
+on-disk manifest, so building a driver never goes through Selenium Manager
+
+A manifest entry stays valid while both files keep the size and mtime they had
+when they were resolved; anything else triggers a fresh discovery.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.environ.get(
+    'CHROMEDRIVER_MANIFEST',
+    os.path.join(os.path.dirname(__file__), '.driver_cache', 'manifest.json')
+)
+
+BROWSER_NAMES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser')
+
+
+def _fingerprint(path):
+    """Return (size, mtime) for a file, or None if it is gone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def _probe_version(path):
+    """Return the '--version' output of a binary; only called on a cache miss"""
+    try:
+        return subprocess.run(
+            [path, '--version'], capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class DriverCache:
+    def __init__(self, manifest_path=MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self._resolved = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """Return the pinned {'driver_path', 'browser_path', ...} entry"""
+        resolved = self._resolved
+        if resolved:
+            return resolved
+
+        with self._lock:
+            if self._resolved:
+                return self._resolved
+            manifest = self._read_manifest()
+            if manifest and self._is_valid(manifest):
+                self._resolved = manifest
+            else:
+                self._resolved = self._discover()
+                self._write_manifest(self._resolved)
+            return self._resolved
+
+    def service(self):
+        """Build a chromedriver Service pinned to the resolved executable"""
+        from selenium.webdriver.chrome.service import Service
+
+        return Service(executable_path=self.resolve()['driver_path'])
+
+    def apply(self, options):
+        """Point Chrome options at the resolved browser binary"""
+        browser_path = self.resolve().get('browser_path')
+        if browser_path:
+            options.binary_location = browser_path
+        return options
+
+    def invalidate(self):
+        """Forget the pinned binaries, e.g. after a failed driver start"""
+        with self._lock:
+            self._resolved = None
+            try:
+                os.remove(self.manifest_path)
+            except OSError:
+                pass
+
+    def _is_valid(self, manifest):
+        if _fingerprint(manifest.get('driver_path', '')) != manifest.get('driver_fingerprint'):
+            return False
+        browser_path = manifest.get('browser_path')
+        if browser_path and _fingerprint(browser_path) != manifest.get('browser_fingerprint'):
+            return False
+        return True
+
+    def _discover(self):
+        logger.info("🔎 Resolving chromedriver and Chrome binaries...")
+        browser_path = os.environ.get('CHROME_BINARY')
+        if not browser_path:
+            browser_path = next((p for p in map(shutil.which, BROWSER_NAMES) if p), None)
+
+        driver_path = os.environ.get('CHROMEDRIVER_PATH') or shutil.which('chromedriver')
+        if not driver_path:
+            try:
+                from webdriver_manager.chrome import ChromeDriverManager
+                driver_path = ChromeDriverManager().install()
+            except Exception as e:
+                logger.warning("webdriver-manager could not provide chromedriver: %s", e)
+        if not driver_path:
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.common.selenium_manager import SeleniumManager
+            options = Options()
+            if browser_path:
+                options.binary_location = browser_path
+            driver_path = SeleniumManager().driver_location(options)
+
+        entry = {
+            'driver_path': driver_path,
+            'driver_fingerprint': _fingerprint(driver_path),
+            'driver_version': _probe_version(driver_path),
+            'browser_path': browser_path,
+            'browser_fingerprint': _fingerprint(browser_path) if browser_path else None,
+            'browser_version': _probe_version(browser_path) if browser_path else None,
+        }
+        logger.info("✅ Pinned chromedriver %s (%s)", driver_path, entry['driver_version'])
+        return entry
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, entry):
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            temp_file = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(entry, f, indent=2)
+            os.replace(temp_file, self.manifest_path)
+        except OSError as e:
+            logger.warning("Could not write driver manifest: %s", e)
+
+
+# Global driver cache instance
+driver_cache = DriverCache()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Shared Driver Service for Bank Transfer Automation
+Runs one long-lived chromedriver per worker process and creates every browser
+session against it as a remote WebDriver session, instead of spawning a
+chromedriver (and its port) per transfer
+
+The service is health-checked through chromedriver's /status endpoint and
+restarted when it stops answering.
+"""
+
+import json
+import logging
+import threading
+import urllib.request
+
+from driver_cache import driver_cache
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = 30
+HEALTH_CHECK_TIMEOUT = 2
+
+
+class SharedDriverService:
+    def __init__(self, cache=driver_cache):
+        self.cache = cache
+        self._service = None
+        self._lock = threading.Lock()
+        self._monitor_thread = None
+        self._monitor_stop = threading.Event()
+        self.restarts = 0
+
+    @property
+    def url(self):
+        """Base URL of the running chromedriver, starting it if needed"""
+        return self.ensure_running()
+
+    def ensure_running(self):
+        """Return the service URL, (re)starting chromedriver if it is unhealthy"""
+        with self._lock:
+            if not self.is_healthy():
+                self._restart()
+            return self._service.service_url
+
+    def create_driver(self, options):
+        """Open a new browser session on the shared chromedriver
+
+        The session goes through a ChromiumRemoteConnection, not the generic
+        RemoteConnection, so Chrome-only commands such as executeCdpCommand
+        (used by cdp_backend) are available as on a local driver.
+        """
+        from selenium import webdriver
+        from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+
+        self.cache.apply(options)
+        executor = ChromiumRemoteConnection(
+            remote_server_addr=self.ensure_running(),
+            vendor_prefix='goog',
+            browser_name=options.capabilities.get('browserName', 'chrome'),
+            keep_alive=True,
+        )
+        return webdriver.Remote(command_executor=executor, options=options)
+
+    def is_healthy(self):
+        """True if chromedriver is running and reports itself ready"""
+        service = self._service
+        if not service or not service.process or service.process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f"{service.service_url}/status", timeout=HEALTH_CHECK_TIMEOUT) as response:
+                status = json.loads(response.read())
+            return bool(status.get('value', {}).get('ready', False))
+        except Exception as e:
+            logger.warning("chromedriver health check failed: %s", e)
+            return False
+
+    def browser_pid_for(self, user_data_dir):
+        """Find the Chrome process the shared chromedriver launched for a profile"""
+        import psutil
+
+        service = self._service
+        if not service or not service.process:
+            return None
+        try:
+            for child in psutil.Process(service.process.pid).children():
+                if f"--user-data-dir={user_data_dir}" in child.cmdline():
+                    return child.pid
+        except psutil.Error:
+            pass
+        return None
+
+    def process_pid(self):
+        """PID of the chromedriver process, if running"""
+        service = self._service
+        return service.process.pid if service and service.process else None
+
+    def start_health_monitor(self, interval=HEALTH_CHECK_INTERVAL):
+        """Check health in the background and restart chromedriver when needed"""
+        if self._monitor_thread and self._monitor_thread.is_alive():
+            return
+        self._monitor_stop.clear()
+        self._monitor_thread = threading.Thread(
+            target=self._run_health_monitor,
+            args=(interval,),
+            name='chromedriver-health',
+            daemon=True
+        )
+        self._monitor_thread.start()
+
+    def stop(self):
+        """Stop the health monitor and the chromedriver process"""
+        self._monitor_stop.set()
+        with self._lock:
+            if self._service:
+                try:
+                    self._service.stop()
+                except Exception as e:
+                    logger.warning("Error stopping chromedriver: %s", e)
+                self._service = None
+
+    def _run_health_monitor(self, interval):
+        while not self._monitor_stop.wait(interval):
+            try:
+                self.ensure_running()
+            except Exception as e:
+                logger.error("❌ Could not restart chromedriver: %s", e)
+
+    def _restart(self):
+        if self._service:
+            logger.warning("🔁 Restarting shared chromedriver")
+            self.restarts += 1
+            try:
+                self._service.stop()
+            except Exception:
+                pass
+        self._service = self.cache.service()
+        self._service.start()
+        logger.info("✅ Shared chromedriver listening on %s", self._service.service_url)
+
+
+# Global shared driver service, started on first use
+shared_driver_service = SharedDriverService()
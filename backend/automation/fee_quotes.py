@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Fee Quotes for Bank Transfer Automation
+Per-bank tariff schedules from data/tariffs.json, quoted for one amount or for
+a whole array of amounts in one call
+
+A schedule has a fixed component, a minimum and a maximum, and tiers ordered
+by upTo (the last one open-ended, upTo null). An amount is charged the rate
+and fixed part of the first tier whose upTo it does not exceed:
+
+    fee = clamp(fixed + tier.fixed + amount * tier.rate, minimum, maximum)
+
+rounded to cents. Banks without a schedule use "default".
+
+quote_many() runs column-wise with numpy when it is installed and as a
+plain-Python loop otherwise.
+
+Usage:
+    python fee_quotes.py payouts.jsonl [--bank bai]
+"""
+
+import bisect
+import json
+import os
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+TARIFFS_FILE = os.environ.get(
+    'FEE_TARIFFS_FILE',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'tariffs.json')
+)
+
+DEFAULT_TARIFF = 'default'
+
+# Tier bounds as a sorted list (the open-ended last tier as infinity) with the
+# rate and fixed part of each tier at the same index
+Tariff = namedtuple('Tariff', 'fixed minimum maximum bounds rates tier_fixed')
+
+
+class TariffError(ValueError):
+    """Raised for a malformed tariff schedule"""
+
+
+def compile_tariff(name, schedule):
+    """Validate one schedule from tariffs.json and return a Tariff"""
+    tiers = schedule.get('tiers') or []
+    if not tiers:
+        raise TariffError(f"{name}: tariff needs at least one tier")
+    if tiers[-1].get('upTo') is not None:
+        raise TariffError(f"{name}: last tier must be open-ended (upTo null)")
+
+    bounds = [float(tier['upTo']) for tier in tiers[:-1]] + [float('inf')]
+    if bounds != sorted(bounds) or len(set(bounds)) != len(bounds):
+        raise TariffError(f"{name}: tiers must be in increasing upTo order")
+
+    minimum = float(schedule.get('minimum', 0))
+    maximum = float(schedule['maximum']) if schedule.get('maximum') is not None else float('inf')
+    if minimum > maximum:
+        raise TariffError(f"{name}: minimum is above maximum")
+
+    return Tariff(
+        fixed=float(schedule.get('fixed', 0)),
+        minimum=minimum,
+        maximum=maximum,
+        bounds=bounds,
+        rates=[float(tier.get('rate', 0)) for tier in tiers],
+        tier_fixed=[float(tier.get('fixed', 0)) for tier in tiers],
+    )
+
+
+def quote_one(tariff, amount):
+    """Fee for one amount under a compiled tariff"""
+    amount = float(amount)
+    tier = bisect.bisect_left(tariff.bounds, amount)
+    fee = tariff.fixed + tariff.tier_fixed[tier] + amount * tariff.rates[tier]
+    return round(min(max(fee, tariff.minimum), tariff.maximum), 2)
+
+
+class FeeQuotes:
+    def __init__(self, path=TARIFFS_FILE):
+        self.path = path
+        self._tariffs = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read and compile every schedule once; returns {bank_id: Tariff}"""
+        if self._tariffs is not None:
+            return self._tariffs
+        with self._lock:
+            if self._tariffs is None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    schedules = json.load(f)
+                if DEFAULT_TARIFF not in schedules:
+                    raise TariffError(f"{self.path}: no '{DEFAULT_TARIFF}' tariff")
+                self._tariffs = {name: compile_tariff(name, schedule) for name, schedule in schedules.items()}
+                logger.info("💱 Loaded %s tariff schedules", len(self._tariffs))
+        return self._tariffs
+
+    def known_banks(self):
+        """Bank ids that can be quoted: registered banks and banks with their own tariff"""
+        from bank_registry import bank_registry
+
+        return sorted((set(bank_registry.bank_ids()) | set(self.load())) - {DEFAULT_TARIFF})
+
+    def tariff_for(self, bank_id=None):
+        tariffs = self.load()
+        return tariffs.get(bank_id) or tariffs[DEFAULT_TARIFF]
+
+    def quote(self, amount, bank_id=None):
+        """Fee for one amount"""
+        return quote_one(self.tariff_for(bank_id), amount)
+
+    def quote_many(self, amounts, bank_id=None, use_numpy=True):
+        """Fees for many amounts in one call
+
+        Returns a float numpy array when numpy is used, a list otherwise.
+        """
+        tariff = self.tariff_for(bank_id)
+        numpy = None
+        if use_numpy:
+            try:
+                import numpy
+            except ImportError:
+                numpy = None
+
+        if numpy is None:
+            return [quote_one(tariff, amount) for amount in amounts]
+
+        values = numpy.asarray(amounts, dtype=float)
+        tiers = numpy.searchsorted(numpy.array(tariff.bounds), values, side='left')
+        fees = tariff.fixed + numpy.array(tariff.tier_fixed)[tiers] + values * numpy.array(tariff.rates)[tiers]
+        return numpy.round(numpy.clip(fees, tariff.minimum, tariff.maximum), 2)
+
+
+# Global fee quotes instance
+fee_quotes = FeeQuotes()
+
+
+def main():
+    """Quote every row of a JSON Lines payout file and print the totals"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Quote transfer fees for a payout file')
+    parser.add_argument('payouts', help='JSON Lines file with an amount per row')
+    parser.add_argument('--bank', help='bank id of the tariff to use (default tariff otherwise)')
+    parser.add_argument('--rows', action='store_true', help='print the fee of every row')
+    args = parser.parse_args()
+    if args.bank and args.bank not in fee_quotes.known_banks():
+        parser.error(f"unknown bank {args.bank}; known: {', '.join(fee_quotes.known_banks())}")
+
+    with open(args.payouts, 'r') as f:
+        amounts = [float(json.loads(line)['amount']) for line in f if line.strip()]
+
+    fees = fee_quotes.quote_many(amounts, args.bank)
+    total = fees.sum() if hasattr(fees, 'sum') else sum(fees)
+    if args.rows:
+        for line_number, (amount, fee) in enumerate(zip(amounts, fees), start=1):
+            print(json.dumps({'line': line_number, 'amount': amount, 'fee': float(fee)}))
+    print(json.dumps({'rows': len(amounts), 'amount': round(sum(amounts), 2), 'fees': round(float(total), 2)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Idempotent Transfers for Bank Transfer Automation
+Runs each distinct transfer once: duplicates submitted while it is in flight
+wait for its result instead of starting a second browser, and later retries
+get the stored result for IDEMPOTENCY_TTL seconds
+
+A transfer is identified by its clientReference when the caller sends one,
+otherwise by a hash of bank id, payer username, receiver IBAN and amount (so
+the same payment to the same account within the TTL runs once; callers that
+mean to repeat it must send distinct clientReferences).
+
+Keys are claimed in the session store, so duplicates are caught across worker
+processes; within a process they are coalesced without touching disk. A
+duplicate waits no longer than its own deadline; then it gets an 'inProgress'
+result instead of the transfer's.
+"""
+
+import hashlib
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+from session_manager import session_manager
+from transfer_validation import normalize_iban
+from deadline import TRANSFER_DEADLINE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# How long a finished transfer's result answers retries
+IDEMPOTENCY_TTL = float(os.environ.get('TRANSFER_IDEMPOTENCY_TTL', '600'))
+
+# A claim outlives its transfer's deadline, so a worker that died mid-run
+# does not block retries forever
+CLAIM_TTL = TRANSFER_DEADLINE_SECONDS + 60
+
+POLL_INTERVAL = 1
+
+
+def idempotency_key(transfer_data, bank_config):
+    """Session store record id for a transfer"""
+    bank_id = bank_config.get('id', '')
+    reference = transfer_data.get('clientReference')
+    if reference:
+        basis = f"ref|{bank_id}|{reference}"
+    else:
+        try:
+            amount = f"{float(transfer_data.get('amount')):.2f}"
+        except (TypeError, ValueError):
+            amount = str(transfer_data.get('amount'))
+        basis = '|'.join([bank_id, str(transfer_data.get('username', '')),
+                          normalize_iban(transfer_data.get('receiverIban')), amount])
+    return 'idem-' + hashlib.sha256(basis.encode('utf-8')).hexdigest()[:32]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class Idempotency:
+    def __init__(self, store=session_manager):
+        self.store = store
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, func, keep, deadline=None):
+        """Run func() once per key and return its result
+
+        keep(result) decides whether the result is stored for retries; results
+        that are not kept (nothing reached the bank) release the key so a
+        retry runs again. Duplicates get the result with 'idempotentReplay',
+        or an 'inProgress' result once their deadline (a Deadline) runs out.
+        """
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+
+        if not leader:
+            logger.info("🔂 Transfer %s already running here, waiting for its result", key)
+            if not flight.done.wait(deadline.remaining() if deadline else None):
+                return self._in_progress(key)
+            return self._replayed(flight.result)
+
+        try:
+            flight.result = self._run_once(key, func, keep, deadline)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def complete(self, key, result):
+        """Replace the stored result of a transfer that finished later (after its OTP)"""
+        if key and self.store.get_record(key) is not None:
+            self.store.store_record(key, {'status': 'completed', 'result': result}, IDEMPOTENCY_TTL)
+
+    def release(self, key):
+        """Forget a transfer that ended without reaching the bank, so a retry runs it"""
+        if key:
+            self.store.delete_session(key)
+
+    def release_lost(self, key, session_id):
+        """Forget the stored requiresOtp result of a session whose node is gone
+
+        Only that session's own result is removed, so a replay started by
+        another worker in the meantime is found instead of run again.
+        """
+        def lost(record):
+            result = record.get('result') or {}
+            return record.get('status') == 'completed' and result.get('requiresOtp') and \
+                result.get('sessionId') == session_id
+
+        if key and self.store.delete_record(key, lost):
+            logger.info("🔂 Released transfer %s of lost session %s", key, session_id)
+
+    def _run_once(self, key, func, keep, deadline=None):
+        while True:
+            record = self.store.get_record(key)
+            if record and record.get('status') == 'completed':
+                logger.info("🔂 Transfer %s already done, returning its result", key)
+                return self._replayed(record['result'])
+            if record is None and self.store.claim_record(key, {'status': 'in_progress', 'pid': os.getpid()},
+                                                          CLAIM_TTL):
+                break
+            # Another worker holds the key: wait for its result or its claim to
+            # lapse, but not past this request's own deadline
+            if deadline and deadline.remaining() < POLL_INTERVAL:
+                return self._in_progress(key)
+            logger.info("🔂 Transfer %s in flight elsewhere, waiting", key)
+            time.sleep(POLL_INTERVAL)
+
+        result = None
+        try:
+            result = func()
+            return result
+        finally:
+            if result is not None and keep(result):
+                self.store.store_record(key, {'status': 'completed', 'result': result}, IDEMPOTENCY_TTL)
+            else:
+                self.store.delete_session(key)
+
+    def _in_progress(self, key):
+        logger.warning("🔂 Transfer %s still in flight at this request's deadline", key)
+        return {
+            'success': False,
+            'inProgress': True,
+            'message': 'Transferência idêntica ainda em curso; consulte o resultado mais tarde',
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def _replayed(self, result):
+        if result is None:
+            return {'success': False, 'message': 'Erro na transferência', 'timestamp': datetime.now().isoformat()}
+        return {**result, 'idempotentReplay': True}
+
+
+# Global idempotency instance
+idempotency = Idempotency()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Job Profiler for Bank Transfer Automation
+Opt-in cProfile run of a single job, to tell Python overhead (session file
+rewrites, selector loops, logging) apart from time spent waiting on the browser
+
+Enabled per job with "profile": true or for every job with --profile; nothing
+here is imported otherwise. The profile is written to
+profiles/<session_id>.pstats (AUTOMATION_PROFILE_DIR) and the top functions
+by own time are attached to the result under 'profile'. Waits on the browser
+show up as socket reads and sleeps, everything else is Python.
+
+cProfile follows the calling thread only: a transfer's OTP wait and
+processing, which run on its monitor thread, are not included.
+
+    python -m pstats profiles/<session_id>.pstats
+"""
+
+import os
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.environ.get(
+    'AUTOMATION_PROFILE_DIR',
+    os.path.join(os.path.dirname(__file__), 'profiles')
+)
+
+TOP_N = 15
+
+
+def summarize(stats, top=TOP_N):
+    """Top functions of a pstats.Stats by own (not cumulative) time"""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return [
+        {
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'ownMs': round(own * 1000, 1),
+            'cumulativeMs': round(cumulative * 1000, 1),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows
+    ]
+
+
+def run_profiled(func, name_for, top=TOP_N):
+    """Call func() under cProfile and attach the summary to its result dict
+
+    name_for() is called afterwards for the profile's file name (the
+    session id, which is only known once the job has started).
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active in this interpreter
+        logger.warning("Profiling unavailable: %s", e)
+        result = func()
+        result['profile'] = {'error': str(e)}
+        return result
+
+    try:
+        result = func()
+    finally:
+        profiler.disable()
+
+    path = os.path.join(PROFILE_DIR, f"{name_for() or uuid.uuid4().hex}.pstats")
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as e:
+        logger.warning("Could not write profile %s: %s", path, e)
+        path = None
+
+    stats = pstats.Stats(profiler)
+    result['profile'] = {
+        'path': path,
+        'totalMs': round(stats.total_tt * 1000, 1),
+        'top': summarize(stats, top),
+    }
+    logger.info("⏱️ Profile written to %s", path)
+    return result
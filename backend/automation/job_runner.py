@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Job Runner for Bank Transfer Automation
+Reads transfer jobs as JSON Lines and runs them through a bounded worker pool,
+emitting one result line per job (or per item for batch jobs) as it completes
+
+With events on, handlers also get an on_event callback whose progress events
+are written as they happen, and result lines are tagged 'event': 'result'.
+"""
+
+import json
+import sys
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Browsers are heavy; keep the default pool small
+DEFAULT_WORKERS = 2
+
+
+def read_jobs(stream):
+    """Yield one job per non-empty line; unparsable lines become error jobs"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {'jobId': f"line-{line_number}", '_error': f"Invalid JSON input data: {e}"}
+            continue
+        if not isinstance(job, dict):
+            yield {'jobId': f"line-{line_number}", '_error': 'Job must be a JSON object'}
+            continue
+        job.setdefault('jobId', f"line-{line_number}")
+        yield job
+
+
+def read_single_job(stream):
+    """Read exactly one JSON job from the first line of a stream"""
+    return json.loads(stream.readline())
+
+
+class JobRunner:
+    def __init__(self, handler, max_workers=DEFAULT_WORKERS, output=None, is_light=None, events=False):
+        self.handler = handler
+        self.events = events
+        # Light jobs (e.g. an OTP for a browser this process already holds)
+        # run outside the pool so they never wait behind the job they unblock
+        self.is_light = is_light or (lambda job: False)
+        self.max_workers = max(1, int(max_workers))
+        self.output = output or sys.stdout
+        self._output_lock = threading.Lock()
+        # One slot per worker so a large input file is read only as fast as
+        # jobs are picked up, never buffered whole in memory
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+    def run(self, jobs):
+        """Run every job from an iterable and return how many were processed"""
+        count = 0
+        light_threads = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='transfer-job') as pool:
+            for job in jobs:
+                count += 1
+                if self.is_light(job):
+                    thread = threading.Thread(target=self._run_one, args=(job, False), daemon=True)
+                    thread.start()
+                    light_threads.append(thread)
+                    continue
+                self._slots.acquire()
+                pool.submit(self._run_one, job)
+            for thread in light_threads:
+                thread.join()
+        logger.info("📦 Processed %s jobs", count)
+        return count
+
+    def emit(self, record):
+        """Write one result line; safe to call from any worker thread"""
+        line = json.dumps(record, default=str)
+        with self._output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def _run_one(self, job, holds_slot=True):
+        job_id = job.get('jobId')
+        try:
+            if '_error' in job:
+                raise ValueError(job['_error'])
+            if self.events:
+                result = self.handler(job, on_event=lambda event: self.emit({'jobId': job_id, **event}))
+            else:
+                result = self.handler(job)
+            tag = {'event': 'result'} if self.events else {}
+            if isinstance(result, dict):
+                self.emit({'jobId': job_id, **tag, **result})
+            else:
+                # Streaming handlers (batch payouts) yield one record per item
+                for item in result:
+                    self.emit({'jobId': job_id, **tag, **item})
+        except Exception as e:
+            logger.error("❌ Job %s failed: %s", job_id, e)
+            self.emit({
+                'jobId': job_id,
+                **({'event': 'result'} if self.events else {}),
+                'success': False,
+                'message': str(e) if '_error' in job else f'Automation error: {str(e)}',
+                'timestamp': datetime.now().isoformat()
+            })
+        finally:
+            if holds_slot:
+                self._slots.release()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Node Control for Bank Transfer Automation
+Identifies this worker as a node and serves a small HTTP control endpoint, so
+an OTP for a session can be forwarded to whichever node holds its browser
+
+Every checkpoint a worker writes carries owner_node and control_endpoint. A
+submit_otp that lands elsewhere is POSTed to that endpoint; the owner hands
+the code to its waiting session and answers with the transfer result.
+
+    POST /sessions/<session_id>/otp   {"otpCode": "..."}  -> result JSON
+    GET  /health                                           -> {"nodeId", "sessions"}
+    GET  /metrics                                          -> per-session memory
+
+Set AUTOMATION_CONTROL_TOKEN on every node to require a shared secret in the
+X-Control-Token header.
+"""
+
+import errno
+import hmac
+import json
+import os
+import socket
+import logging
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Always per process: the Node service starts one --stdin worker per transfer,
+# so a shared AUTOMATION_NODE_ID would make every worker on a host its owner
+NODE_ID = f"{os.environ.get('AUTOMATION_NODE_ID') or socket.gethostname()}-{os.getpid()}"
+CONTROL_HOST = os.environ.get('AUTOMATION_CONTROL_HOST', '127.0.0.1')
+# Leave at 0 (any free port) unless each worker process gets its own
+CONTROL_PORT = int(os.environ.get('AUTOMATION_CONTROL_PORT', '0'))
+# Externally reachable base URL, when it differs from host:port (NAT, containers)
+CONTROL_URL = os.environ.get('AUTOMATION_CONTROL_URL')
+CONTROL_TOKEN = os.environ.get('AUTOMATION_CONTROL_TOKEN')
+
+# The owner waits up to 120 s for the OTP result; leave room on top of that
+FORWARD_TIMEOUT = 150
+
+_server = None
+
+
+class NodeUnreachable(Exception):
+    """Raised when the owning node cannot be connected to, so it never got the OTP"""
+
+
+class ForwardFailed(Exception):
+    """Raised when the owner may have got the OTP but gave no usable answer
+    (refused it, failed on it, or did not answer in time)"""
+
+
+# Connection errors that mean the request never reached the owner
+CONNECT_ERRNOS = (errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EADDRNOTAVAIL)
+
+
+def _never_sent(reason):
+    """True if a URLError reason means the request was not delivered at all"""
+    if not isinstance(reason, OSError):
+        return True  # unusable endpoint URL: nothing was sent
+    return isinstance(reason, (ConnectionRefusedError, socket.gaierror, TimeoutError)) or \
+        reason.errno in CONNECT_ERRNOS
+
+
+class ControlServer:
+    def __init__(self, deliver_otp, list_sessions, metrics=None, host=CONTROL_HOST, port=CONTROL_PORT):
+        """deliver_otp(session_id, otp_code) returns a result dict, or None if
+        this node does not hold the session"""
+        self.deliver_otp = deliver_otp
+        self.list_sessions = list_sessions
+        self.metrics = metrics
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        if CONTROL_URL:
+            return CONTROL_URL.rstrip('/')
+        host, port = self.server.server_address[:2]
+        if host in ('0.0.0.0', ''):
+            host = socket.gethostname()
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='node-control', daemon=True)
+        self._thread.start()
+        logger.info("🛰️ Node %s control endpoint on %s", NODE_ID, self.endpoint)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        control = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                if self.path == '/health':
+                    self._reply(200, {'nodeId': NODE_ID, 'sessions': control.list_sessions()})
+                elif self.path == '/metrics' and control.metrics:
+                    self._reply(200, {'nodeId': NODE_ID, **control.metrics()})
+                else:
+                    self._reply(404, {'success': False, 'message': 'Not found'})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                parts = self.path.strip('/').split('/')
+                if len(parts) != 3 or parts[0] != 'sessions' or parts[2] != 'otp':
+                    self._reply(404, {'success': False, 'message': 'Not found'})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    otp_code = json.loads(self.rfile.read(length) or b'{}').get('otpCode', '')
+                except ValueError:
+                    self._reply(400, {'success': False, 'message': 'Invalid JSON input data'})
+                    return
+
+                result = control.deliver_otp(parts[1], otp_code)
+                if result is None:
+                    self._reply(404, {'success': False, 'message': 'Session not found'})
+                else:
+                    self._reply(200, result)
+
+            def _authorized(self):
+                if not CONTROL_TOKEN or hmac.compare_digest(self.headers.get('X-Control-Token', ''), CONTROL_TOKEN):
+                    return True
+                self._reply(403, {'success': False, 'message': 'Forbidden'})
+                return False
+
+            def _reply(self, status, body):
+                content = json.dumps(body, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                logger.debug("control: " + format, *args)
+
+        return Handler
+
+
+def start_control_server(deliver_otp, list_sessions, metrics=None):
+    """Start this node's control endpoint once; returns the ControlServer"""
+    global _server
+    if _server is None:
+        _server = ControlServer(deliver_otp, list_sessions, metrics)
+        _server.start()
+    return _server
+
+
+def stop_control_server():
+    global _server
+    if _server is not None:
+        _server.stop()
+        _server = None
+
+
+def control_endpoint():
+    """URL other nodes can reach this one on, or None if not serving"""
+    return _server.endpoint if _server else None
+
+
+def forward_otp(endpoint, session_id, otp_code, timeout=FORWARD_TIMEOUT):
+    """POST an OTP to the owning node and return its result
+
+    A 404 (the owner no longer holds the session) comes back as its result
+    dict. NodeUnreachable is raised only if no connection could be made;
+    any later failure (403, 5xx, a dropped connection or a read timeout
+    while the owner may be submitting the OTP) raises ForwardFailed.
+    """
+    request = urllib.request.Request(
+        f"{endpoint}/sessions/{session_id}/otp",
+        data=json.dumps({'otpCode': otp_code}).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'X-Control-Token': CONTROL_TOKEN or ''},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            try:
+                return json.loads(e.read() or b'{}')
+            except ValueError:
+                return {}
+        raise ForwardFailed(f"{endpoint} answered HTTP {e.code}")
+    except urllib.error.URLError as e:
+        if _never_sent(e.reason):
+            raise NodeUnreachable(f"{endpoint} unreachable: {e.reason}")
+        raise ForwardFailed(f"{endpoint} failed while sending: {e.reason}")
+    except (OSError, ValueError) as e:
+        raise ForwardFailed(f"{endpoint} gave no answer: {e}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Resource Governor for Bank Transfer Automation
+Samples the memory of every browser this worker runs and keeps it within a
+per-driver and a per-host budget
+
+Each driver is measured as the summed RSS of its process tree (chromedriver or
+Chrome and all renderers). RSS counts pages shared between Chrome processes
+more than once, so the figures err on the high side, which is the safe side
+for a budget.
+
+    - New checkouts are refused while the drivers' RSS plus one more driver
+      budget would exceed the host budget, or the host has less than one
+      driver budget of memory available. An admitted checkout holds a
+      driver budget of its own until its driver is registered or released,
+      so concurrent checkouts cannot all pass on the same sample.
+    - Idle drivers (parked waiting for an OTP) are recycled when they grow
+      past the per-driver budget, or, largest first, while the host budget
+      is exceeded. Drivers in the middle of a transfer are never touched.
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+DRIVER_BUDGET_MB = float(os.environ.get('AUTOMATION_DRIVER_MEMORY_MB', '1024'))
+# 0 means a share of the host's total memory (HOST_MEMORY_SHARE)
+HOST_BUDGET_MB = float(os.environ.get('AUTOMATION_HOST_MEMORY_MB', '0'))
+HOST_MEMORY_SHARE = 0.75
+
+SAMPLE_INTERVAL = 15
+
+# A reservation whose driver neither registered nor released within this long
+# (an abandoned checkout) stops counting against the budget
+RESERVATION_SECONDS = 300
+
+
+def tree_rss(pid):
+    """Summed RSS in bytes of a process and all its descendants (0 if gone)"""
+    import psutil
+
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return 0
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+
+class ResourceGovernor:
+    def __init__(self, driver_budget_mb=DRIVER_BUDGET_MB, host_budget_mb=HOST_BUDGET_MB):
+        self.driver_budget = driver_budget_mb * MB
+        self._host_budget = host_budget_mb * MB
+        self._drivers = {}
+        self._reserved = {}
+        self._lock = threading.Lock()
+        self._sampler_thread = None
+        self._sampler_stop = threading.Event()
+        self.refusals = 0
+        self.recycled = 0
+
+    @property
+    def host_budget(self):
+        if not self._host_budget:
+            import psutil
+            self._host_budget = psutil.virtual_memory().total * HOST_MEMORY_SHARE
+        return self._host_budget
+
+    def register(self, owner, pid):
+        """Start watching a driver's process tree
+
+        owner is the BankTransferAutomation holding it (or a warm_pool
+        entry); it supplies session_id, is_idle() and recycle().
+        """
+        if not pid:
+            logger.warning("No process id for driver of session %s, not governed", owner.session_id)
+            self.release(owner)
+            return
+        with self._lock:
+            self._reserved.pop(owner, None)
+            self._drivers[owner] = {'pid': pid, 'rss': 0, 'peak': 0, 'started_at': time.monotonic()}
+
+    def transfer(self, owner, new_owner):
+        """Hand a watched driver to a new owner, keeping its figures"""
+        with self._lock:
+            entry = self._drivers.pop(owner, None)
+            if entry:
+                self._drivers[new_owner] = entry
+
+    def release(self, owner):
+        """Stop watching a driver, or drop its reservation; logs its peak memory for host sizing"""
+        with self._lock:
+            self._reserved.pop(owner, None)
+            entry = self._drivers.pop(owner, None)
+        if entry:
+            logger.info("📊 Session %s driver peak RSS %.0f MB over %.0fs", owner.session_id,
+                        entry['peak'] / MB, time.monotonic() - entry['started_at'])
+
+    def sample(self):
+        """Measure every registered driver; returns the total RSS in bytes"""
+        with self._lock:
+            entries = list(self._drivers.values())
+        total = 0
+        for entry in entries:
+            entry['rss'] = tree_rss(entry['pid'])
+            entry['peak'] = max(entry['peak'], entry['rss'])
+            total += entry['rss']
+        return total
+
+    def admit(self, owner):
+        """True if owner may start a new driver now; reserves a driver budget for it
+
+        The reservation lasts until owner registers its driver or is released.
+        """
+        import psutil
+
+        total = self.sample()
+        available = psutil.virtual_memory().available
+        now = time.monotonic()
+        with self._lock:
+            for stale in [o for o, at in self._reserved.items() if now - at > RESERVATION_SECONDS]:
+                del self._reserved[stale]
+            starting = len(self._reserved)
+            pending = starting * self.driver_budget
+            if total + pending + self.driver_budget <= self.host_budget and \
+                    available - pending >= self.driver_budget:
+                self._reserved[owner] = now
+                return True
+            self.refusals += 1
+        logger.warning("🧠 Refusing driver checkout: drivers use %.0f MB and %s starting of %.0f MB, "
+                       "%.0f MB available", total / MB, starting, self.host_budget / MB, available / MB)
+        return False
+
+    def enforce(self):
+        """Recycle idle drivers over the per-driver budget, then while over the host budget"""
+        total = self.sample()
+        with self._lock:
+            drivers = sorted(self._drivers.items(), key=lambda item: item[1]['rss'], reverse=True)
+
+        for owner, entry in drivers:
+            over_driver = entry['rss'] > self.driver_budget
+            over_host = total > self.host_budget
+            if not (over_driver or over_host):
+                continue
+            if not owner.is_idle():
+                if over_driver:
+                    logger.warning("🧠 Session %s uses %.0f MB (budget %.0f MB) but is busy",
+                                   owner.session_id, entry['rss'] / MB, self.driver_budget / MB)
+                continue
+            logger.warning("♻️ Recycling idle session %s at %.0f MB (%s)", owner.session_id, entry['rss'] / MB,
+                           'driver budget' if over_driver else 'host budget')
+            try:
+                owner.recycle()
+            except Exception as e:
+                logger.error("❌ Could not recycle session %s: %s", owner.session_id, e)
+                continue
+            self.recycled += 1
+            total -= entry['rss']
+
+    def metrics(self):
+        """Per-session and host memory figures, in MB"""
+        import psutil
+
+        total = self.sample()
+        with self._lock:
+            drivers = list(self._drivers.items())
+        return {
+            'host': {
+                'budgetMb': round(self.host_budget / MB),
+                'driverBudgetMb': round(self.driver_budget / MB),
+                'driversRssMb': round(total / MB),
+                'reserved': len(self._reserved),
+                'availableMb': round(psutil.virtual_memory().available / MB),
+                'refusals': self.refusals,
+                'recycled': self.recycled,
+            },
+            'sessions': [
+                {
+                    'sessionId': owner.session_id,
+                    'pid': entry['pid'],
+                    'rssMb': round(entry['rss'] / MB),
+                    'peakRssMb': round(entry['peak'] / MB),
+                    'idle': owner.is_idle(),
+                    'ageSeconds': round(time.monotonic() - entry['started_at']),
+                }
+                for owner, entry in drivers
+            ],
+        }
+
+    def start_sampler(self, interval=SAMPLE_INTERVAL):
+        """Sample and enforce the budgets in the background every interval seconds"""
+        if self._sampler_thread and self._sampler_thread.is_alive():
+            return
+        self._sampler_stop.clear()
+        self._sampler_thread = threading.Thread(
+            target=self._run_sampler,
+            args=(interval,),
+            name='resource-governor',
+            daemon=True
+        )
+        self._sampler_thread.start()
+
+    def stop_sampler(self):
+        self._sampler_stop.set()
+        if self._sampler_thread:
+            self._sampler_thread.join()
+            self._sampler_thread = None
+
+    def _run_sampler(self, interval):
+        while not self._sampler_stop.wait(interval):
+            try:
+                self.enforce()
+            except Exception as e:
+                logger.error("❌ Resource sampling failed: %s", e)
+
+
+# Global resource governor instance
+resource_governor = ResourceGovernor()
@@ -4,35 +4,72 @@ Session Manager for Bank Transfer Automation
 Handles persistent sessions across multiple Python processes
 """
 
+import heapq
 import json
 import os
 import time
 import threading
-from datetime import datetime, timedelta
-import pickle
-import tempfile
+from contextlib import contextmanager
+from datetime import datetime
 import logging
-import subprocess
-import psutil
+
+from structured_logging import Redacted
 
 logger = logging.getLogger(__name__)
 
+# Time-to-live per session status, in seconds since the last write
+SESSION_TTLS = {
+    'in_progress': 600,
+    'waiting_otp': 300,
+    'submit_otp': 300,
+    'processing_otp': 300,
+    'completed': 3600,
+    'failed': 3600,
+}
+DEFAULT_SESSION_TTL = 900
+
+# Seconds between background sweeps of expired sessions
+SWEEP_INTERVAL = 30
+
+# No session expires sooner than this after its last write, so files found on
+# disk can be indexed from their mtime without being read
+MIN_SESSION_TTL = min(min(SESSION_TTLS.values()), DEFAULT_SESSION_TTL)
+
+# Ids of non-session records kept alongside the sessions (see idempotency)
+RECORD_PREFIXES = ('idem-',)
+
+# Claims and removals of expired records happen under this lock file, so a
+# stale record is never deleted after another worker has just claimed its id
+RECORDS_LOCK_FILE = '.records.lock'
+
 class SessionManager:
     def __init__(self):
+        # No I/O here: the directory is created on the first write
         self.session_dir = os.path.join(os.path.dirname(__file__), 'bank_sessions')
-        self.ensure_session_directory()
+
+        # Expiry index: min-heap of (expires_at, session_id) plus the current
+        # expiry per session. Heap entries that no longer match are stale and
+        # are skipped when popped.
+        self._expiry_heap = []
+        self._expiry_by_session = {}
+        # Sessions indexed from their mtime only, expiry not read yet
+        self._provisional = set()
+        self._index_lock = threading.Lock()
+        self._records_lock = threading.Lock()
+        self._index_loaded = False
+        self._sweeper_thread = None
+        self._sweeper_stop = threading.Event()
         
     def ensure_session_directory(self):
         """Ensure session directory exists"""
-        logger.error(f"#################==============#####################")
-        logger.error(f"# Global session manager instance STARTED")
         if not os.path.exists(self.session_dir):
-            os.makedirs(self.session_dir)
-            logger.info(f"Created session directory: {self.session_dir}")
+            os.makedirs(self.session_dir, exist_ok=True)
+            logger.info("Created session directory: %s", self.session_dir)
     
     def store_session(self, session_id, session_data):
         """Store session data to file"""
         try:
+            self.ensure_session_directory()
             session_file = os.path.join(self.session_dir, f"{session_id}.json")
             temp_file = f"{session_file}.tmp"  
             
@@ -47,7 +84,12 @@ class SessionManager:
                 'automation_instance': session_data.get('automation_instance'),
                 'browser_pid': session_data.get('browser_pid'), 
                 'current_url': session_data.get('current_url'),
-                'otp_detected': session_data.get('otp_detected', False)
+                'otp_detected': session_data.get('otp_detected', False),
+                'checkpoint': session_data.get('checkpoint'),
+                'checkpoints': session_data.get('checkpoints', []),
+                'owner_node': session_data.get('owner_node'),
+                'control_endpoint': session_data.get('control_endpoint'),
+                'expires_at': time.time() + self.ttl_for_status(session_data.get('status', 'waiting_otp'))
             }
             
             # Convert datetime objects to ISO strings for JSON serialization
@@ -60,14 +102,14 @@ class SessionManager:
             
             # Atomic rename to prevent corruption
             os.rename(temp_file, session_file)
+            self._index_session(session_id, storage_data['expires_at'])
             
-            logger.info(f"Session Data Before storing: {session_data}")
-            logger.info(f"✅ Session {session_id} stored to file")
-            logger.info(f"📊 Session data: {storage_data}")
+            logger.info("✅ Session %s stored to file", session_id)
+            logger.debug("📊 Session data: %s", Redacted(storage_data))
             return True
             
         except Exception as e:
-            logger.error(f"❌ Failed to store session {session_id}: {e}")
+            logger.error("❌ Failed to store session %s: %s", session_id, e)
             # Clean up temp file if it exists
             temp_file = os.path.join(self.session_dir, f"{session_id}.json.tmp")
             if os.path.exists(temp_file):
@@ -83,9 +125,9 @@ class SessionManager:
             session_file = os.path.join(self.session_dir, f"{session_id}.json")
 
             if not os.path.exists(session_file):
-                logger.error(f"❌ Session file not found: {session_file}")
-                available_files = os.listdir(self.session_dir) if os.path.exists(self.session_dir) else []
-                logger.error(f"❌ Available files: {available_files}")
+                logger.error("❌ Session file not found: %s", session_file)
+                if logger.isEnabledFor(logging.DEBUG) and os.path.exists(self.session_dir):
+                    logger.debug("❌ Available files: %s", os.listdir(self.session_dir))
                 return None
 
             # Read and validate file content
@@ -93,26 +135,29 @@ class SessionManager:
                 file_content = f.read().strip()
             
             if not file_content:
-                logger.error(f"❌ Session file {session_id} is empty")
+                logger.error("❌ Session file %s is empty", session_id)
                 os.remove(session_file)
                 return None
             
             try:
                 session_data = json.loads(file_content)
             except json.JSONDecodeError as e:
-                logger.error(f"❌ JSON decode error for session {session_id}: {e}")
-                logger.error(f"❌ File content: {file_content[:100]}...")
+                logger.error("❌ JSON decode error for session %s: %s", session_id, e)
                 # Delete corrupted file
                 os.remove(session_file)
                 return None
 
-            # No expiration check - sessions only end when completed or failed
-            logger.info(f"✅ Session {session_id} retrieved from file (no expiration)")
+            if self.expiry_of(session_data) <= time.time():
+                logger.info("⏰ Session %s expired (%s)", session_id, session_data.get('status'))
+                self.delete_session(session_id)
+                return None
+
+            logger.debug("✅ Session %s retrieved from file", session_id)
 
             return session_data
 
         except Exception as e:
-            logger.error(f"❌ Failed to retrieve session {session_id}: {e}")
+            logger.error("❌ Failed to retrieve session %s: %s", session_id, e)
             return None
     
     def update_session_status(self, session_id, status):
@@ -128,19 +173,23 @@ class SessionManager:
         """Delete session file"""
         try:
             session_file = os.path.join(self.session_dir, f"{session_id}.json")
+            with self._index_lock:
+                self._expiry_by_session.pop(session_id, None)
+                self._provisional.discard(session_id)
+
             if os.path.exists(session_file):
                 os.remove(session_file)
-                logger.info(f"🧹 Session {session_id} deleted")
+                logger.info("🧹 Session %s deleted", session_id)
             
             # Also try to delete any .pkl files (legacy cleanup)
             pkl_file = os.path.join(self.session_dir, f"{session_id}.pkl")
             if os.path.exists(pkl_file):
                 os.remove(pkl_file)
-                logger.info(f"🧹 Legacy session file {session_id}.pkl deleted")
+                logger.info("🧹 Legacy session file %s.pkl deleted", session_id)
                 
             return True
         except Exception as e:
-            logger.error(f"❌ Failed to delete session {session_id}: {e}")
+            logger.error("❌ Failed to delete session %s: %s", session_id, e)
             return False
     
     def list_active_sessions(self):
@@ -148,51 +197,252 @@ class SessionManager:
         try:
             if not os.path.exists(self.session_dir):
                 return []
-                
-            all_files = os.listdir(self.session_dir)
-            session_files = [f for f in all_files if f.endswith('.json')]
-            session_ids = [f.replace('.json', '') for f in session_files]
-            
-            logger.info(f"📁 Found session files: {session_files}")
-            logger.info(f"📋 Session IDs: {session_ids}")
-            
-            # Filter out expired sessions
+
+            self._load_expiry_index()
+            now = time.time()
+            session_ids = [f[:-len('.json')] for f in os.listdir(self.session_dir)
+                           if f.endswith('.json') and not f.startswith(RECORD_PREFIXES)]
+
+            # Sessions already in the index are checked without touching disk;
+            # files written by other processes are read once and indexed.
             active_sessions = []
             for session_id in session_ids:
-                if self.get_session(session_id):  # This will auto-delete expired ones
+                with self._index_lock:
+                    expires_at = self._expiry_by_session.get(session_id)
+                    provisional = session_id in self._provisional
+                if expires_at is None or provisional:
+                    session_data = self._read_session_file(session_id)
+                    if not session_data:
+                        continue
+                    expires_at = self.expiry_of(session_data)
+                    self._index_session(session_id, expires_at)
+                if expires_at > now:
                     active_sessions.append(session_id)
-            
+
+            logger.debug("📋 Active session IDs: %s", active_sessions)
             return active_sessions
         except Exception as e:
-            logger.error(f"❌ Failed to list sessions: {e}")
+            logger.error("❌ Failed to list sessions: %s", e)
             return []
     
     def cleanup_expired_sessions(self):
         """Clean up expired sessions"""
         try:
-            if not os.path.exists(self.session_dir):
-                return
-                
-            all_files = os.listdir(self.session_dir)
-            session_files = [f for f in all_files if f.endswith('.json')]
-            cleaned_count = 0
-            
-            for session_file in session_files:
-                session_id = session_file.replace('.json', '')
-                if not self.get_session(session_id):  # This will delete expired ones
-                    cleaned_count += 1
-            
+            self._load_expiry_index()
+            cleaned_count = self.sweep_expired()
             if cleaned_count > 0:
-                logger.info(f"🧹 Cleaned up {cleaned_count} expired sessions")
-                
+                logger.info("🧹 Cleaned up %d expired sessions", cleaned_count)
+            return cleaned_count
         except Exception as e:
-            logger.error(f"❌ Failed to cleanup sessions: {e}")
+            logger.error("❌ Failed to cleanup sessions: %s", e)
+            return 0
+
+    def ttl_for_status(self, status):
+        """Return the time-to-live in seconds for a session status"""
+        return SESSION_TTLS.get(status, DEFAULT_SESSION_TTL)
+
+    def expiry_of(self, session_data):
+        """Return the expiry epoch of a stored session record"""
+        expires_at = session_data.get('expires_at')
+        if expires_at is not None:
+            try:
+                return float(expires_at)
+            except (TypeError, ValueError):
+                pass
+
+        # Records written without expires_at (e.g. by the Node service) expire
+        # relative to their timestamp
+        ttl = self.ttl_for_status(session_data.get('status'))
+        timestamp = session_data.get('timestamp')
+        try:
+            written_at = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+        except (TypeError, ValueError):
+            written_at = time.time()
+        return written_at + ttl
+
+    def sweep_expired(self, now=None):
+        """Delete sessions whose expiry has passed; costs O(expired)"""
+        now = time.time() if now is None else now
+        due = []
+        with self._index_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._expiry_heap)
+                if self._expiry_by_session.get(session_id) != expires_at:
+                    continue  # stale entry, session was rewritten or deleted
+                del self._expiry_by_session[session_id]
+                due.append(session_id)
+
+        removed = 0
+        for session_id in due:
+            if session_id.startswith(RECORD_PREFIXES):
+                with self._record_claims():
+                    removed += self._delete_if_expired(session_id, now)
+            else:
+                removed += self._delete_if_expired(session_id, now)
+        return removed
+
+    def _delete_if_expired(self, session_id, now):
+        """Delete a due session unless another process extended it; 1 if deleted"""
+        session_data = self._read_session_file(session_id)
+        if session_data:
+            expires_at = self.expiry_of(session_data)
+            if expires_at > now:
+                self._index_session(session_id, expires_at)
+                return 0
+        return 1 if self.delete_session(session_id) else 0
+
+    def start_expiry_sweeper(self, interval=SWEEP_INTERVAL):
+        """Start the background thread that sweeps expired sessions"""
+        if self._sweeper_thread and self._sweeper_thread.is_alive():
+            return
+        self._sweeper_stop.clear()
+        self._sweeper_thread = threading.Thread(
+            target=self._run_expiry_sweeper,
+            args=(interval,),
+            name='session-expiry-sweeper',
+            daemon=True
+        )
+        self._sweeper_thread.start()
+
+    def stop_expiry_sweeper(self):
+        """Stop the background expiry sweeper"""
+        self._sweeper_stop.set()
+        if self._sweeper_thread:
+            self._sweeper_thread.join(timeout=5)
+            self._sweeper_thread = None
+
+    def _run_expiry_sweeper(self, interval):
+        self.cleanup_expired_sessions()
+        while not self._sweeper_stop.wait(interval):
+            self.cleanup_expired_sessions()
+
+    def _index_session(self, session_id, expires_at, provisional=False):
+        with self._index_lock:
+            self._expiry_by_session[session_id] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, session_id))
+            if provisional:
+                self._provisional.add(session_id)
+            else:
+                self._provisional.discard(session_id)
+
+    def _load_expiry_index(self):
+        """Index sessions already on disk; runs once per process
+
+        Files are only stat'ed: each is indexed at mtime + MIN_SESSION_TTL,
+        which is no later than its real expiry, and sweep_expired reads it
+        (and re-indexes or deletes it) once that time comes. A short-lived
+        process pays one directory scan, not a parse of every session.
+        """
+        if self._index_loaded:
+            return
+        self._index_loaded = True
+        if not os.path.exists(self.session_dir):
+            return
+        with os.scandir(self.session_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                session_id = entry.name[:-len('.json')]
+                with self._index_lock:
+                    if session_id in self._expiry_by_session:
+                        continue
+                try:
+                    written_at = entry.stat().st_mtime
+                except OSError:
+                    continue
+                self._index_session(session_id, written_at + MIN_SESSION_TTL, provisional=True)
+
+    def _read_session_file(self, session_id):
+        """Read a session record without logging or expiry checks"""
+        session_file = os.path.join(self.session_dir, f"{session_id}.json")
+        try:
+            with open(session_file, 'r') as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def get_record(self, record_id):
+        """Read a non-session record (e.g. idempotency keys); None if missing or expired"""
+        record = self._read_session_file(record_id)
+        if record is None or self.expiry_of(record) <= time.time():
+            return None
+        return record
+
+    def store_record(self, record_id, record, ttl):
+        """Write a non-session record that expires ttl seconds from now"""
+        self.ensure_session_directory()
+        data = {**record, 'expires_at': time.time() + ttl}
+        record_file = os.path.join(self.session_dir, f"{record_id}.json")
+        temp_file = f"{record_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(temp_file, record_file)
+        self._index_session(record_id, data['expires_at'])
+
+    def claim_record(self, record_id, record, ttl):
+        """Create a record only if there is no live one; True if this call created it
+
+        The record is written in full under a temporary name and then linked
+        into place, so a concurrent claim or reader never sees it half written.
+        Claims run under the records lock: taking over an expired record
+        (delete, then link) cannot remove a claim another worker just made.
+        """
+        self.ensure_session_directory()
+        data = {**record, 'expires_at': time.time() + ttl}
+        record_file = os.path.join(self.session_dir, f"{record_id}.json")
+        temp_file = f"{record_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, default=str)
+        try:
+            with self._record_claims():
+                for _ in range(2):
+                    try:
+                        os.link(temp_file, record_file)
+                    except FileExistsError:
+                        if self.get_record(record_id) is not None:
+                            return False
+                        # The previous holder's record expired; take over
+                        self.delete_session(record_id)
+                        continue
+                    self._index_session(record_id, data['expires_at'])
+                    return True
+                return False
+        finally:
+            os.remove(temp_file)
+
+    def delete_record(self, record_id, only_if):
+        """Delete a live record if only_if(record) holds, under the records lock; True if deleted"""
+        with self._record_claims():
+            record = self.get_record(record_id)
+            if record is None or not only_if(record):
+                return False
+            return self.delete_session(record_id)
+
+    @contextmanager
+    def _record_claims(self):
+        """Hold the records lock, across threads and worker processes"""
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        with self._records_lock:
+            if fcntl is None:
+                yield
+                return
+            self.ensure_session_directory()
+            with open(os.path.join(self.session_dir, RECORDS_LOCK_FILE), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
 
     def is_browser_alive(self, browser_pid):
         """Check if browser process is still alive"""
         if not browser_pid:
             return False
         try:
+            import psutil
             return psutil.pid_exists(browser_pid)
         except:
             return False
@@ -207,6 +457,4 @@ class SessionManager:
         return False
 
 # Global session manager instance
-logger.error(f"# Global session manager instance ENDED")
-logger.error(f"#################==============#####################")
 session_manager = SessionManager()
\ No newline at end of file
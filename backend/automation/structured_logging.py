@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Structured Logging for Bank Transfer Automation
+Queue-backed handlers, lazy redacted payloads and an optional JSON Lines sink
+
+Hot-path code logs with %-style arguments so nothing is formatted unless the
+record passes the level check, and wraps payload dicts in Redacted(...) so
+credentials and OTPs never reach a handler. Handlers run on a background
+QueueListener thread; worker threads only enqueue records.
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Field names (case, '_' and '-' ignored) whose values are always masked
+SENSITIVE_FIELDS = frozenset({'password', 'username', 'otp', 'otpcode', 'pin', 'token', 'secret'})
+REDACTED = '***'
+
+_listener = None
+
+
+def _normalize_key(key):
+    return str(key).lower().replace('_', '').replace('-', '')
+
+
+def redact(value):
+    """Return a copy of a payload with sensitive fields masked"""
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if _normalize_key(k) in SENSITIVE_FIELDS and v not in (None, '') else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class Redacted:
+    """Log argument that redacts and serializes a payload only when emitted"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(redact(self.value), default=str, ensure_ascii=False)
+
+    __repr__ = __str__
+
+
+class RedactingFilter(logging.Filter):
+    """Mask sensitive fields in dict arguments and structured 'fields' extras"""
+
+    def filter(self, record):
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(
+                redact(arg) if isinstance(arg, (dict, list, tuple)) else arg
+                for arg in record.args
+            )
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.fields = redact(fields)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, including any 'fields' passed via extra"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(level=None, json_path=None):
+    """Install queue-backed logging on the root logger; safe to call repeatedly
+
+    level defaults to AUTOMATION_LOG_LEVEL (INFO) and json_path to
+    AUTOMATION_LOG_JSON; when a path is set, records are also appended there
+    as JSON Lines.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    import atexit
+    import logging.handlers
+    import queue
+
+    level = level or os.environ.get('AUTOMATION_LOG_LEVEL', 'INFO')
+    json_path = json_path or os.environ.get('AUTOMATION_LOG_JSON')
+
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [console]
+
+    if json_path:
+        sink = logging.FileHandler(json_path, encoding='utf-8')
+        sink.setFormatter(JsonLinesFormatter())
+        handlers.append(sink)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RedactingFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
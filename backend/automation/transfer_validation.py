@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Transfer Validation for Bank Transfer Automation
+Rejects bad receiver IBANs and amounts before a browser is launched
+
+Angolan IBANs are 25 characters: 'AO06' followed by 21 digits, the first four
+being the bank code. The whole IBAN must pass the ISO 13616 mod-97 check and
+the bank code must belong to a supported bank (bankCode in data/banks.json).
+Amounts must be positive, have at most two decimals and sit within the bank's
+transferLimits (or the global TRANSFER_MIN_AMOUNT / TRANSFER_MAX_AMOUNT).
+
+validate_payouts() checks whole payout files column-wise, with numpy when it
+is installed and a plain-Python loop otherwise.
+
+Usage:
+    python transfer_validation.py payouts.jsonl
+"""
+
+import json
+import math
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+IBAN_LENGTH = 25
+IBAN_PREFIX = 'AO06'
+
+# 'AO06' moved behind the BBAN, letters as numbers (A=10, O=24)
+IBAN_PREFIX_DIGITS = '102406'
+
+MIN_AMOUNT = float(os.environ.get('TRANSFER_MIN_AMOUNT', '1'))
+MAX_AMOUNT = float(os.environ.get('TRANSFER_MAX_AMOUNT', '10000000'))
+
+# amount * 100 of a valid amount lands this close to a whole number of cents
+# (1.13 * 100 is 112.99999999999999)
+CENTS_TOLERANCE = 1e-6
+
+MESSAGES = {
+    'iban_format': 'IBAN inválido: deve ter o formato AO06 seguido de 21 dígitos',
+    'iban_checksum': 'IBAN inválido: dígitos de controlo incorrectos',
+    'iban_bank': 'IBAN de um banco não suportado',
+    'amount_invalid': 'Montante inválido',
+    'amount_limit': 'Montante fora dos limites permitidos ({min} - {max} AOA)',
+}
+
+
+def normalize_iban(iban):
+    """Strip spaces and upper-case an IBAN"""
+    return str(iban or '').replace(' ', '').upper()
+
+
+def iban_checksum_ok(iban):
+    """ISO 13616 mod-97 check of a normalized, well-formed AO IBAN"""
+    return int(iban[4:] + IBAN_PREFIX_DIGITS) % 97 == 1
+
+
+def amount_limits(bank_config=None):
+    """(min, max) allowed for a bank, falling back to the global limits"""
+    limits = (bank_config or {}).get('transferLimits') or {}
+    return float(limits.get('min', MIN_AMOUNT)), float(limits.get('max', MAX_AMOUNT))
+
+
+def supported_bank_codes():
+    from bank_registry import bank_registry
+    return bank_registry.bank_codes()
+
+
+def format_amount(value):
+    """Amount as shown to users: 10.000.000 or 2.500,50 (pt-AO separators)"""
+    text = f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+    return text.replace(',', ' ').replace('.', ',').replace(' ', '.')
+
+
+def _error(field, code, **limits):
+    limits = {name: format_amount(value) for name, value in limits.items()}
+    return {'field': field, 'code': code, 'message': MESSAGES[code].format(**limits)}
+
+
+def _parse_amount(amount):
+    if isinstance(amount, bool):
+        return None
+    try:
+        return float(amount)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_iban(iban, bank_codes=None):
+    """Return an error dict for a receiver IBAN, or None if it is valid"""
+    iban = normalize_iban(iban)
+    if len(iban) != IBAN_LENGTH or not iban.startswith(IBAN_PREFIX) or not iban[4:].isdigit():
+        return _error('receiverIban', 'iban_format')
+    if not iban_checksum_ok(iban):
+        return _error('receiverIban', 'iban_checksum')
+    bank_codes = supported_bank_codes() if bank_codes is None else bank_codes
+    if iban[4:8] not in bank_codes:
+        return _error('receiverIban', 'iban_bank')
+    return None
+
+
+def validate_amount(amount, bank_config=None):
+    """Return an error dict for an amount, or None if it is valid"""
+    value = _parse_amount(amount)
+    if value is None or not math.isfinite(value) or abs(value * 100 - round(value * 100)) >= CENTS_TOLERANCE:
+        return _error('amount', 'amount_invalid')
+    low, high = amount_limits(bank_config)
+    if not low <= value <= high:
+        return _error('amount', 'amount_limit', min=low, max=high)
+    return None
+
+
+def validate_transfer(transfer_data, bank_config=None):
+    """Return the list of validation errors of one transfer (empty if valid)"""
+    errors = [
+        validate_iban(transfer_data.get('receiverIban')),
+        validate_amount(transfer_data.get('amount'), bank_config),
+    ]
+    return [error for error in errors if error]
+
+
+def validate_payouts(rows, bank_config=None):
+    """Validate many {'receiverIban', 'amount'} rows at once
+
+    Returns one error list per row, in order (empty lists for valid rows).
+    """
+    rows = list(rows)
+    ibans = [normalize_iban(row.get('receiverIban')) for row in rows]
+    amounts = [_parse_amount(row.get('amount')) for row in rows]
+    bank_codes = supported_bank_codes()
+    low, high = amount_limits(bank_config)
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    if numpy is not None and rows:
+        iban_codes = _iban_codes_numpy(numpy, ibans, bank_codes)
+        amount_codes = _amount_codes_numpy(numpy, amounts, low, high)
+    else:
+        iban_codes = [(validate_iban(iban, bank_codes) or {}).get('code') for iban in ibans]
+        amount_codes = [(validate_amount(amount, bank_config) or {}).get('code') for amount in amounts]
+
+    results = []
+    for iban_code, amount_code in zip(iban_codes, amount_codes):
+        errors = []
+        if iban_code:
+            errors.append(_error('receiverIban', iban_code))
+        if amount_code:
+            errors.append(_error('amount', amount_code, min=low, max=high))
+        results.append(errors)
+    return results
+
+
+def _iban_codes_numpy(numpy, ibans, bank_codes):
+    """Column-wise IBAN checks; returns an error code (or None) per IBAN"""
+    well_formed = numpy.array([
+        len(iban) == IBAN_LENGTH and iban.startswith(IBAN_PREFIX) and iban[4:].isdigit()
+        for iban in ibans
+    ], dtype=bool)
+    codes = numpy.full(len(ibans), 'iban_format', dtype=object)
+
+    candidates = [iban[4:] + IBAN_PREFIX_DIGITS for iban, ok in zip(ibans, well_formed) if ok]
+    if candidates:
+        digits = numpy.frombuffer(''.join(candidates).encode('ascii'), dtype=numpy.uint8)
+        digits = (digits - ord('0')).astype(numpy.int64).reshape(len(candidates), -1)
+
+        # Horner's rule mod 97, one digit column at a time
+        remainder = numpy.zeros(len(candidates), dtype=numpy.int64)
+        for column in range(digits.shape[1]):
+            remainder = (remainder * 10 + digits[:, column]) % 97
+
+        bank = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+        supported = numpy.isin(bank, numpy.array([int(code) for code in bank_codes], dtype=numpy.int64))
+
+        candidate_codes = numpy.where(remainder != 1, 'iban_checksum',
+                                      numpy.where(supported, None, 'iban_bank'))
+        codes[well_formed] = candidate_codes
+    return [code or None for code in codes.tolist()]
+
+
+def _amount_codes_numpy(numpy, amounts, low, high):
+    """Column-wise amount checks; returns an error code (or None) per amount"""
+    values = numpy.array([numpy.nan if a is None else a for a in amounts], dtype=float)
+    cents = values * 100
+    whole_cents = numpy.isclose(cents, numpy.round(cents), rtol=0, atol=CENTS_TOLERANCE)
+    invalid = ~numpy.isfinite(values) | ~whole_cents
+    out_of_range = ~invalid & ((values < low) | (values > high))
+    codes = numpy.where(invalid, 'amount_invalid', numpy.where(out_of_range, 'amount_limit', None))
+    return codes.tolist()
+
+
+def main():
+    """Validate a JSON Lines payout file and print the rejected rows"""
+    if len(sys.argv) != 2:
+        print("Usage: python transfer_validation.py <payouts.jsonl>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    rejected = 0
+    for line_number, errors in enumerate(validate_payouts(rows), start=1):
+        if errors:
+            rejected += 1
+            print(json.dumps({'line': line_number, 'errors': errors}, ensure_ascii=False))
+    print(json.dumps({'rows': len(rows), 'rejected': rejected}))
+    sys.exit(1 if rejected else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Warm Browser Pool for Bank Transfer Automation
+Keeps idle browsers already sitting on the login page of the banks that are
+in demand, so a transfer skips browser start-up and its slowest page load
+(cold DNS, TLS and HTTP cache on the bank's loginUrl)
+
+The pool watches the banks of the transfers started in the last DEMAND_WINDOW
+seconds and splits WARM_BROWSERS between them in proportion to their share.
+Warm browsers are reloaded every REFRESH_SECONDS, ahead of the portals' idle
+timeout, and closed when their bank drops out of the mix. New ones are only
+started while the resource governor admits another driver, and the governor
+may recycle them like any idle driver.
+
+Only long-lived --jobs workers run the pool; it is off unless
+AUTOMATION_WARM_BROWSERS is set. The Node service starts one --stdin worker
+per transfer, which never runs the pool, so it has no effect there until the
+service feeds a persistent --jobs worker instead.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque, Counter
+
+from resource_governor import resource_governor
+from bank_registry import bank_registry
+
+logger = logging.getLogger(__name__)
+
+WARM_BROWSERS = int(os.environ.get('AUTOMATION_WARM_BROWSERS', '0'))
+
+# Reload a warm login page after this long; keep it under the portals' idle timeout
+REFRESH_SECONDS = float(os.environ.get('AUTOMATION_WARM_REFRESH_SECONDS', '240'))
+
+# Transfers this recent decide which banks get warm browsers
+DEMAND_WINDOW = 900
+
+WARM_INTERVAL = 5
+PAGE_LOAD_TIMEOUT = 60
+
+
+class _WarmBrowser:
+    """A pooled browser on one bank's login page; resource governor owner while pooled"""
+
+    def __init__(self, pool, automation, bank_id, url):
+        self.pool = pool
+        self.automation = automation
+        self.bank_id = bank_id
+        self.url = url
+        self.warmed_at = time.monotonic()
+
+    @property
+    def session_id(self):
+        return f"warm-{self.bank_id}"
+
+    def is_idle(self):
+        return True
+
+    def recycle(self):
+        self.pool.discard(self)
+
+    def load(self):
+        """(Re)load the bank's login page"""
+        driver = self.automation.driver
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.get(self.url)
+        self.warmed_at = time.monotonic()
+
+
+class WarmPool:
+    def __init__(self, size=WARM_BROWSERS, refresh_seconds=REFRESH_SECONDS):
+        self.size = size
+        self.refresh_seconds = refresh_seconds
+        self._factory = None
+        self._demand = deque()
+        self._banks = {}
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    def note_request(self, bank_config):
+        """Count a transfer for a bank in the demand mix"""
+        if not self.size or not bank_config.get('id') or not bank_config.get('loginUrl'):
+            return
+        with self._lock:
+            self._demand.append((time.monotonic(), bank_config['id']))
+            self._banks[bank_config['id']] = bank_config
+
+    def targets(self):
+        """Warm browsers wanted per bank id, by share of recent demand"""
+        cutoff = time.monotonic() - DEMAND_WINDOW
+        with self._lock:
+            while self._demand and self._demand[0][0] < cutoff:
+                self._demand.popleft()
+            counts = Counter(bank_id for _, bank_id in self._demand)
+        total = sum(counts.values())
+        if not total:
+            return {}
+
+        # Largest remainder: every bank gets its whole share, leftovers go to
+        # the largest fractions, busiest banks first on ties
+        shares = {bank_id: self.size * count / total for bank_id, count in counts.items()}
+        targets = {bank_id: int(share) for bank_id, share in shares.items()}
+        leftover = self.size - sum(targets.values())
+        by_fraction = sorted(shares, key=lambda b: (shares[b] - targets[b], counts[b]), reverse=True)
+        for bank_id in by_fraction[:leftover]:
+            targets[bank_id] += 1
+        return {bank_id: target for bank_id, target in targets.items() if target}
+
+    def check_out(self, automation, bank_config):
+        """Give automation a warm browser on its bank's login page; False if none is ready"""
+        if not self.size:
+            return False
+        with self._lock:
+            idle = self._idle.get(bank_config.get('id')) or []
+            browser = None
+            while idle and browser is None:
+                candidate = idle.pop()
+                if candidate.url == bank_config.get('loginUrl') and \
+                        time.monotonic() - candidate.warmed_at < self.refresh_seconds:
+                    browser = candidate
+                else:
+                    self._close_later(candidate)
+            if browser is None:
+                self.misses += 1
+                return False
+
+        warm = browser.automation
+        try:
+            warm.driver.current_url
+        except Exception as e:
+            logger.warning("🔥 Warm browser for %s is gone: %s", browser.bank_id, e)
+            self._close(browser)
+            with self._lock:
+                self.misses += 1
+            return False
+
+        if warm.recorder:
+            warm.recorder.close()
+        automation.driver = warm.driver
+        automation.browser_pid = warm.browser_pid
+        automation.debugger_port = warm.debugger_port
+        automation.user_data_dir = warm.user_data_dir
+        automation.warm_url = browser.url
+        if automation.dom_backend == 'cdp':
+            from cdp_backend import CdpBackend
+            automation.cdp = CdpBackend(automation.driver)
+        from command_recorder import start_recording
+        automation.recorder = start_recording(automation.driver, automation.session_id)
+        resource_governor.transfer(browser, automation)
+        with self._lock:
+            self.hits += 1
+        logger.info("🔥 Using warm browser for %s (warmed %.0fs ago)", browser.bank_id,
+                    time.monotonic() - browser.warmed_at)
+        return True
+
+    def discard(self, browser):
+        """Close a pooled browser (the governor recycling it) unless it just left the pool"""
+        with self._lock:
+            idle = self._idle.get(browser.bank_id) or []
+            if browser not in idle:
+                return
+            idle.remove(browser)
+        self._close(browser)
+
+    def metrics(self):
+        with self._lock:
+            idle = {bank_id: len(browsers) for bank_id, browsers in self._idle.items() if browsers}
+            hits, misses = self.hits, self.misses
+        return {'size': self.size, 'idle': idle, 'targets': self.targets(), 'hits': hits, 'misses': misses}
+
+    def start(self, factory, interval=WARM_INTERVAL):
+        """Keep the pool filled in the background; factory() returns a new BankTransferAutomation"""
+        if not self.size or (self._thread and self._thread.is_alive()):
+            return
+        self._factory = factory
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(interval,),
+            name='warm-pool',
+            daemon=True
+        )
+        self._thread.start()
+        logger.info("🔥 Warm pool of %s browsers started", self.size)
+
+    def stop(self):
+        """Stop the scheduler and close every pooled browser"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        with self._lock:
+            browsers = [browser for idle in self._idle.values() for browser in idle]
+            self._idle = {}
+        for browser in browsers:
+            self._close(browser)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error("❌ Warm pool update failed: %s", e)
+
+    def tick(self):
+        """Close surplus browsers, reload ageing ones, and start missing ones"""
+        targets = self.targets()
+        surplus = []
+        ageing = []
+        with self._lock:
+            for bank_id, idle in self._idle.items():
+                keep = targets.get(bank_id, 0)
+                surplus.extend(idle[keep:])
+                del idle[keep:]
+                for browser in idle:
+                    if time.monotonic() - browser.warmed_at >= self.refresh_seconds * 0.8:
+                        ageing.append(browser)
+        for browser in surplus:
+            self._close(browser)
+
+        for browser in ageing:
+            with self._lock:
+                idle = self._idle.get(browser.bank_id) or []
+                if browser not in idle:
+                    continue
+                # Out of the pool while it reloads, so it is not checked out mid-load
+                idle.remove(browser)
+            try:
+                browser.load()
+            except Exception as e:
+                logger.warning("🔥 Could not refresh warm browser for %s: %s", browser.bank_id, e)
+                self._close(browser)
+                continue
+            with self._lock:
+                self._idle.setdefault(browser.bank_id, []).append(browser)
+
+        for bank_id, target in targets.items():
+            while not self._stop.is_set():
+                with self._lock:
+                    missing = target - len(self._idle.get(bank_id) or [])
+                    bank_config = self._banks.get(bank_id)
+                if missing <= 0 or not self._warm_up(bank_config):
+                    break
+
+    def _warm_up(self, bank_config):
+        """Start one warm browser for a bank; True if it joined the pool"""
+        automation = self._factory()
+        if not resource_governor.admit(automation):
+            return False
+        try:
+            automation.setup_driver(bank_registry.plan_for(bank_config).launch_profile)
+        except Exception as e:
+            logger.warning("🔥 Could not start warm browser for %s: %s", bank_config['id'], e)
+            automation.cleanup()
+            return False
+        browser = _WarmBrowser(self, automation, bank_config['id'], bank_config['loginUrl'])
+        resource_governor.transfer(automation, browser)
+        try:
+            browser.load()
+        except Exception as e:
+            logger.warning("🔥 Could not warm %s: %s", bank_config['id'], e)
+            self._close(browser)
+            return False
+        with self._lock:
+            self._idle.setdefault(browser.bank_id, []).append(browser)
+        logger.info("🔥 Warm browser ready for %s", bank_config['id'])
+        return True
+
+    def _close_later(self, browser):
+        threading.Thread(target=self._close, args=(browser,), name='warm-pool-close', daemon=True).start()
+
+    def _close(self, browser):
+        resource_governor.transfer(browser, browser.automation)
+        browser.automation.cleanup()
+
+
+# Global warm pool instance
+warm_pool = WarmPool()
@@ -1,93 +1,49 @@
-const angolanBanks = [
-  {
-    id: 'banco-atlantico',
-    name: 'Banco Atlântico',
-    logo: '../bank-icons/atlantico.webp',
-    primaryColor: '#009cb8',
-    loginUrl: 'https://ibparticulares.atlantico.ao/eBankit.Sites/eBankit.UI.Web.InternetBanking/Login.aspx?sto=1',
-    selectors: {
-      usernameField: '#MainContentFull_txtUserName_txField',
-      passwordField: '#MainContentFull_txtPassword_txField',
-      loginButton: '#MainContentFull_btnLogin',
-      transferMenu: '#MainContent_TransactionMainContent_lanAccounts_tabTransfers',
-      balanceCheck: '#MainContent_TransactionMainContent_txpTransactions_ctl01_rptAccounts_hAvailableBalance_0',
-      clickIbanTabOpen: '#MainContent_TransactionMainContent_txpTransactions_ctl01_flwData_collapseEbankitNIBIcon',
-      ibanField: '#MainContent_TransactionMainContent_txpTransactions_ctl01_flwData_txtAccountDestIBAN_txField',
-      amountField: '#MainContent_TransactionMainContent_txpTransactions_ctl01_FlowInnerContainer1_txtAmount_txField',
-      descriptionField: '#MainContent_TransactionMainContent_txpTransactions_ctl01_FlowInnerContainer1_txtInterbankDescription_txField',
-      beneficiaryNameField: '#MainContent_TransactionMainContent_txpTransactions_ctl01_FlowInnerContainer1_txtBeneficiaryName_txField',
-      confirmButton: '#MainContent_TransactionMainContent_txpTransactions_ctl01_btnNextFlowItem',
-      confirmationText: '#MainContent_TransactionMainContent_divMessage',
-      confirmationBtn: '#MainContent_TransactionMainContent_txpTransactions_ctl01_btnNextFlowItem',
-      otpInputField: '#MainContent_TransactionMainContent_txpTransactions_ctl01_txtSMSToken_txField',
-      otpValidationButton: '#MainContent_TransactionMainContent_txpTransactions_ctl01_btnNextFlowItem',
-      confirmTransaction: '#MainContent_TransactionMainContent_txpTransactions_ctl01_btnNextFlowItem', // need to add this button to be cliked before OTP
-      successMessage: '#MainContent_TransactionMainContent_divMessage'
-    }
-  },
-  {
-    id: 'bfa',
-    name: 'Banco BFA',
-    logo: 'https://www.bfa.ao/particulares/assets/img/logo-Client-blue.png',
-    primaryColor: '#fe6a05',
-    loginUrl: 'https://www.bfa.ao/particulares/login?returnUrl=%2F',
-    selectors: {
-      usernameField: '#mat-input-0',
-      passwordField: '#mat-input-1',
-      loginButton: 'body > app-root > div > div > app-login > div > div > div > div.bob-body-screen > div.bob-White-area.ng-star-inserted > div > div > div > form > div > div.form-group.p-2.mb-0 > div > button',
-      transferMenu: 'https://www.bfa.ao/particulares/accounts/transfers/interbank?idc=5613', 
-      balanceCheck: 'MainContent_TransactionMainContent_txpTransactions_ctl01_rptAccounts_hAvailableBalance_0',
-      clickIbanTabOpen: '#MainContent_TransactionMainContent_txpTransactions_ctl01_flwData_frlTypeAcc_tb > tbody > tr > td:nth-child(2) > label',
-      ibanField: '#mat-input-1',
-      beneficiaryNameField: '#mat-input-2',
-      amountField: '#mat-input-3',
-      descriptionField: '#mat-input-4',
-      selectBox: '#mat-select-2',
-      selectOption: '#mat-option-0',
-      confirmButton: '#cdk-step-content-0-0 > form > div > button.btn.btn-primary.col-8.col-md-4.col-lg-3.ml-0',
-      otpInputField: '#otp-form-sms-input', 
-      otpValidationButton: '#cdk-step-content-0-1 > form > div.row.justify-content-center.mt-4 > button.btn.btn-primary.col-8.col-md-4.col-lg-3.ml-0.ml-md-1.ng-star-inserted',
-      additionalVerification: '#cdk-step-content-0-1 > form > div:nth-child(1) > div:nth-child(2) > div > div > app-otp-form > div > div > div',
-      additionalInputField: '#otp-form-token-input',
-      successMessage: '#mfas-thirdStep > div.col-sm-12.alignBoxes.col-lg-6 > div > app-error-alert > app-alert > div'
-    }
-  },
-  {
-    id: 'bic',
-    name: 'Banco Bic',
-    logo: 'https://images.pexels.com/photos/259027/pexels-photo-259027.jpeg?auto=compress&cs=tinysrgb&w=100&h=100&fit=crop',
-    primaryColor: '#FF0000',
-    loginUrl: 'https://www.bicnet.ao/login?o=P&username=',
-    selectors: {
-      usernameField: '#ib-testid-login-username',
-      passwordField: '#ib-testid-login-password',
-      loginButton: '#ib-testid-login-submit',
-      transferMenu: '#menu-transfers',
-      ibanField: '#iban-recipient',
-      amountField: '#transfer-value',
-      confirmButton: '#execute-transfer',
-      successMessage: '.operation-success'
-    }
-  },
-  {
-    id: 'bai',
-    name: 'Banco Bai',
-    logo: 'https://images.pexels.com/photos/259027/pexels-photo-259027.jpeg?auto=compress&cs=tinysrgb&w=100&h=100&fit=crop',
-    primaryColor: '#1C3765',
-    loginUrl: 'https://ib.bancobai.ao/retail/#/',
-    selectors: {
-      usernameField: '#usernameInput > div.input-content > input[type=text]',
-      passwordField: '#passwordInput > div.input-content > input[type=password]',
-      loginButton: '#app-content > div.login-wrapper > div.elements-above-all > div.content-wrapper > div.form-wrapper.dark > button', 
-      ssdConfirmation: '#modals-centered-overlay-teleport > div > div > div.modal-footer > button.button-primary.square.medium', // Banco BAI uses SSD confirmation for login
-      ssdAcknowledgmentBtn: '#app-content > div.features-base-content-wrapper > div.footer-content-wrapper.status-bar-android > div > div > div > button',
-      transferMenu: '#transfer-section',
-      ibanField: '#beneficiary-iban',
-      amountField: '#operation-amount',
-      confirmButton: '#validate-transfer',
-      successMessage: '.success-notification'
-    }
+// Bank definitions live in banks.json so the Python automation worker can
+// load and validate the same data (see automation/bank_registry.py).
+const fs = require('fs');
+const path = require('path');
+
+const angolanBanks = require('./banks.json');
+
+// Written by the Python worker's circuit breaker and prober (automation/bank_health.py)
+const BANK_HEALTH_FILE = process.env.BANK_HEALTH_FILE || path.join(__dirname, 'bank_health.json');
+const SLOW_TTFB_MS = 3000;
+
+function readBankHealth() {
+  try {
+    return JSON.parse(fs.readFileSync(BANK_HEALTH_FILE, 'utf8'));
+  } catch (error) {
+    return {};
+  }
+}
+
+// 'up' | 'degraded' | 'down' | 'unknown' from breaker state and the last probe
+function bankAvailability(health) {
+  if (!health) {
+    return { status: 'unknown' };
   }
-];
+  const { breaker, probe } = health;
+  const now = Date.now() / 1000;
+
+  let status = 'up';
+  if ((breaker && breaker.state === 'open' && breaker.openUntil > now) || (probe && !probe.reachable)) {
+    status = 'down';
+  } else if ((breaker && breaker.state !== 'closed') || (probe && probe.ttfbMs > SLOW_TTFB_MS)) {
+    status = 'degraded';
+  }
+
+  return {
+    status,
+    breaker: breaker ? breaker.state : 'closed',
+    retryAt: breaker && breaker.state === 'open' ? new Date(breaker.openUntil * 1000).toISOString() : null,
+    ttfbMs: probe ? probe.ttfbMs : null,
+    checkedAt: probe ? new Date(probe.checkedAt * 1000).toISOString() : null,
+  };
+}
+
+function banksWithAvailability() {
+  const health = readBankHealth();
+  return angolanBanks.map(bank => ({ ...bank, availability: bankAvailability(health[bank.id]) }));
+}
 
-module.exports = { angolanBanks };
\ No newline at end of file
+module.exports = { angolanBanks, banksWithAvailability };
@@ -1,8 +1,8 @@
 const express = require('express');
 const cors = require('cors');
 const dotenv = require('dotenv');
-const { PythonAutomationService } = require('./services/pythonAutomation');
-const { angolanBanks } = require('./data/banks');
+const { PythonAutomationService, subscribeProgress } = require('./services/pythonAutomation');
+const { angolanBanks, banksWithAvailability } = require('./data/banks');
 
 // Load environment variables
 dotenv.config();
@@ -95,7 +95,7 @@ app.post('/api/transfer', async (req, res) => {
       }
       
       if (otpCode) {
-        console.log('🔐 Processing OTP verification:', otpCode);
+        console.log('🔐 Processing OTP verification');
         await new Promise(resolve => setTimeout(resolve, 2000));
       }
       
@@ -128,8 +128,9 @@ app.post('/api/transfer', async (req, res) => {
         console.log('🔐 Processing OTP submission for session:', sessionId);
         result = await automationService.submitOtp(sessionId, otpCode);
       } else {
-        // Initial transfer request
-        result = await automationService.performTransfer(req.body, bank);
+        // Initial transfer request; progress is streamed on
+        // GET /api/transfer/:progressId/events when the client sends an id
+        result = await automationService.performTransfer(req.body, bank, req.body.progressId);
       }
       
       console.log('🔄 Real automation result:', result);
@@ -154,9 +155,30 @@ app.post('/api/transfer', async (req, res) => {
   }
 });
 
+// Server-Sent Events stream of a running transfer's progress
+app.get('/api/transfer/:progressId/events', (req, res) => {
+  res.set({
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+  });
+  res.flushHeaders();
+
+  let unsubscribe = () => {};
+  const send = (event) => {
+    res.write(`event: ${event.event}\ndata: ${JSON.stringify(event)}\n\n`);
+    if (event.event === 'result') {
+      unsubscribe();
+      res.end();
+    }
+  };
+  unsubscribe = subscribeProgress(req.params.progressId, send);
+  req.on('close', () => unsubscribe());
+});
+
 app.get('/api/banks', (req, res) => {
   console.log('📞 Banks list requested');
-  res.json(angolanBanks);
+  res.json(banksWithAvailability());
 });
 
 // Helper functions
@@ -183,4 +205,5 @@ app.listen(PORT, () => {
   console.log(`   GET  /api/receiver-iban`);
   console.log(`   GET  /api/banks`);
   console.log(`   POST /api/transfer`);
+  console.log(`   GET  /api/transfer/:progressId/events`);
 });
\ No newline at end of file
@@ -1,10 +1,66 @@
 const { spawn } = require('child_process');
+const { EventEmitter } = require('events');
+const crypto = require('crypto');
 const path = require('path');
 const fs = require('fs');
 
 // Store active sessions
 const activeSessions = new Map();
 
+// Progress events streamed by the Python worker, per progressId. Events are
+// buffered so a subscriber that connects late still sees the whole run; the
+// buffer is dropped a minute after the terminal 'result' event.
+const progressEvents = new EventEmitter();
+progressEvents.setMaxListeners(0);
+const progressLog = new Map();
+const MAX_PROGRESS_EVENTS = 200;
+const PROGRESS_RETENTION_MS = 60000;
+
+// Total budget of one transfer, OTP wait included. The worker is told the
+// deadline and gives up on its own; the kill below is only a backstop.
+const TRANSFER_DEADLINE_SECONDS = Number(process.env.TRANSFER_DEADLINE_SECONDS || 540);
+const KILL_GRACE_MS = 30000;
+
+function recordProgress(progressId, event) {
+  const events = progressLog.get(progressId) || [];
+  if (events.length < MAX_PROGRESS_EVENTS) {
+    events.push(event);
+  }
+  progressLog.set(progressId, events);
+  progressEvents.emit(progressId, event);
+
+  if (event.event === 'result') {
+    setTimeout(() => progressLog.delete(progressId), PROGRESS_RETENTION_MS).unref();
+  }
+}
+
+// Replay buffered events for a progressId, then follow new ones.
+// Returns an unsubscribe function.
+function subscribeProgress(progressId, listener) {
+  for (const event of progressLog.get(progressId) || []) {
+    listener(event);
+  }
+  progressEvents.on(progressId, listener);
+  return () => progressEvents.off(progressId, listener);
+}
+
+// Transfers running in this Node process, by idempotency key. A duplicate
+// request (a client retry) gets the running transfer's promise instead of
+// spawning a second worker; the worker dedupes across processes as well.
+const inFlightTransfers = new Map();
+
+function transferKey(transferData, bankConfig) {
+  const basis = transferData.clientReference
+    ? `ref|${bankConfig.id}|${transferData.clientReference}`
+    : [
+        bankConfig.id,
+        transferData.username,
+        String(transferData.receiverIban || '').replace(/\s/g, '').toUpperCase(),
+        Number(transferData.amount).toFixed(2),
+      ].join('|');
+  return crypto.createHash('sha256').update(basis).digest('hex');
+}
+
 // Ensure session directory exists
 const SESSION_DIR = path.join(__dirname, '..', 'automation', 'bank_sessions');
 
@@ -33,6 +89,15 @@ async function storeSessionToFile(sessionId, sessionData) {
       fileData.timestamp = sessionData.timestamp;
     }
 
+    // Keep the routing fields the worker wrote: OTP submissions are
+    // forwarded to the node that holds the browser
+    const existing = readSessionFileQuietly(sessionFile);
+    for (const key of ['owner_node', 'control_endpoint', 'checkpoint', 'checkpoints', 'expires_at']) {
+      if (existing && existing[key] !== undefined) {
+        fileData[key] = existing[key];
+      }
+    }
+
     // Write to temporary file first, then rename to prevent corruption
     const tempFile = `${sessionFile}.tmp`;
     const jsonContent = JSON.stringify(fileData, null, 2);
@@ -60,6 +125,14 @@ async function storeSessionToFile(sessionId, sessionData) {
   }
 }
 
+function readSessionFileQuietly(sessionFile) {
+  try {
+    return JSON.parse(fs.readFileSync(sessionFile, 'utf8'));
+  } catch (error) {
+    return null;
+  }
+}
+
 // Get session from file
 function getSessionFromFile(sessionId) {
   try {
@@ -113,7 +186,8 @@ function listActiveSessionsFromFiles() {
       return [];
     }
     
-    const sessionFiles = fs.readdirSync(SESSION_DIR).filter(f => f.endsWith('.json'));
+    // idem-*.json are the worker's idempotency records, not sessions
+    const sessionFiles = fs.readdirSync(SESSION_DIR).filter(f => f.endsWith('.json') && !f.startsWith('idem-'));
     const sessionIds = sessionFiles.map(f => f.replace('.json', ''));
     
     // Filter out expired sessions
@@ -131,6 +205,30 @@ function listActiveSessionsFromFiles() {
   }
 }
 
+// Remember a transfer waiting for its OTP, here and in the shared session file
+function rememberOtpSession(result, bankConfig, transferData, process) {
+  activeSessions.set(result.sessionId, {
+    bankConfig,
+    transferData,
+    timestamp: new Date(),
+    process
+  });
+
+  storeSessionToFile(result.sessionId, {
+    bank_config: bankConfig,
+    transfer_data: transferData,
+    transaction_id: result.transactionId,
+    status: 'submit_otp',
+    browser_pid: result.browserPid,
+    driver_session_id: result.driverSessionId,
+    debugger_port: result.debuggerPort,
+    current_url: result.currentUrl,
+    otp_detected: result.otpDetected || false,
+    timestamp: new Date().toISOString()
+  });
+  console.log(`🔐 Session ${result.sessionId} stored for OTP`);
+}
+
 function ensureSessionDirectory() {
   if (!fs.existsSync(SESSION_DIR)) {
     fs.mkdirSync(SESSION_DIR, { recursive: true });
@@ -144,28 +242,94 @@ class PythonAutomationService {
   }
 
 
-  async performTransfer(transferData, bankConfig) {
+  performTransfer(transferData, bankConfig, progressId = crypto.randomUUID()) {
+    const key = transferKey(transferData, bankConfig);
+    const running = inFlightTransfers.get(key);
+    if (running) {
+      console.log('🔂 Duplicate transfer request, waiting for the running one');
+      return running.then(result => ({ ...result, idempotentReplay: true }));
+    }
+
+    const transfer = this.runTransfer(transferData, bankConfig, progressId)
+      .finally(() => inFlightTransfers.delete(key));
+    inFlightTransfers.set(key, transfer);
+    return transfer;
+  }
+
+  async runTransfer(transferData, bankConfig, progressId) {
     return new Promise((resolve, reject) => {
       console.log(`🐍 Starting Python automation for ${bankConfig.name}`);
       
-      // Prepare data for Python script
+      // Prepare data for Python script; jobId tags every progress event
+      const deadlineAt = Date.now() / 1000 + TRANSFER_DEADLINE_SECONDS;
       const inputData = {
+        jobId: progressId,
+        deadlineAt,
         transferData,
         bankConfig
       };
       
-      // Spawn Python process
-      // const pythonProcess = spawn('python3', [this.pythonScriptPath, JSON.stringify(inputData)]); 
-      const pythonProcess = spawn('/var/www/redpay/backend/venv/bin/python3', [this.pythonScriptPath, JSON.stringify(inputData)]);
+      // Spawn Python process. The payload goes over stdin so credentials
+      // never appear in the process list. With --events the worker writes
+      // NDJSON progress events and ends with an 'event: result' line.
+      // const pythonProcess = spawn('python3', [this.pythonScriptPath, '--stdin', '--events']); 
+      const pythonProcess = spawn('/var/www/redpay/backend/venv/bin/python3', [this.pythonScriptPath, '--stdin', '--events']);
+      pythonProcess.stdin.write(JSON.stringify(inputData) + '\n');
 
 
       
       let outputData = '';
       let errorData = '';
+      let pendingLine = '';
+      let finalResult = null;
+      let settled = false;
+
+      // A worker whose transfer waits for an OTP keeps running after its
+      // result, so the result is handled as soon as it arrives
+      const settle = (result) => {
+        if (settled) return;
+        settled = true;
+        console.log('✅ Python automation result:', {
+          success: result.success,
+          requiresOtp: result.requiresOtp,
+          sessionId: result.sessionId,
+          transactionId: result.transactionId,
+          browserPid: result.browserPid,
+          driverSessionId: result.driverSessionId,
+          debuggerPort: result.debuggerPort,
+          message: result.message
+        });
+
+        // Store session if OTP is required
+        if (result.requiresOtp && result.sessionId) {
+          rememberOtpSession(result, bankConfig, transferData, pythonProcess);
+        }
+        resolve(result);
+      };
       
-      // Collect stdout data
+      // Collect stdout data, publishing each complete event line
       pythonProcess.stdout.on('data', (data) => {
-        outputData += data.toString();
+        const chunk = data.toString();
+        outputData += chunk;
+
+        const lines = (pendingLine + chunk).split('\n');
+        pendingLine = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          try {
+            const { jobId, ...event } = JSON.parse(line);
+            if (event.event === 'result') {
+              const { event: _, ...result } = event;
+              finalResult = { ...result, progressId };
+            }
+            recordProgress(progressId, event);
+            if (finalResult) {
+              settle(finalResult);
+            }
+          } catch (parseError) {
+            console.error('❌ Unparsable worker line:', line);
+          }
+        }
       });
       
       // Collect stderr data
@@ -177,46 +341,13 @@ class PythonAutomationService {
       // Handle process completion
       pythonProcess.on('close', (code) => {
         console.log(`🐍 Python process exited with code ${code}`);
+        if (settled) return;
         
         if (code === 0) {
           try {
-            // Parse the JSON output from Python script
-            const result = JSON.parse(outputData.trim());
-            console.log('✅ Python automation result:', {
-              success: result.success,
-              requiresOtp: result.requiresOtp,
-              sessionId: result.sessionId,
-              transactionId: result.transactionId,
-              browserPid: result.browserPid,
-              driverSessionId: result.driverSessionId,
-              debuggerPort: result.debuggerPort,
-              message: result.message
-            });
-            
-            // Store session if OTP is required
-            if (result.requiresOtp && result.sessionId) {
-              activeSessions.set(result.sessionId, {
-                bankConfig,
-                transferData,
-                timestamp: new Date(),
-                process: pythonProcess
-              });
-
-              storeSessionToFile(result.sessionId, {
-                bank_config: bankConfig,
-                transfer_data: transferData,
-                transaction_id: result.transactionId,
-                status: 'submit_otp',
-                browser_pid: result.browserPid,
-                driver_session_id: result.driverSessionId,
-                debugger_port: result.debuggerPort,
-                current_url: result.currentUrl,
-                otp_detected: result.otpDetected || false,
-                timestamp: new Date().toISOString()
-              });
-              console.log(`🔐 Session ${result.sessionId} stored for OTP`);
-            }
-            resolve(result);
+            // The terminal event carries the result; plain output is the
+            // single-line format of workers started without --events
+            settle(finalResult || JSON.parse(outputData.trim()));
           } catch (parseError) {
             console.error('❌ Failed to parse Python output:', parseError);
             console.error('Raw output:', outputData);
@@ -247,10 +378,9 @@ class PythonAutomationService {
         });
       });
       
-      // Set timeout for the process
+      // Backstop in case the worker overruns its own deadline
       setTimeout(() => {
-        // Only kill if not waiting for OTP
-        if (!outputData.includes('"requiresOtp": true')) {
+        if (pythonProcess.exitCode === null) {
           pythonProcess.kill('SIGTERM');
           resolve({
             success: false,
@@ -258,7 +388,7 @@ class PythonAutomationService {
             timestamp: new Date().toISOString()
           });
         }
-      }, 600000); // 10 minute timeout for OTP scenarios
+      }, TRANSFER_DEADLINE_SECONDS * 1000 + KILL_GRACE_MS).unref();
     });
   }
 
@@ -267,7 +397,7 @@ class PythonAutomationService {
       console.log(`🔐 Submitting OTP for session ${sessionId}`);
 
       const session = activeSessions.get(sessionId);
-      if (!session || !session.process) {
+      if (!session) {
         resolve({
           success: false,
           message: 'Session expired or not found',
@@ -276,12 +406,8 @@ class PythonAutomationService {
         return;
       }
 
-      // Send OTP to the running Python process via stdin
-    if (session.process && !session.process.killed) {
-      // Send OTP to Python process
-      session.process.stdin.write(otpCode + '\n');
-      console.log('✅ OTP sent to Python process:', otpCode);
-    }
+      // The OTP job below is routed by the worker to the node that holds
+      // the browser, so nothing is written to the owner's stdin
 
       let outputData = '';
       let errorData = '';
@@ -319,13 +445,17 @@ class PythonAutomationService {
     const {spawn} = require('child_process') 
                 
     const jsonData = JSON.stringify({
+      mode: 'submit_otp',
+      sessionId,
+      otpCode,
       bankConfig: session.bankConfig,
       transferData: session.transferData,
       timestamp: new Date(),
     });
 
-    // run with JSON as first argument
-    const child = spawn('python3', ['automation/bank_scraper.py', jsonData, 'submit_otp', sessionId, otpCode]);
+    // Send the job over stdin rather than argv
+    const child = spawn('python3', ['automation/bank_scraper.py', '--stdin']);
+    child.stdin.write(jsonData + '\n');
 
 
     child.stdout.on('data', (data) => {
@@ -349,7 +479,14 @@ class PythonAutomationService {
       try {
         // If Python sends JSON (recommended)
         const parsed = JSON.parse(msg);
+        // The owner node was gone and the transfer was replayed: the user
+        // gets a fresh OTP for the new session
+        if (parsed.requiresOtp && parsed.sessionId) {
+          activeSessions.delete(sessionId);
+          rememberOtpSession(parsed, session.bankConfig, session.transferData, child);
+        }
         resolve({
+          ...parsed,
           success: parsed.success,
           message: parsed.message || 'OTP verification result received',
           timestamp: new Date().toISOString()
@@ -417,4 +554,4 @@ class PythonAutomationService {
   }
 }
 
-module.exports = { PythonAutomationService };
\ No newline at end of file
+module.exports = { PythonAutomationService, subscribeProgress };
\ No newline at end of file